@@ -0,0 +1,305 @@
+"""
+Local deterministic analytics over the comment dataset
+Counts, percentages, cross-tabs and simple/corrected probabilities computed
+in Python so the model only writes prose around exact numbers
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from .comment_store import STANCE_UNKNOWN, CommentStore
+    from .comment_store import SENTIMENTS as SENTIMENT_CODES, STANCES as STANCE_CODES
+    from .full_dataset_loader import get_full_dataset_loader
+    from .text_normalizer import tokenize
+    from .topics import detect_topics, expand_keyword, keyword_stems, load_topic_keywords
+except ImportError:
+    from comment_store import STANCE_UNKNOWN, CommentStore
+    from comment_store import SENTIMENTS as SENTIMENT_CODES, STANCES as STANCE_CODES
+    from full_dataset_loader import get_full_dataset_loader
+    from text_normalizer import tokenize
+    from topics import detect_topics, expand_keyword, keyword_stems, load_topic_keywords
+
+EXPECTED_TOTAL = 1828  # Comments available on TikTok (86.4% extracted)
+
+SENTIMENTS = ('negative', 'positive', 'neutral')
+STANCES = ('approving', 'disapproving')
+
+SENTIMENT_LABELS = {'negative': 'Negativos', 'positive': 'Positivos', 'neutral': 'Neutrales'}
+STANCE_LABELS = {'approving': 'posts aprobatorios', 'disapproving': 'posts desaprobatorios'}
+
+KEYWORD_CACHE_SIZE = 256
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+class AnalyticsEngine:
+    """
+    Filter / group-by / count queries over the comments
+
+    Every attribute is precomputed as a bitset (a Python int with bit i set
+    for comment i). Filters are ANDed together and counted with a popcount,
+    so a query over all comments is a handful of big-integer operations.
+    """
+
+    def __init__(self, comments: Optional[List[Dict[str, Any]]] = None, posts: Optional[List[Dict[str, Any]]] = None):
+        if comments is None or posts is None:
+            loader = get_full_dataset_loader()
+            comments = loader.comments if comments is None else comments
+            posts = loader.posts if posts is None else posts
+
+        self.total = len(comments)
+        self.all_mask = (1 << self.total) - 1
+        self.posts = posts
+        self._token_masks = {}
+        self._vocabulary = []  # sorted, for prefix lookups
+        self._likes = []
+        self.sentiment_masks = {name: 0 for name in SENTIMENTS}
+        self.stance_masks = {name: 0 for name in STANCES}
+        self.post_masks = {}
+        self.topic_masks = {}
+        self._keyword_masks = OrderedDict()
+        self._build(CommentStore.wrap(comments))
+
+    def _build(self, store: CommentStore):
+        """Single pass over the store's columns to build all bitsets"""
+        self._likes = store.likes
+
+        token_masks = {}
+        for i, text in enumerate(store.texts):
+            bit = 1 << i
+            for token in set(tokenize(text)):
+                token_masks[token] = token_masks.get(token, 0) | bit
+        self._token_masks = token_masks
+        self._vocabulary = sorted(token_masks)
+
+        sentiment_bits = [0] * len(SENTIMENT_CODES)
+        stance_bits = [0] * len(STANCE_CODES)
+        post_bits = {}
+        for i in range(len(store)):
+            bit = 1 << i
+            sentiment_bits[store.sentiment[i]] |= bit
+            stance_bits[store.stance[i]] |= bit
+            post = store.post[i]
+            post_bits[post] = post_bits.get(post, 0) | bit
+
+        for code, name in enumerate(SENTIMENT_CODES):
+            self.sentiment_masks[name] = sentiment_bits[code]
+        for code, name in enumerate(STANCE_CODES):
+            if code != STANCE_UNKNOWN:
+                self.stance_masks[name] = stance_bits[code]
+        for post, mask in post_bits.items():
+            post_id = store.post_ids[post] if post >= 0 else 'UNK'
+            self.post_masks[post_id] = self.post_masks.get(post_id, 0) | mask
+
+        for topic, keywords in load_topic_keywords().items():
+            self.topic_masks[topic] = self.keyword_mask(keywords)
+
+    def keyword_mask(self, keywords: Iterable[str], match: str = 'any') -> int:
+        """
+        Comments containing any (or all) of the keywords
+
+        Same rule as the smart filter's topic expansion (topics.expand_keyword):
+        a keyword matches the word itself or its plural (explicit stems such as
+        "corrup" match every word they start), so topic counts and BM25 topic
+        matches cover the same comments.
+        """
+        keywords = tuple(keyword_stems(keywords))
+        cache_key = (keywords, match)
+        if cache_key in self._keyword_masks:
+            self._keyword_masks.move_to_end(cache_key)
+            return self._keyword_masks[cache_key]
+
+        masks = [self._stem_mask(keyword) for keyword in keywords]
+        mask = 0
+        if match == 'any':
+            for keyword_mask in masks:
+                mask |= keyword_mask
+        elif masks:
+            mask = self.all_mask
+            for keyword_mask in masks:
+                mask &= keyword_mask
+
+        self._keyword_masks[cache_key] = mask
+        if len(self._keyword_masks) > KEYWORD_CACHE_SIZE:
+            self._keyword_masks.popitem(last=False)
+        return mask
+
+    def _stem_mask(self, keyword: str) -> int:
+        """Comments with a token matching every word of a keyword stem"""
+        mask = self.all_mask
+        for word in keyword.split():
+            word_mask = 0
+            for token in expand_keyword(word, self._vocabulary):
+                word_mask |= self._token_masks[token]
+            mask &= word_mask
+        return mask
+
+    def likes_mask(self, min_likes: int) -> int:
+        """Comments with at least min_likes likes"""
+        mask = 0
+        for i, likes in enumerate(self._likes):
+            if likes >= min_likes:
+                mask |= 1 << i
+        return mask
+
+    def mask(
+        self,
+        keywords: Optional[Iterable[str]] = None,
+        match: str = 'any',
+        topic: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        stance: Optional[str] = None,
+        post_id: Optional[str] = None,
+        min_likes: Optional[int] = None
+    ) -> int:
+        """Bitset of the comments passing all filters"""
+        result = self.all_mask
+        if keywords:
+            result &= self.keyword_mask(keywords, match)
+        if topic:
+            result &= self.topic_masks.get(topic, 0)
+        if sentiment:
+            result &= self.sentiment_masks.get(sentiment.lower(), 0)
+        if stance:
+            result &= self.stance_masks.get(stance.lower(), 0)
+        if post_id:
+            result &= self.post_masks.get(str(post_id), 0)
+        if min_likes is not None:
+            result &= self.likes_mask(min_likes)
+        return result
+
+    def probabilities(self, count: int) -> Dict[str, float]:
+        """Simple (observed) and corrected (÷ expected total) probabilities"""
+        return {
+            'p_simple': round(count / self.total, 4) if self.total else 0.0,
+            'p_corrected': round(count / EXPECTED_TOTAL, 4)
+        }
+
+    def query(self, group_by: Optional[str] = None, **filters) -> Dict[str, Any]:
+        """
+        Count comments matching the filters, optionally grouped
+
+        group_by: 'sentiment', 'stance', 'post' or 'topic'
+        """
+        selected = self.mask(**filters)
+        count = _popcount(selected)
+
+        result = {
+            'filters': {k: v for k, v in filters.items() if v is not None},
+            'count': count,
+            'pct_of_total': round(count / self.total * 100, 1) if self.total else 0.0
+        }
+        result.update(self.probabilities(count))
+
+        if group_by:
+            result['groups'] = {}
+            for name, group_mask in self._groups(group_by).items():
+                n = _popcount(selected & group_mask)
+                if n or group_by in ('sentiment', 'stance'):
+                    result['groups'][name] = {
+                        'count': n,
+                        'pct': round(n / count * 100, 1) if count else 0.0
+                    }
+
+        return result
+
+    def crosstab(self, rows: str = 'topic', cols: str = 'sentiment', **filters) -> Dict[str, Dict[str, int]]:
+        """Counts for every (row, col) pair"""
+        selected = self.mask(**filters)
+        return {
+            row: {col: _popcount(selected & row_mask & col_mask) for col, col_mask in self._groups(cols).items()}
+            for row, row_mask in self._groups(rows).items()
+        }
+
+    def _groups(self, name: str) -> Dict[str, int]:
+        """Group bitsets by dimension name"""
+        return {
+            'sentiment': self.sentiment_masks,
+            'stance': self.stance_masks,
+            'post': self.post_masks,
+            'topic': self.topic_masks
+        }[name]
+
+    def create_overview_context(self) -> str:
+        """
+        Dataset-wide aggregates: sentiment, post stance and topic x sentiment
+        """
+        parts = []
+        parts.append("=== AGREGADOS DEL DATASET (calculados localmente - usar tal cual) ===")
+        parts.append(f"Base: {self.total:,} comentarios extraídos | {EXPECTED_TOTAL:,} esperados")
+
+        overall = self.query(group_by='sentiment')['groups']
+        parts.append("Sentimiento: " + ', '.join(
+            f"{SENTIMENT_LABELS[s]} {overall[s]['count']} ({overall[s]['pct']}%)" for s in SENTIMENTS
+        ))
+        by_stance = self.query(group_by='stance')['groups']
+        parts.append("Por postura del post: " + ', '.join(
+            f"{by_stance[s]['count']} en {STANCE_LABELS[s]}" for s in STANCES
+        ))
+
+        parts.append("")
+        parts.append("FMT:Tema|Total|Neg|Pos|Neu")
+        table = self.crosstab('topic', 'sentiment')
+        for topic, counts in sorted(table.items(), key=lambda item: -sum(item[1].values())):
+            total = _popcount(self.topic_masks[topic])
+            parts.append(f"{topic}|{total}|{counts['negative']}|{counts['positive']}|{counts['neutral']}")
+
+        parts.append("=== FIN AGREGADOS ===")
+        return "\n".join(parts)
+
+    def create_stats_context(self, query: str) -> str:
+        """
+        Exact numbers for the topics mentioned in the query (empty if none)
+        """
+        topics = detect_topics(query)
+        if not topics:
+            return ""
+
+        parts = []
+        parts.append("=== ESTADÍSTICAS EXACTAS (calculadas localmente - usar tal cual) ===")
+        parts.append(f"Base: {self.total:,} comentarios extraídos | {EXPECTED_TOTAL:,} esperados")
+
+        for topic in topics:
+            result = self.query(topic=topic, group_by='sentiment')
+            count = result['count']
+            parts.append("")
+            parts.append(f"TEMA: {topic}")
+            parts.append(f"- Total: {count} comentarios ({result['pct_of_total']}% del total de {self.total:,})")
+            for sentiment in SENTIMENTS:
+                group = result['groups'][sentiment]
+                parts.append(f"- {SENTIMENT_LABELS[sentiment]}: {group['count']} comentarios ({group['pct']}% del tema)")
+            parts.append(
+                f"- P_simple: {count}/{self.total:,} = {result['p_simple'] * 100:.2f}% | "
+                f"P_corregida: {count}/{EXPECTED_TOTAL:,} = {result['p_corrected'] * 100:.2f}%"
+            )
+
+            by_stance = self.query(topic=topic, group_by='stance')['groups']
+            stance_text = ', '.join(
+                f"{by_stance[stance]['count']} en {STANCE_LABELS[stance]}" for stance in STANCES
+            )
+            parts.append(f"- Por postura del post: {stance_text}")
+
+        if len(topics) > 1:
+            combined = self.all_mask
+            for topic in topics:
+                combined &= self.topic_masks.get(topic, 0)
+            parts.append("")
+            parts.append(f"Comentarios que mencionan TODOS estos temas: {_popcount(combined)}")
+
+        parts.append("=== FIN ESTADÍSTICAS ===")
+        return "\n".join(parts)
+
+
+# Singleton instance
+_analytics_engine = None
+
+
+def get_analytics_engine() -> AnalyticsEngine:
+    """Get or create analytics engine instance"""
+    global _analytics_engine
+    if _analytics_engine is None:
+        _analytics_engine = AnalyticsEngine()
+    return _analytics_engine
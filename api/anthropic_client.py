@@ -0,0 +1,123 @@
+"""
+Shared Anthropic client
+One client (and its keep-alive connection pool) per process, reused across
+warm serverless invocations instead of paying TLS setup on every request
+"""
+
+import os
+import sys
+import threading
+
+# anthropic/httpx are imported on first use: together they cost ~0.5 s of
+# import time that preflights and error responses should not pay
+
+# Timeouts (seconds) and pool limits, overridable via environment
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_WRITE_TIMEOUT = 10.0
+DEFAULT_POOL_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_KEEPALIVE = 5
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_MAX_RETRIES = 2
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠ Warning: Invalid {name}, using {default}")
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an int setting from the environment"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"⚠ Warning: Invalid {name}, using {default}")
+        return default
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 needs the optional h2 package"""
+    if os.environ.get('ANTHROPIC_HTTP2', '1') == '0':
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client(api_key: str) -> 'anthropic.Anthropic':
+    """Create a client with tuned timeouts and a keep-alive pool"""
+    import anthropic
+    import httpx
+
+    timeout = httpx.Timeout(
+        connect=_env_float('ANTHROPIC_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+        read=_env_float('ANTHROPIC_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+        write=_env_float('ANTHROPIC_WRITE_TIMEOUT', DEFAULT_WRITE_TIMEOUT),
+        pool=_env_float('ANTHROPIC_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT)
+    )
+    limits = httpx.Limits(
+        max_connections=_env_int('ANTHROPIC_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS),
+        max_keepalive_connections=_env_int('ANTHROPIC_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE),
+        keepalive_expiry=_env_float('ANTHROPIC_KEEPALIVE_EXPIRY', DEFAULT_KEEPALIVE_EXPIRY)
+    )
+    http2 = _http2_enabled()
+
+    http_client = anthropic.DefaultHttpxClient(timeout=timeout, limits=limits, http2=http2)
+    print(f"✓ Created Anthropic client (http2={http2}, max_connections={limits.max_connections})")
+
+    return anthropic.Anthropic(
+        api_key=api_key,
+        http_client=http_client,
+        timeout=timeout,
+        max_retries=_env_int('ANTHROPIC_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+    )
+
+
+# Singleton instance
+_client = None
+_client_api_key = None
+_client_lock = threading.Lock()
+
+
+def get_anthropic_client(api_key: str = None) -> 'anthropic.Anthropic':
+    """
+    Get or create the process-wide Anthropic client
+
+    The client is rebuilt only when the API key changes. The replaced client
+    is not closed here since other threads may still be using it.
+    """
+    global _client, _client_api_key
+
+    api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+
+    with _client_lock:
+        if _client is None or _client_api_key != api_key:
+            _client = _build_client(api_key)
+            _client_api_key = api_key
+        return _client
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for anthropic.RateLimitError (without importing the SDK for other errors)"""
+    anthropic = sys.modules.get('anthropic')
+    return anthropic is not None and isinstance(error, anthropic.RateLimitError)
+
+
+def reset_anthropic_client():
+    """Drop the shared client (closing its connection pool)"""
+    global _client, _client_api_key
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_api_key = None
@@ -0,0 +1,285 @@
+"""
+Deterministic Chart.js specs from locally computed aggregates
+The model requests a chart with a short tag such as [CHART:sentiment topic=salud];
+the server expands it into a spec whose numbers (and N in the title) come
+straight from the analytics engine, so charts are always exact.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .analytics_engine import SENTIMENT_LABELS, SENTIMENTS, _popcount, get_analytics_engine
+    from .full_dataset_loader import get_full_dataset_loader
+    from .streaming import CHART_TAG_PATTERN
+    from .text_normalizer import normalize_text
+except ImportError:
+    from analytics_engine import SENTIMENT_LABELS, SENTIMENTS, _popcount, get_analytics_engine
+    from full_dataset_loader import get_full_dataset_loader
+    from streaming import CHART_TAG_PATTERN
+    from text_normalizer import normalize_text
+
+DEFAULT_TOP = 10
+MAX_TOP = 25
+
+SENTIMENT_COLORS = {'negative': '#ef4444', 'positive': '#10b981', 'neutral': '#94a3b8'}
+PRIMARY_COLOR = '#667eea'
+
+TOPIC_LABELS = {
+    'salud': 'Salud',
+    'educacion': 'Educación',
+    'infraestructura': 'Infraestructura',
+    'transporte': 'Transporte',
+    'corrupcion': 'Corrupción',
+    'impuestos': 'Impuestos',
+    'pobreza': 'Pobreza',
+    'congreso': 'Congreso',
+    'presidente': 'Presidente',
+    'seguridad': 'Seguridad',
+    'empleo': 'Empleo',
+    'vivienda': 'Vivienda',
+    'canasta_basica': 'Canasta Básica'
+}
+
+STANCE_TITLES = {'approving': 'posts aprobatorios', 'disapproving': 'posts desaprobatorios'}
+STANCE_AXIS_LABELS = {'approving': 'Posts aprobatorios', 'disapproving': 'Posts desaprobatorios'}
+SENTIMENT_ALIASES = {
+    'negative': 'negative', 'negativo': 'negative', 'negativos': 'negative', 'n': 'negative',
+    'positive': 'positive', 'positivo': 'positive', 'positivos': 'positive', 'p': 'positive',
+    'neutral': 'neutral', 'neutro': 'neutral', 'neutrales': 'neutral', 'u': 'neutral'
+}
+STANCE_ALIASES = {
+    'approving': 'approving', 'aprobatorio': 'approving', 'aprobatorios': 'approving', 'a': 'approving',
+    'disapproving': 'disapproving', 'desaprobatorio': 'disapproving', 'desaprobatorios': 'disapproving', 'd': 'disapproving'
+}
+
+
+def parse_chart_tag(tag: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """'[CHART:sentiment topic=salud]' -> ('sentiment', {'topic': 'salud'})"""
+    match = CHART_TAG_PATTERN.fullmatch(tag.strip())
+    if not match:
+        return None
+    params = dict(part.split('=', 1) for part in match.group(2).split())
+    return match.group(1).lower(), params
+
+
+def topic_label(topic: str) -> str:
+    return TOPIC_LABELS.get(topic, topic.replace('_', ' ').title())
+
+
+class ChartBuilder:
+    """
+    Builds chart specs in the format public/app.js renders
+    ({'type', 'title', 'data': {'labels', 'datasets'}})
+
+    Each kind is a method _chart_<kind>(**params). Builders return None for
+    parameters they don't understand, so a bad tag never becomes a wrong chart.
+    """
+
+    KINDS = ('sentiment', 'topics', 'sentiment_by_topic', 'stance', 'posts_by_interest')
+
+    def __init__(self, engine=None, posts: Optional[List[Dict[str, Any]]] = None):
+        self.engine = engine or get_analytics_engine()
+        self.posts = posts if posts is not None else get_full_dataset_loader().posts
+
+    def build(self, kind: str, **params) -> Optional[Dict[str, Any]]:
+        """Chart spec for kind, or None if the kind or a parameter is unknown"""
+        if kind not in self.KINDS:
+            print(f"⚠ Unknown chart kind: {kind}")
+            return None
+        try:
+            return getattr(self, f'_chart_{kind}')(**params)
+        except (TypeError, ValueError) as e:
+            print(f"⚠ Invalid chart parameters for {kind}: {e}")
+            return None
+
+    def build_from_tag(self, tag: str) -> Optional[Dict[str, Any]]:
+        parsed = parse_chart_tag(tag)
+        if parsed is None:
+            return None
+        kind, params = parsed
+        return self.build(kind, **params)
+
+    # ------------------------------------------------------------------
+    # Chart kinds
+    # ------------------------------------------------------------------
+
+    def _chart_sentiment(self, topic: Optional[str] = None, stance: Optional[str] = None,
+                         post: Optional[str] = None) -> Dict[str, Any]:
+        """Sentiment distribution, optionally within a topic, stance or post"""
+        filters = self._filters(topic=topic, stance=stance, post=post)
+        result = self.engine.query(group_by='sentiment', **filters)
+        groups = result['groups']
+
+        return {
+            'type': 'doughnut',
+            'title': f"Distribución de Sentimiento (N={result['count']:,} {self._scope(filters)})",
+            'data': {
+                'labels': [SENTIMENT_LABELS[s] for s in SENTIMENTS],
+                'datasets': [{
+                    'label': 'Comentarios',
+                    'data': [groups[s]['count'] for s in SENTIMENTS],
+                    'backgroundColor': [SENTIMENT_COLORS[s] for s in SENTIMENTS]
+                }]
+            }
+        }
+
+    def _chart_topics(self, sentiment: Optional[str] = None, stance: Optional[str] = None,
+                      top: Optional[str] = None) -> Dict[str, Any]:
+        """Topics ranked by number of comments mentioning them"""
+        filters = self._filters(sentiment=sentiment, stance=stance)
+        base = self.engine.mask(**filters)
+        counts = self._topic_counts(base)[:self._top(top, len(self.engine.topic_masks))]
+
+        return {
+            'type': 'horizontalBar',
+            'title': f"Tópicos Más Mencionados (N={_popcount(base):,} {self._scope(filters)})",
+            'data': {
+                'labels': [topic_label(topic) for topic, _ in counts],
+                'datasets': [{
+                    'label': 'Comentarios',
+                    'data': [count for _, count in counts],
+                    'backgroundColor': SENTIMENT_COLORS[filters['sentiment']] if sentiment else PRIMARY_COLOR
+                }]
+            }
+        }
+
+    def _chart_sentiment_by_topic(self, topics: Optional[str] = None, stance: Optional[str] = None,
+                                  top: Optional[str] = None) -> Dict[str, Any]:
+        """Sentiment counts per topic (one dataset per sentiment)"""
+        filters = self._filters(stance=stance)
+        base = self.engine.mask(**filters)
+        if topics:
+            selected = [self._topic(name) for name in topics.split(',') if name]
+        else:
+            selected = [topic for topic, count in self._topic_counts(base) if count][:self._top(top, 8)]
+
+        crosstab = self.engine.crosstab('topic', 'sentiment', **filters)
+        union = 0
+        for topic in selected:
+            union |= self.engine.topic_masks[topic]
+
+        return {
+            'type': 'bar',
+            'title': f"Sentimiento por Tópico (N={_popcount(base & union):,} comentarios sobre estos tópicos)",
+            'data': {
+                'labels': [topic_label(topic) for topic in selected],
+                'datasets': [{
+                    'label': SENTIMENT_LABELS[s],
+                    'data': [crosstab[topic][s] for topic in selected],
+                    'backgroundColor': SENTIMENT_COLORS[s]
+                } for s in SENTIMENTS]
+            }
+        }
+
+    def _chart_stance(self, topic: Optional[str] = None) -> Dict[str, Any]:
+        """Sentiment on approving vs disapproving posts"""
+        filters = self._filters(topic=topic)
+        crosstab = self.engine.crosstab('stance', 'sentiment', **filters)
+        stances = list(STANCE_AXIS_LABELS)
+        n = sum(sum(crosstab[stance].values()) for stance in stances)
+
+        return {
+            'type': 'bar',
+            'title': f"Sentimiento por Postura del Post (N={n:,} {self._scope(filters)})",
+            'data': {
+                'labels': [STANCE_AXIS_LABELS[stance] for stance in stances],
+                'datasets': [{
+                    'label': SENTIMENT_LABELS[s],
+                    'data': [crosstab[stance][s] for stance in stances],
+                    'backgroundColor': SENTIMENT_COLORS[s]
+                } for s in SENTIMENTS]
+            }
+        }
+
+    def _chart_posts_by_interest(self, top: Optional[str] = None, stance: Optional[str] = None) -> Dict[str, Any]:
+        """Posts ranked by Interest Index"""
+        posts = [p for p in self.posts if p.get('interest_index') is not None]
+        if stance:
+            stance = self._stance(stance)
+            posts = [p for p in posts if p.get('post_stance') == stance]
+        posts.sort(key=lambda p: p['interest_index'], reverse=True)
+        shown = posts[:self._top(top, DEFAULT_TOP)]
+
+        scope = f"{len(posts)} {STANCE_TITLES[stance]}" if stance else f"{len(posts)} posts"
+        return {
+            'type': 'horizontalBar',
+            'title': f"Posts por Interest Index (Top {len(shown)}, N={scope})",
+            'data': {
+                'labels': [f"#{p.get('rank', i + 1)} {p.get('username', '')}" for i, p in enumerate(shown)],
+                'datasets': [{
+                    'label': 'Interest Index',
+                    'data': [round(p['interest_index'], 2) for p in shown],
+                    'backgroundColor': PRIMARY_COLOR
+                }]
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # Parameter handling
+    # ------------------------------------------------------------------
+
+    def _filters(self, topic: Optional[str] = None, sentiment: Optional[str] = None,
+                 stance: Optional[str] = None, post: Optional[str] = None) -> Dict[str, str]:
+        """Validated analytics filters (ValueError on unknown values)"""
+        filters = {}
+        if topic:
+            filters['topic'] = self._topic(topic)
+        if sentiment:
+            if sentiment.lower() not in SENTIMENT_ALIASES:
+                raise ValueError(f"unknown sentiment {sentiment!r}")
+            filters['sentiment'] = SENTIMENT_ALIASES[sentiment.lower()]
+        if stance:
+            filters['stance'] = self._stance(stance)
+        if post:
+            if post not in self.engine.post_masks:
+                raise ValueError(f"unknown post {post!r}")
+            filters['post_id'] = post
+        return filters
+
+    def _topic(self, name: str) -> str:
+        topic = normalize_text(name.replace('_', ' ')).replace(' ', '_')
+        if topic not in self.engine.topic_masks:
+            raise ValueError(f"unknown topic {name!r}")
+        return topic
+
+    @staticmethod
+    def _stance(name: str) -> str:
+        if name.lower() not in STANCE_ALIASES:
+            raise ValueError(f"unknown stance {name!r}")
+        return STANCE_ALIASES[name.lower()]
+
+    @staticmethod
+    def _top(value: Optional[str], default: int) -> int:
+        return max(1, min(int(value), MAX_TOP)) if value else default
+
+    def _topic_counts(self, base: int) -> List[Tuple[str, int]]:
+        counts = [(topic, _popcount(base & mask)) for topic, mask in self.engine.topic_masks.items()]
+        return sorted(counts, key=lambda item: item[1], reverse=True)
+
+    def _scope(self, filters: Dict[str, str]) -> str:
+        """'comentarios sobre salud en posts desaprobatorios' etc. for titles"""
+        parts = ['comentarios']
+        if 'sentiment' in filters:
+            parts[0] = f"comentarios {SENTIMENT_LABELS[filters['sentiment']].lower()}"
+        if 'topic' in filters:
+            parts.append(f"sobre {topic_label(filters['topic']).lower()}")
+        if 'stance' in filters:
+            parts.append(f"en {STANCE_TITLES[filters['stance']]}")
+        if 'post_id' in filters:
+            parts.append(f"del post {filters['post_id']}")
+        if len(parts) == 1 and 'sentiment' not in filters:
+            parts.append('totales')
+        return ' '.join(parts)
+
+
+# Singleton instance
+_chart_builder = None
+
+
+def get_chart_builder() -> ChartBuilder:
+    """Get or create chart builder instance"""
+    global _chart_builder
+    if _chart_builder is None:
+        _chart_builder = ChartBuilder()
+    return _chart_builder
+
@@ -3,12 +3,26 @@ Chat API - Claude Haiku 3.5
 Full dataset (44K tokens) with Claude's 50K TPM limit
 """
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from typing import List, Dict
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-import anthropic
+
+# Cold-start profiling first, so it sees the imports below
+try:
+    from .profiling import get_cold_start_profile
+except ImportError:
+    import sys
+    sys.path.insert(0, os.path.dirname(__file__))
+    from profiling import get_cold_start_profile
+
+# Heavy work (anthropic SDK, dataset, indexes) happens on first use, not at import
+_profile = get_cold_start_profile()
 
 # Import full dataset loader
 try:
@@ -21,19 +35,85 @@ except ImportError:
     except:
         get_full_dataset_loader = None
 
+# Import smart filter (Option B retrieval) and local analytics
+try:
+    from .smart_filter import get_smart_filter
+    from .analytics_engine import get_analytics_engine
+    from .chart_builder import get_chart_builder
+    from .quote_verifier import QuoteStreamFilter, get_quote_verifier, summarize_quotes
+    from .post_router import LOCAL_MODEL, get_post_router
+    from .context_planner import get_context_planner
+except ImportError:
+    try:
+        from smart_filter import get_smart_filter
+        from analytics_engine import get_analytics_engine
+        from chart_builder import get_chart_builder
+        from quote_verifier import QuoteStreamFilter, get_quote_verifier, summarize_quotes
+        from post_router import LOCAL_MODEL, get_post_router
+        from context_planner import get_context_planner
+    except:
+        get_smart_filter = None
+        get_analytics_engine = None
+        get_chart_builder = None
+        get_quote_verifier = None
+        get_post_router = None
+        get_context_planner = None
+
+try:
+    from .streaming import CHART_TAG_PATTERN, ChartStreamSplitter, format_sse
+    from .anthropic_client import get_anthropic_client, is_rate_limit_error
+    from .response_cache import get_response_cache, make_request_key
+    from .single_flight import get_single_flight
+    from .rate_limiter import get_rate_limiter, estimate_tokens, RateLimitExceeded, Reservation
+    from .history import get_history_manager
+    from .log_writer import get_log_writer
+    from .usage_cost import estimate_cost, total_tokens
+except ImportError:
+    from streaming import CHART_TAG_PATTERN, ChartStreamSplitter, format_sse
+    from anthropic_client import get_anthropic_client, is_rate_limit_error
+    from response_cache import get_response_cache, make_request_key
+    from single_flight import get_single_flight
+    from rate_limiter import get_rate_limiter, estimate_tokens, RateLimitExceeded, Reservation
+    from history import get_history_manager
+    from log_writer import get_log_writer
+    from usage_cost import estimate_cost, total_tokens
+
+MODEL = "claude-3-5-haiku-20241022"  # Claude Haiku 3.5
+MAX_TOKENS = 2000
+TEMPERATURE = 0.7
+
+CACHE_ENABLED = os.environ.get('CHAT_CACHE_ENABLED', '1') != '0'
+RATE_LIMIT_ENABLED = os.environ.get('CHAT_RATE_LIMIT_ENABLED', '1') != '0'
+
+# Identical concurrent requests share one upstream call
+COALESCE_ENABLED = os.environ.get('CHAT_COALESCE_ENABLED', '1') != '0'
+COALESCE_MAX_WAIT = float(os.environ.get('CHAT_COALESCE_MAX_WAIT', '60'))
+
+# Post list / ranking questions are answered from the post table without the model
+LOCAL_ROUTER_ENABLED = os.environ.get('CHAT_LOCAL_ROUTER_ENABLED', '1') != '0'
+
+# 'auto' = context planner picks the tier per request; 'full' (Option A1),
+# 'filtered' (Option B), 'posts' or 'aggregates' force one tier
+CONTEXT_MODE = os.environ.get('CHAT_CONTEXT_MODE', 'auto')
+CONTEXT_MODE_TIERS = {'filtered': 'retrieved'}
+
+SOURCES = [{'source': 'Complete Dataset (1,580 comments, 86.4% extraction rate)', 'type': 'full_data'}]
+
 class handler(BaseHTTPRequestHandler):
     """Vercel serverless handler - Claude Haiku 3.5"""
     
     def do_POST(self):
         """Handle POST requests to /api/chat"""
         
-        # CORS headers
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
+        self._headers_sent = False
+        self._request_started = time.perf_counter()
+        self._history_stats = None
+        self._prompt_size = None
+        self._context_plan = None
+        self._upstream = {}
+        self._flight = None
+        self._quote_report = []
+        self._streaming = False
         
         try:
             # Read request body
@@ -46,7 +126,11 @@ class handler(BaseHTTPRequestHandler):
             conversation_history = data.get('conversation_history', [])
             session_id = data.get('session_id', 'default')
             
+            # Streaming is opt-in so old clients keep the JSON contract
+            stream = bool(data.get('stream')) or 'text/event-stream' in (self.headers.get('Accept') or '')
+            
             if not message:
+                self._send_headers('application/json')
                 response = {
                     'error': 'Message is required',
                     'response': '',
@@ -55,38 +139,97 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(response).encode())
                 return
             
-            # Load full dataset
-            full_context = ""
-            if get_full_dataset_loader is not None:
-                try:
-                    loader = get_full_dataset_loader()
-                    full_context = loader.create_compact_context()
-                    print(f"✓ Loaded full dataset: {len(full_context)} chars")
-                except Exception as e:
-                    print(f"Error loading full dataset: {e}")
-                    full_context = ""
+            # Structured post questions: answer locally in milliseconds
+            local_answer = self._route_locally(message)
+            if local_answer is not None:
+                self._send_local_answer(session_id, message, local_answer, stream)
+                return
             
-            # Build prompt with full dataset
+            # Build prompt: system prompt + static context are cacheable,
+            # only history and query-specific context change per request
             system_prompt = self._build_system_prompt()
-            user_prompt = self._build_user_prompt(message, full_context, conversation_history)
+            history, self._history_stats = get_history_manager().compact(conversation_history)
+            if self._history_stats['tokens_in']:
+                print(
+                    f"✓ History: kept ~{self._history_stats['tokens_kept']} tokens, "
+                    f"saved ~{self._history_stats['tokens_saved']} ({self._history_stats['messages_dropped']} messages dropped)"
+                )
             
-            # Generate response with Claude
-            try:
-                print(f"DEBUG: Generating response with Claude for: {message[:50]}...")
-                answer = self._generate_response(system_prompt, user_prompt)
-                print(f"DEBUG: Response generated, length: {len(answer)}")
-            except Exception as gen_error:
-                print(f"ERROR generating response: {str(gen_error)}")
-                import traceback
-                traceback.print_exc()
-                answer = f"I apologize, but I encountered an error: {str(gen_error)}"
+            # Pick the cheapest context tier that can answer this query
+            full_context, query_context = self._plan_context(
+                message, estimate_tokens(system_prompt) + estimate_tokens(self._build_user_prompt(message, history))
+            )
+            user_prompt = self._build_user_prompt(message, history, query_context)
+            self._prompt_size = self._measure_prompt(system_prompt, full_context, user_prompt)
+            
+            # Check response cache (same question, history, dataset and prompt)
+            cache = get_response_cache() if CACHE_ENABLED else None
+            cache_key = make_request_key(message, history, self._cache_version(system_prompt, full_context + query_context))
+            cached = None
+            if cache is not None:
+                cached = cache.get(cache_key)
+                print(f"✓ Response cache {'hit' if cached else 'miss'}")
+            
+            # Same request already in flight in this process: wait for its answer
+            coalesced = False
+            if cached is None and COALESCE_ENABLED:
+                cached = self._join_flight(cache_key)
+                coalesced = cached is not None
+            
+            # Admission control: queue for the token budget before any
+            # headers are sent so we can still answer 429 with Retry-After
+            reservation = None
+            if cached is None and RATE_LIMIT_ENABLED:
+                reservation = self._admit(system_prompt, full_context, user_prompt)
+            
+            if stream:
+                # CORS headers
+                self._send_headers('text/event-stream')
+                self._stream_response(
+                    session_id, message, system_prompt, full_context, user_prompt,
+                    cache_key if cache is not None else None, cached, reservation, coalesced
+                )
+                return
+            
+            # Generate response with Claude (JSON headers go out only once the
+            # answer or error is known, so an upstream 429 can still be a 503)
+            usage = {}
+            if cached is not None:
+                answer = cached['response']
+            else:
+                rate_limited = False
+                try:
+                    print(f"DEBUG: Generating response with Claude for: {message[:50]}...")
+                    answer, usage = self._generate_response(system_prompt, full_context, user_prompt)
+                    print(f"DEBUG: Response generated, length: {len(answer)}")
+                    if usage:
+                        answer = self._verify_quotes(answer)
+                    self._finish_flight({'response': answer, 'usage': usage} if usage else None)
+                except RateLimitExceeded:
+                    rate_limited = True
+                    raise
+                except Exception as gen_error:
+                    print(f"ERROR generating response: {str(gen_error)}")
+                    import traceback
+                    traceback.print_exc()
+                    answer = f"I apologize, but I encountered an error: {str(gen_error)}"
+                finally:
+                    if reservation is not None:
+                        self._settle(reservation, usage, rate_limited)
+                
+                # Only successful answers are cached (errors have no usage)
+                if cache is not None and usage:
+                    cache.set(cache_key, {'response': answer, 'usage': usage})
             
             # Log conversation
             try:
                 self._log_conversation(
                     session_id=session_id,
                     user_message=message,
-                    assistant_response=answer
+                    assistant_response=answer,
+                    usage=usage,
+                    cache_hit=cached is not None and not coalesced,
+                    coalesced=coalesced
                 )
             except Exception as log_error:
                 print(f"WARNING: Failed to log conversation: {log_error}")
@@ -94,12 +237,19 @@ class handler(BaseHTTPRequestHandler):
             # Send response
             response = {
                 'response': answer,
-                'sources': [{'source': 'Complete Dataset (1,580 comments, 86.4% extraction rate)', 'type': 'full_data'}],
-                'session_id': session_id
+                'charts': self._charts_in(answer),
+                'sources': SOURCES,
+                'session_id': session_id,
+                'cache': self._cache_status(cached, coalesced)
             }
             
+            self._send_headers('application/json')
             self.wfile.write(json.dumps(response).encode())
             
+        except RateLimitExceeded as e:
+            print(f"WARNING: Rate limited ({e.status}), retry after {e.retry_after}s")
+            self._send_rate_limited(e)
+            
         except Exception as e:
             print(f"ERROR in chat handler: {str(e)}")
             import traceback
@@ -110,32 +260,367 @@ class handler(BaseHTTPRequestHandler):
                 'response': 'Sorry, there was an error processing your request.',
                 'sources': []
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            try:
+                if not self._headers_sent:
+                    self._send_headers('application/json')
+                    self.wfile.write(json.dumps(error_response).encode())
+                elif self._streaming:
+                    # Already streaming: report the error as an event
+                    self.wfile.write(format_sse('error', error_response))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        
+        finally:
+            # Never leave followers waiting on a leader that failed
+            self._finish_flight(None)
+    
+    def _route_locally(self, message: str) -> Optional[str]:
+        """Answer from the post router, or None to ask the model"""
+        if not LOCAL_ROUTER_ENABLED or get_post_router is None:
+            return None
+        try:
+            started = time.perf_counter()
+            answer = get_post_router().route(message)
+        except Exception as e:
+            print(f"WARNING: Post router failed, using the model: {e}")
+            return None
+        if answer is not None:
+            self._upstream = {'model': LOCAL_MODEL, 'latency_ms': round((time.perf_counter() - started) * 1000)}
+        return answer
+    
+    def _send_local_answer(self, session_id: str, message: str, answer: str, stream: bool):
+        """Send a locally computed answer through the same JSON / SSE contract"""
+        print(f"✓ Answered locally ({self._upstream.get('latency_ms')} ms): {message[:50]}")
+        payload = {
+            'response': answer,
+            'sources': SOURCES,
+            'session_id': session_id,
+            'cache': 'local'
+        }
+        if stream:
+            self._send_headers('text/event-stream')
+            try:
+                self._send_event('delta', {'text': answer})
+                self._send_event('done', dict(payload, usage={}))
+            except (BrokenPipeError, ConnectionResetError):
+                print(f"WARNING: Client disconnected during stream: {session_id}")
+        else:
+            self._send_headers('application/json')
+            self.wfile.write(json.dumps(dict(payload, charts=[])).encode())
+        
+        try:
+            self._log_conversation(session_id=session_id, user_message=message, assistant_response=answer)
+        except Exception as log_error:
+            print(f"WARNING: Failed to log conversation: {log_error}")
+    
+    def _join_flight(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Become the leader for key, or wait for the identical in-flight request
+        
+        Returns the leader's {'response', 'usage'} for a follower, None for the
+        leader (and for a follower whose leader failed or timed out, which then
+        makes its own call).
+        """
+        flight = get_single_flight()
+        call, leader = flight.join(key)
+        if leader:
+            self._flight = call
+            return None
+        print("✓ Identical request in flight, waiting for its answer")
+        return call.wait(COALESCE_MAX_WAIT)
+    
+    def _finish_flight(self, result: Optional[Dict[str, Any]]):
+        """Publish the leader's result (None = failed) to waiting followers"""
+        if getattr(self, '_flight', None) is not None:
+            get_single_flight().finish(self._flight, result)
+            self._flight = None
+    
+    def _cache_status(self, cached: Optional[Dict[str, Any]], coalesced: bool) -> str:
+        """'coalesced', 'hit' or 'miss' for the response payload"""
+        if coalesced:
+            return 'coalesced'
+        return 'hit' if cached is not None else 'miss'
     
     def do_OPTIONS(self):
         """Handle OPTIONS requests (CORS preflight)"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Accept')
         self.end_headers()
     
+    def _send_headers(self, content_type: str, status: int = 200, extra_headers: Optional[Dict[str, str]] = None):
+        """Send status line, content type and CORS headers"""
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        if content_type == 'text/event-stream':
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('X-Accel-Buffering', 'no')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Accept')
+        self.end_headers()
+        self._headers_sent = True
+        self._streaming = content_type == 'text/event-stream'
+    
+    def _send_rate_limited(self, error: RateLimitExceeded):
+        """Answer 429 (our queue is full) or 503 (upstream limit) with Retry-After"""
+        response = {
+            'error': 'rate_limited',
+            'response': self._rate_limit_message(error.retry_after),
+            'retry_after': error.retry_after,
+            'sources': []
+        }
+        try:
+            if not self._headers_sent:
+                self._send_headers('application/json', status=error.status, extra_headers={
+                    'Retry-After': str(error.retry_after),
+                    'Access-Control-Expose-Headers': 'Retry-After'
+                })
+                self.wfile.write(json.dumps(response).encode())
+            elif self._streaming:
+                self.wfile.write(format_sse('error', response))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    def _plan_context(self, message: str, overhead_tokens: int) -> Tuple[str, str]:
+        """
+        (cacheable context, query context) from the context planner
+        
+        The per-minute budget is what the token bucket could admit within
+        the queue wait, so a big tier is not chosen only to be refused.
+        """
+        if get_context_planner is None:
+            return "", ""
+        try:
+            with _profile.phase('data_load'):
+                get_full_dataset_loader()
+            with _profile.phase('analytics_build'):
+                get_analytics_engine()
+            minute_budget = None
+            if RATE_LIMIT_ENABLED:
+                limiter = get_rate_limiter()
+                minute_budget = limiter.available(within=limiter.max_wait)['input']
+            forced = None if CONTEXT_MODE == 'auto' else CONTEXT_MODE_TIERS.get(CONTEXT_MODE, CONTEXT_MODE)
+            with _profile.phase('context_build'):
+                plan = get_context_planner().plan(message, overhead_tokens, minute_budget, tier=forced)
+        except Exception as e:
+            print(f"Error planning context: {e}")
+            return "", ""
+        
+        self._context_plan = plan.summary()
+        flags = ' (degraded)' if plan.degraded else ' (over budget)' if plan.over_budget else ''
+        print(
+            f"✓ Context tier: {plan.tier}{flags}, ~{plan.estimated_tokens:,} tokens "
+            f"(full: ~{plan.estimates['full']:,}, needs: {', '.join(sorted(plan.needs)) or 'none'})"
+        )
+        return plan.static, plan.dynamic
+    
+    def _measure_prompt(self, system_prompt: str, full_context: str, user_prompt: str) -> Dict[str, int]:
+        """Prompt size in characters per part and estimated input tokens"""
+        return {
+            'system_chars': len(system_prompt),
+            'context_chars': len(full_context),
+            'user_chars': len(user_prompt),
+            'estimated_tokens': estimate_tokens(system_prompt) + estimate_tokens(full_context) + estimate_tokens(user_prompt)
+        }
+    
+    def _admit(self, system_prompt: str, full_context: str, user_prompt: str) -> Reservation:
+        """Wait for room in the shared token bucket (raises RateLimitExceeded)"""
+        input_estimate = (self._prompt_size or self._measure_prompt(system_prompt, full_context, user_prompt))['estimated_tokens']
+        reservation = get_rate_limiter().acquire(input_estimate, MAX_TOKENS)
+        if reservation.waited > 0.1:
+            print(f"✓ Admitted after {reservation.waited:.1f}s in queue (~{input_estimate} input tokens)")
+        return reservation
+    
+    def _settle(self, reservation: Reservation, usage: Dict[str, int], rate_limited: bool = False):
+        """
+        Correct the token buckets once a call is over
+        
+        Real usage is reconciled; a call that failed without usage consumed
+        nothing and gives its reservation back, except after an upstream
+        rate limit, where the buckets were drained on purpose.
+        """
+        try:
+            if usage:
+                get_rate_limiter().reconcile(reservation, usage)
+            elif not rate_limited:
+                get_rate_limiter().release(reservation)
+        except Exception as e:
+            print(f"WARNING: Failed to settle token reservation: {e}")
+    
+    def _build_chart(self, tag: str) -> Optional[Dict[str, Any]]:
+        """Chart spec for a [CHART:...] tag from the model (None if it can't be built)"""
+        if get_chart_builder is None:
+            return None
+        try:
+            return get_chart_builder().build_from_tag(tag)
+        except Exception as e:
+            print(f"WARNING: Chart build failed for {tag}: {e}")
+            return None
+    
+    def _verify_quotes(self, answer: str) -> str:
+        """Repair or mark quoted comments that aren't verbatim from the dataset"""
+        if get_quote_verifier is None:
+            return answer
+        try:
+            with _profile.phase('quote_index_build'):
+                verifier = get_quote_verifier()
+            answer, self._quote_report = verifier.verify(answer)
+        except Exception as e:
+            print(f"WARNING: Quote verification failed: {e}")
+            return answer
+        self._print_quote_summary()
+        return answer
+    
+    def _quote_filter(self) -> Optional['QuoteStreamFilter']:
+        """Stream filter that verifies quotes before they are sent (None if unavailable)"""
+        if get_quote_verifier is None:
+            return None
+        try:
+            with _profile.phase('quote_index_build'):
+                return QuoteStreamFilter(get_quote_verifier())
+        except Exception as e:
+            print(f"WARNING: Quote verification unavailable: {e}")
+            return None
+    
+    def _print_quote_summary(self):
+        summary = summarize_quotes(self._quote_report)
+        if summary['total']:
+            print(
+                f"✓ Quotes: {summary['total']} checked, {summary['repaired']} repaired, "
+                f"{summary['fabricated']} not found in dataset"
+            )
+    
+    def _charts_in(self, answer: str) -> List[Dict[str, Any]]:
+        """Charts requested in a complete answer, in order"""
+        charts = (self._build_chart(match.group(0)) for match in CHART_TAG_PATTERN.finditer(answer))
+        return [chart for chart in charts if chart is not None]
+    
+    def _send_event(self, event: str, data: Dict[str, Any]):
+        """Write one Server-Sent Event and flush it to the client"""
+        self.wfile.write(format_sse(event, data))
+        self.wfile.flush()
+    
+    def _stream_response(
+        self,
+        session_id: str,
+        message: str,
+        system_prompt: str,
+        full_context: str,
+        user_prompt: str,
+        cache_key: Optional[str] = None,
+        cached: Optional[Dict[str, Any]] = None,
+        reservation: Optional[Reservation] = None,
+        coalesced: bool = False
+    ):
+        """
+        Stream the answer as Server-Sent Events
+        
+        Events: 'delta' (text), 'chart' (complete chart spec), 'error' and a
+        final 'done' carrying the full response. The conversation is logged
+        once the stream has ended. Cached and coalesced answers are replayed
+        through the same events.
+        """
+        splitter = ChartStreamSplitter(self._build_chart)
+        parts = []
+        usage = {}
+        client_gone = False
+        rate_limited = False
+        
+        try:
+            if cached is not None:
+                parts.append(cached['response'])
+                for event, payload in splitter.feed(cached['response']):
+                    self._send_event(event, payload)
+            else:
+                print(f"DEBUG: Streaming response with Claude for: {message[:50]}...")
+                client = self._get_client()
+                quotes = self._quote_filter()
+                started = time.perf_counter()
+                with client.messages.stream(**self._request_params(system_prompt, full_context, user_prompt)) as stream:
+                    for text in stream.text_stream:
+                        if 'first_token_ms' not in self._upstream:
+                            self._upstream['first_token_ms'] = round((time.perf_counter() - started) * 1000)
+                        if quotes is not None:
+                            text = quotes.feed(text)
+                        parts.append(text)
+                        for event, payload in splitter.feed(text):
+                            self._send_event(event, payload)
+                    final_message = stream.get_final_message()
+                    usage = self._extract_usage(final_message)
+                self._record_upstream(final_message, started)
+                if quotes is not None:
+                    tail = quotes.flush()
+                    parts.append(tail)
+                    for event, payload in splitter.feed(tail):
+                        self._send_event(event, payload)
+                    self._quote_report = quotes.report
+                    self._print_quote_summary()
+            
+            for event, payload in splitter.flush():
+                self._send_event(event, payload)
+            
+        except (BrokenPipeError, ConnectionResetError):
+            client_gone = True
+            print(f"WARNING: Client disconnected during stream: {session_id}")
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            import traceback
+            traceback.print_exc()
+            if is_rate_limit_error(e):
+                get_rate_limiter().drain()
+                rate_limited = True
+            parts = [self._error_message(e)]
+            try:
+                self._send_event('error', {'error': str(e)[:200], 'response': parts[0], 'sources': []})
+            except (BrokenPipeError, ConnectionResetError):
+                client_gone = True
+        
+        answer = ''.join(parts)
+        
+        # Followers only get complete answers (an interrupted stream is partial)
+        self._finish_flight({'response': answer, 'usage': usage} if usage and not client_gone else None)
+        
+        if reservation is not None:
+            self._settle(reservation, usage, rate_limited)
+        
+        # Only complete, successful answers are cached
+        if cache_key and usage and not client_gone:
+            get_response_cache().set(cache_key, {'response': answer, 'usage': usage})
+        
+        if not client_gone:
+            try:
+                self._send_event('done', {
+                    'response': answer,
+                    'sources': SOURCES,
+                    'session_id': session_id,
+                    'usage': usage,
+                    'cache': self._cache_status(cached, coalesced)
+                })
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        
+        print(f"DEBUG: Stream finished, length: {len(answer)}")
+        
+        try:
+            self._log_conversation(
+                session_id=session_id,
+                user_message=message,
+                assistant_response=answer,
+                usage=usage,
+                cache_hit=cached is not None and not coalesced,
+                coalesced=coalesced
+            )
+        except Exception as log_error:
+            print(f"WARNING: Failed to log conversation: {log_error}")
+    
     def _build_system_prompt(self) -> str:
         """Build system prompt for Claude"""
         
-        return """⚠️ CRITICAL SYSTEM CONSTRAINT ⚠️
-
-IF YOU MODIFY, PARAPHRASE, OR CLEAN UP ANY COMMENT TEXT, THE ENTIRE RESPONSE WILL BE REJECTED.
-
-You MUST copy comment text EXACTLY character-by-character from the dataset.
-
-ANY deviation (adding punctuation, fixing spelling, changing caps, adding accents) = FAILURE.
-
-This is a HARD CONSTRAINT. Your response will be validated against the source data.
-
-═══════════════════════════════════════════════════════════════════════════════
-
-You are an expert AI assistant specialized in the Presupuesto 2026 TikTok analysis project.
+        return """You are an expert AI assistant specialized in the Presupuesto 2026 TikTok analysis project.
 
 You have access to the COMPLETE DATASET of ALL 1,580 comments extracted from TikTok posts about Guatemala's 2026 budget (86.4% extraction rate from 1,828 available comments).
 
@@ -185,7 +670,6 @@ Users commonly request these types. Excel at these, but remain flexible:
    - "9.5%" ❌ (missing absolute count)
    - "De 150 comentarios sobre salud: 90% negativos (135 comentarios)" ✅ BOTH
    
-   **For graphs: If showing percentages, ALSO show absolute values in labels or separate graph**
 
 4. **Sentiment by Topic** - Filter then calculate sentiment
    **MANDATORY FORMAT when user asks about topics:**
@@ -219,167 +703,53 @@ Users commonly request these types. Excel at these, but remain flexible:
 11. **Graph Recommendations** - Suggest appropriate chart types
 12. **Flexible Topic Matching** - Use semantic understanding
 
-=== CHART GENERATION (IMPORTANT!) ===
-
-When users request charts, graphs, or visualizations, you MUST provide:
-1. Brief textual summary
-2. Chart specification in JSON format wrapped in EXACT markers: [CHART_START] ... [CHART_END]
-
-**CRITICAL: Use ONLY this EXACT JSON format (no text-based ASCII charts!):**
+=== CHARTS (IMPORTANT!) ===
 
-[CHART_START]
-{
-    "type": "bar|horizontalBar|line|pie|doughnut",
-    "title": "Chart Title",
-    "data": {
-        "labels": ["Label1", "Label2", "Label3"],
-        "datasets": [{
-            "label": "Dataset Name",
-            "data": [value1, value2, value3],
-            "backgroundColor": "#667eea"
-        }]
-    }
-}
-[CHART_END]
-
-**CRITICAL MARKER RULES:**
-- Start marker: [CHART_START] (no forward slash)
-- End marker: [CHART_END] (no forward slash, NOT [/CHART_END])
-- Markers must be EXACTLY as shown above
-- Any variation will break chart rendering
-
-**IMPORTANT RULES:**
-- Do NOT include "options" field - it will break rendering
-- Do NOT include "indexAxis" - the type "horizontalBar" handles this
-- Do NOT include callback functions - they won't work in JSON
-- Keep it simple: type, title, data only
-- backgroundColor can be a single color or array of colors
-
-**Chart Type Guidelines:**
-- **horizontalBar**: Best for rankings, long labels (like topic names)
-- **bar**: Good for comparisons, short labels
-- **pie/doughnut**: Good for proportions (3-7 categories max)
-- **line**: Good for trends over time
-
-**For horizontal bar charts (rankings), bars MUST be aligned left!**
-
-**Example - Topic Frequency (Horizontal Bar):**
-[CHART_START]
-{
-    "type": "horizontalBar",
-    "title": "Tópicos Más Mencionados (N=1,580 comentarios totales)",
-    "data": {
-        "labels": ["Corrupción", "Falta de Obras", "Crítica a Arévalo"],
-        "datasets": [{
-            "label": "Frecuencia",
-            "data": [229, 150, 120],
-            "backgroundColor": "#667eea"
-        }]
-    }
-}
-[CHART_END]
+Charts are built by the server from exact counts. NEVER write chart JSON, label/data
+arrays or ASCII bar charts (█████). To show a chart, write a brief textual summary
+and put ONE tag per chart on its own line:
 
-**CRITICAL: ALL CHARTS MUST INCLUDE N (SAMPLE SIZE) IN TITLE**
-- Format: "Title (N=X comentarios)"
-- Example: "Sentimiento por Tópico (N=150 comentarios sobre salud)"
-- Example: "Principales Temas (N=1,580 comentarios totales)"
-- This is MANDATORY for scientific rigor and user clarity
+[CHART:sentiment]                              Sentiment distribution (all comments)
+[CHART:sentiment topic=salud]                  ...within a topic (also stance=, post=<PostID>)
+[CHART:topics]                                 Most mentioned topics (also sentiment=, stance=, top=)
+[CHART:sentiment_by_topic]                     Sentiment per topic (also topics=salud,educacion stance=)
+[CHART:stance]                                 Sentiment on approving vs disapproving posts (also topic=)
+[CHART:posts_by_interest top=10]               Posts ranked by Interest Index (also stance=)
 
-**NEVER use text-based ASCII bar charts (█████). ALWAYS use JSON format above.**
+Topics: salud, educacion, infraestructura, transporte, corrupcion, impuestos, pobreza,
+congreso, presidente, seguridad, empleo, vivienda, canasta_basica
+sentiment=negative|positive|neutral  stance=approving|disapproving
 
-=== POST LIST FORMATTING (IMPORTANT!) ===
+The chart title already includes N (sample size). If no tag fits the request,
+answer with a table instead of a chart.
 
-When users ask for a list of posts ("lista de posts", "show me posts", "which posts", etc.),
-you MUST format them as CLICKABLE LINKS with metadata:
+=== POST LIST FORMATTING ===
 
-**MANDATORY FORMAT:**
+Plain post lists and rankings are answered by the server. When an answer of yours
+mentions specific posts, format each one as:
 
-**[Rank #X] @username - [Description from data]**
+**[Rank #X] @username - [Description, truncated naturally]**
 🔗 https://www.tiktok.com/@username/video/[PostID]
 📊 Interest Index: X.XX | 👁️ Views: XXX,XXX (as of [Date]) | Stance: [Approving/Disapproving]
 
-**EXAMPLE (CORRECT FORMAT):**
-
-**[Rank #1] @mynoralfonsodelar - En el proyecto del #Presupuesto2026 el Gobierno de Guatemala contempla "ser accionista" de un banco...**
-🔗 https://www.tiktok.com/@mynoralfonsodelar/video/7549594215097896198
-📊 Interest Index: 12.79 | 👁️ Views: 112,800 (as of October 30, 2025) | Stance: Disapproving
-
-**[Rank #2] @mynoralfonsodelar - Análisis del presupuesto nacional 2026**
-🔗 https://www.tiktok.com/@mynoralfonsodelar/video/7559053211240353080
-📊 Interest Index: 5.93 | 👁️ Views: 35,300 (as of October 30, 2025) | Stance: Disapproving
-
-**NOTE:** Use the Description field from the post data. If description is too long, truncate naturally.
-
-**CRITICAL RULES:**
-✅ ALWAYS include full clickable URL (https://www.tiktok.com/@username/video/PostID)
-✅ ALWAYS include Interest Index if available
-✅ ALWAYS include view count WITH DATE (e.g., "112,800 (as of October 30, 2025)")
-✅ ALWAYS include stance (Approving/Disapproving)
-✅ Use emojis for visual clarity (🔗 📊 👁️)
-✅ Bold the rank and username for readability
-
-❌ NEVER show just PostID numbers without URLs
-❌ NEVER omit metadata (Interest Index, views, stance, date)
-❌ NEVER show view counts without the "as of [date]" qualifier
-❌ NEVER use plain text lists without formatting
-
-**If user asks for "all posts" or "lista completa", show ALL 20 posts in this format.**
-
 === CRITICAL RULES (MUST FOLLOW!) ===
 
 1. **USE COMPLETE DATASET**: All 1,580 comments available (86.4% extraction rate)
 
-2. **REAL COMMENTS ONLY - ZERO TOLERANCE FOR MODIFICATION**:
-   
-   ╔═══════════════════════════════════════════════════════════════════════════╗
-   ║                    ⚠️  THIS IS CRITICAL - READ CAREFULLY ⚠️                ║
-   ║                                                                           ║
-   ║  When showing comment examples, you MUST copy the EXACT text             ║
-   ║  character-by-character from the dataset.                                ║
-   ║                                                                           ║
-   ║  DO NOT "help" by cleaning up the text. DO NOT fix anything.            ║
-   ║  Copy EXACTLY as it appears, including all errors.                       ║
-   ╚═══════════════════════════════════════════════════════════════════════════╝
-   
-   **WHAT "EXACT" MEANS:**
-   - Copy EVERY character including spelling errors, typos, missing accents
-   - Keep ALL CAPS if the comment is in ALL CAPS
-   - Keep lowercase if the comment is lowercase
-   - Keep emojis, punctuation, spaces EXACTLY as they appear
-   - Keep incomplete words, abbreviations, slang EXACTLY as written
-   - Keep grammatical errors EXACTLY as they appear
-   
-   **EXAMPLES OF WHAT IS FORBIDDEN:**
-   
-   ❌ FORBIDDEN: "Puro robo, todo se lo roban" (cleaned up)
-   ✅ CORRECT: "puro robo todo se lo roban" (if that's how it appears)
-   
-   ❌ FORBIDDEN: "Corruptos! Se aumentan el sueldo" (corrected)
-   ✅ CORRECT: "corruptos se aumentan el sueldo" (if that's how it appears)
+2. **REAL COMMENTS ONLY - COPY VERBATIM**:
+   Comment examples MUST be copied character-by-character from the dataset, with
+   every typo, missing accent, capitalization, emoji and punctuation mark as-is.
+   Quotes are checked against the dataset before the answer is sent: altered
+   quotes are replaced with the original and invented ones are flagged.
    
    ❌ FORBIDDEN: "Qué vergüenza de congreso" (added accent)
    ✅ CORRECT: "que verguenza de congreso" (if missing accent in original)
    
-   ❌ FORBIDDEN: "Se roban todo y nadie hace nada" (paraphrased)
-   ✅ CORRECT: Must use EXACT text from dataset, not similar phrases
-   
-   **ABSOLUTELY FORBIDDEN:**
-   ❌ Creating example comments that aren't in the dataset
-   ❌ Paraphrasing or "cleaning up" real comments
-   ❌ Correcting spelling, grammar, or punctuation
-   ❌ Adding or removing capitalization
-   ❌ Adding or removing accents (á, é, í, ó, ú, ñ)
-   ❌ Translating or explaining what a comment means
-   ❌ Using "typical phrases" or "ejemplos generales"
-   ❌ Combining multiple comments into one
-   ❌ Removing emojis or special characters
-   
-   **ONLY EXCEPTION:**
-   If user explicitly asks "dame una idea de frases típicas" (asking for typical phrases, not examples)
+   Never invent, paraphrase, combine or translate comments. Only if the user
+   explicitly asks for "frases típicas" may you write non-verbatim phrases.
    
    **IF YOU CANNOT FIND AN EXACT COMMENT:**
    Say: "No encontré comentarios con ese texto exacto. ¿Quieres que busque comentarios sobre [tema]?"
-   Do NOT make up or paraphrase similar comments.
 
 3. **HANDLE GUATEMALAN SPANISH & POOR ORTHOGRAPHY**:
    - Comments contain spelling errors, incomplete words, slang
@@ -393,6 +763,9 @@ you MUST format them as CLICKABLE LINKS with metadata:
      * Misspellings: "govierno" = "gobierno", "prezidente" = "presidente"
 
 4. **ACCURATE STATISTICS**: Count from actual data, be precise
+   **If an "ESTADÍSTICAS EXACTAS" section is present, those numbers were computed
+   exactly from the dataset: use them AS-IS (counts, percentages, probabilities)
+   and do NOT recount. Only write the analysis around them.**
    **ALWAYS CLARIFY DENOMINATORS:**
    - Bad: "20% son negativos" (20% of what?)
    - Good: "20% del total de 1,580 comentarios"
@@ -457,15 +830,8 @@ you MUST format them as CLICKABLE LINKS with metadata:
 
 **FORBIDDEN ACTIONS (WILL RESULT IN INCORRECT ANALYSIS):**
 
-**COMMENT DISPLAY (ZERO TOLERANCE - MOST CRITICAL):**
-❌ Creating example comments that aren't in the dataset
-❌ Paraphrasing or "cleaning up" real comments
-❌ Correcting spelling, grammar, punctuation, or capitalization in comments
-❌ Adding or removing accents in comments (á, é, í, ó, ú, ñ)
-❌ Removing emojis or special characters from comments
-❌ Using generic placeholder comments
-❌ Combining or summarizing multiple comments
-❌ Translating comments without showing original text first
+**COMMENT DISPLAY:**
+❌ Creating, paraphrasing, correcting or combining comments
 
 **TOPIC ANALYSIS:**
 ❌ Ignoring comments with spelling errors
@@ -474,7 +840,7 @@ you MUST format them as CLICKABLE LINKS with metadata:
 ❌ Omitting percentages when showing topic counts
 
 **DATA PRESENTATION:**
-❌ Creating charts without N (sample size) in title
+❌ Writing chart JSON or data arrays instead of a [CHART:...] tag
 ❌ Showing statistics without clarifying denominators
 
 === RESPONSE STYLE ===
@@ -486,60 +852,72 @@ you MUST format them as CLICKABLE LINKS with metadata:
 - Acknowledge extreme negativity (95.8%)
 - Provide context and insights
 
-=== FINAL CRITICAL REMINDER ===
-
-**WHEN SHOWING COMMENT EXAMPLES:**
-
-You have the COMPLETE, RAW text of all 1,580 comments in the dataset above.
+=== FORMAT FOR SHOWING COMMENTS ===
 
-When a user asks for comment examples, you MUST:
-1. Search the dataset for relevant comments
-2. Copy the EXACT text character-by-character
-3. Put the comment in quotes to show it's verbatim: "[SENTIMENT] \"exact text here\""
-4. Include ALL spelling errors, typos, slang, emojis, capitalization AS-IS
-5. NEVER correct, clean, or paraphrase
-
-**FORMAT FOR SHOWING COMMENTS (REAL EXAMPLES FROM DATASET):**
-
-✅ CORRECT (exact copy):
-[NEGATIVE] "carreteras en pésimo estado"
-[NEGATIVE] "Y LAS CARRETERAS ??? DESTRUIDAS, PUENTES, EL PUERTO QUETZAL UNA SOLA GRUA DE 5 QUE SON. ..... Nadie cree eso"
+One comment per line, sentiment tag first, exact text in double quotes:
 [NEGATIVE] "no ay seguridad no ay carreteras no ay justicia este tipo es titere"
 [NEGATIVE] "descarado ladron, ni un km de carretera, más inseguridad"
-[NEGATIVE] "para eso si soz lista corrupta pero las carreteras y todo el pais echo pedazos"
-
-❌ WRONG (modified/cleaned):
-[NEGATIVE] "Las carreteras están en pésimo estado" (added capitals, article)
-[NEGATIVE] "Las carreteras están destruidas" (simplified, cleaned)
-[NEGATIVE] "No hay seguridad, no hay carreteras" (corrected "ay"→"hay", added commas)
-[NEGATIVE] "Descarado ladrón, ni un km de carretera" (corrected "ladron"→"ladrón")
-[NEGATIVE] "Las carreteras y todo el país está hecho pedazos" (corrected "echo"→"hecho")
 
-**THIS IS NON-NEGOTIABLE.**
-
-If you cannot find a comment, say so. Do NOT create or modify comments.
+If you cannot find a comment, say so.
 
 Remember: You have COMPLETE access to ALL 1,580 comments (86.4% extraction rate from 1,828 available). Use this to provide comprehensive, accurate analysis with REAL, UNMODIFIED comment examples."""
     
+    def _build_system_blocks(self, system_prompt: str, full_context: str) -> List[Dict[str, Any]]:
+        """
+        Build system content blocks with prompt caching markers
+        
+        The system prompt and the dataset never change between requests, so
+        they are sent as separate cacheable blocks. They MUST stay
+        byte-identical across requests or the cache prefix is invalidated.
+        """
+        blocks = [{
+            "type": "text",
+            "text": system_prompt,
+            "cache_control": {"type": "ephemeral"}
+        }]
+        
+        if full_context:
+            blocks.append({
+                "type": "text",
+                "text": full_context,
+                "cache_control": {"type": "ephemeral"}
+            })
+        
+        return blocks
+    
+    def _cache_version(self, system_prompt: str, full_context: str) -> str:
+        """Hash of model, prompt and dataset - part of every response cache key"""
+        digest = hashlib.sha256()
+        for part in (MODEL, str(TEMPERATURE), system_prompt, full_context):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()[:16]
+    
     def _build_user_prompt(
         self,
         query: str,
-        full_context: str,
-        conversation_history: List[Dict[str, str]]
+        conversation_history: List[Dict[str, str]],
+        query_context: str = ""
     ) -> str:
-        """Build user prompt with dataset and history"""
+        """
+        Build user prompt with history and query
+        
+        The full dataset lives in the cached system blocks; query-specific
+        context (exact local statistics, retrieved comments) goes here.
+        conversation_history is expected to be compacted already (see history.py).
+        """
         
         parts = []
         
-        # Add full dataset
-        if full_context:
-            parts.append(full_context)
+        # Add query-specific context (not cacheable)
+        if query_context:
+            parts.append(query_context)
             parts.append("")
         
         # Add conversation history
         if conversation_history:
             parts.append("=== CONVERSATION HISTORY ===")
-            for msg in conversation_history[-4:]:
+            for msg in conversation_history:
                 role = msg.get('role', 'user')
                 content = msg.get('content', '')
                 parts.append(f"{role.upper()}: {content}")
@@ -550,37 +928,81 @@ Remember: You have COMPLETE access to ALL 1,580 comments (86.4% extraction rate
         
         return "\n".join(parts)
     
-    def _generate_response(self, system_prompt: str, user_prompt: str) -> str:
-        """Generate response with Claude Haiku 3.5"""
+    def _generate_response(self, system_prompt: str, full_context: str, user_prompt: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Generate response with Claude Haiku 3.5
+        
+        Returns (answer, usage). Usage is empty when the call failed.
+        """
         
         try:
-            api_key = os.environ.get('ANTHROPIC_API_KEY')
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY environment variable is not set")
+            client = self._get_client()
             
-            client = anthropic.Anthropic(api_key=api_key)
+            started = time.perf_counter()
+            message = client.messages.create(**self._request_params(system_prompt, full_context, user_prompt))
+            self._record_upstream(message, started)
             
-            message = client.messages.create(
-                model="claude-3-5-haiku-20241022",  # Claude Haiku 3.5
-                max_tokens=2000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
+            usage = self._extract_usage(message)
+            print(
+                f"✓ Tokens: in={usage['input_tokens']} out={usage['output_tokens']} "
+                f"cache_write={usage['cache_creation_input_tokens']} cache_read={usage['cache_read_input_tokens']}"
             )
             
-            return message.content[0].text
+            return message.content[0].text, usage
             
         except Exception as e:
-            error_str = str(e)
-            print(f"Error generating response: {error_str}")
+            print(f"Error generating response: {str(e)}")
+            if is_rate_limit_error(e):
+                # Upstream says we are over the limit: share that with other workers
+                get_rate_limiter().drain()
+                raise RateLimitExceeded(self._retry_after(e), status=503)
             import traceback
             traceback.print_exc()
-            
-            # Handle rate limit errors with friendly message
-            if 'rate_limit' in error_str.lower() or '429' in error_str:
-                return """⏱️ **Rate Limit Reached**
+            return self._error_message(e), {}
+    
+    def _get_client(self) -> 'anthropic.Anthropic':
+        """Get the shared Anthropic client (pooled connections across invocations)"""
+        with _profile.phase('client_setup'):
+            return get_anthropic_client()
+    
+    def _request_params(self, system_prompt: str, full_context: str, user_prompt: str) -> Dict[str, Any]:
+        """Shared parameters for messages.create and messages.stream"""
+        return {
+            'model': MODEL,
+            'max_tokens': MAX_TOKENS,
+            'temperature': TEMPERATURE,
+            'system': self._build_system_blocks(system_prompt, full_context),
+            'messages': [
+                {"role": "user", "content": user_prompt}
+            ]
+        }
+    
+    def _retry_after(self, error: Exception) -> float:
+        """Retry-After advertised by the upstream error (default: one minute)"""
+        try:
+            return float(error.response.headers.get('retry-after', 60))
+        except (AttributeError, TypeError, ValueError):
+            return 60.0
+    
+    def _rate_limit_message(self, retry_after: int) -> str:
+        """User-facing message when a request could not be admitted"""
+        return f"""⏱️ **Rate Limit Reached**
+
+The system is at its rate limit (50,000 tokens per minute) and your question could not be queued.
+
+**Please try again in about {retry_after} seconds.**
+
+This happens when multiple queries are processed simultaneously. The limit resets every minute.
+
+Thank you for your patience! 🙏"""
+    
+    def _error_message(self, error: Exception) -> str:
+        """User-facing message for a failed Claude call"""
+        error_str = str(error)
+        
+        # Handle rate limit errors with friendly message
+        if 'rate_limit' in error_str.lower() or '429' in error_str:
+            return """⏱️ **Rate Limit Reached**
 
 The system has temporarily reached its rate limit (50,000 tokens per minute).
 
@@ -589,41 +1011,94 @@ The system has temporarily reached its rate limit (50,000 tokens per minute).
 This happens when multiple queries are processed simultaneously. The limit resets every minute.
 
 Thank you for your patience! 🙏"""
-            
-            # Handle other errors
-            return f"I apologize, but I encountered an error processing your request. Please try again in a moment. If the problem persists, contact support.\n\nError details: {error_str[:200]}"
+        
+        # Handle other errors
+        return f"I apologize, but I encountered an error processing your request. Please try again in a moment. If the problem persists, contact support.\n\nError details: {error_str[:200]}"
+    
+    def _record_upstream(self, message, started: float):
+        """Model, stop reason and latency of the upstream call (for the log)"""
+        self._upstream.update({
+            'model': getattr(message, 'model', None) or MODEL,
+            'stop_reason': getattr(message, 'stop_reason', None),
+            'latency_ms': round((time.perf_counter() - started) * 1000)
+        })
+    
+    def _extract_usage(self, message) -> Dict[str, int]:
+        """Extract token usage (including prompt cache counters) from a Claude response"""
+        usage = getattr(message, 'usage', None)
+        return {
+            'input_tokens': getattr(usage, 'input_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'output_tokens', 0) or 0,
+            'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+            'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0
+        }
+    
+    def _dataset_size(self) -> int:
+        """Number of comments currently loaded"""
+        try:
+            return len(get_full_dataset_loader().comments) if get_full_dataset_loader else 0
+        except Exception:
+            return 0
     
     def _log_conversation(
         self,
         session_id: str,
         user_message: str,
-        assistant_response: str
+        assistant_response: str,
+        usage: Optional[Dict[str, int]] = None,
+        cache_hit: bool = False,
+        coalesced: bool = False
     ):
         """Log conversation to storage"""
         try:
-            import tempfile
-            from pathlib import Path
+            usage = usage or {}
+            upstream = getattr(self, '_upstream', None) or {}
+            model = upstream.get('model', MODEL)
             
             log_entry = {
                 'timestamp': datetime.utcnow().isoformat(),
                 'session_id': session_id,
                 'user_message': user_message,
                 'assistant_response': assistant_response,
-                'model': 'claude-3-5-haiku',
-                'dataset_size': 1580,
+                'message_length': len(user_message),
+                'response_length': len(assistant_response),
+                'model': model,
+                'dataset_size': self._dataset_size(),
                 'extraction_rate': 0.864,
-                'expected_total': 1828
+                'expected_total': 1828,
+                'usage': usage,
+                'input_tokens': usage.get('input_tokens', 0),
+                'output_tokens': usage.get('output_tokens', 0),
+                'cache_read_tokens': usage.get('cache_read_input_tokens', 0),
+                'cache_write_tokens': usage.get('cache_creation_input_tokens', 0),
+                'total_tokens': total_tokens(usage),
+                'cost_usd': estimate_cost(usage, model),
+                'stop_reason': upstream.get('stop_reason'),
+                'latency_ms': upstream.get('latency_ms'),
+                'first_token_ms': upstream.get('first_token_ms'),
+                'prompt_size': getattr(self, '_prompt_size', None) or {},
+                'context': getattr(self, '_context_plan', None) or {},
+                'cache_hit': cache_hit,
+                'coalesced': coalesced,
+                'history_tokens': getattr(self, '_history_stats', None) or {},
+                'quotes': summarize_quotes(getattr(self, '_quote_report', None) or []) if get_quote_verifier else {}
             }
             
-            log_dir = Path('/tmp/chat_logs')
-            log_dir.mkdir(exist_ok=True)
+            # First request of this process: attach the startup profile (if enabled)
+            started = getattr(self, '_request_started', None)
+            if started is not None:
+                _profile.record('first_request', time.perf_counter() - started)
+            cold_start = _profile.take_report()
+            if cold_start:
+                log_entry['cold_start'] = cold_start
             
-            log_file = log_dir / f"chat_log_{datetime.utcnow().strftime('%Y-%m-%d')}.jsonl"
-            with open(log_file, 'a') as f:
-                f.write(json.dumps(log_entry) + '\n')
+            # Buffered: written by the log writer's background thread
+            get_log_writer().write(log_entry)
             
             print(f"✓ Logged conversation: {session_id}")
             
         except Exception as e:
             print(f"Warning: Failed to log conversation: {e}")
 
+
+_profile.record('import', time.perf_counter() - _IMPORT_STARTED)
@@ -0,0 +1,275 @@
+"""
+Column-oriented in-memory comment store
+One array per field instead of one dict per comment: sentiment and stance are
+small-int enums, posts and authors are integer ids into shared tables and
+texts are interned. CommentRow keeps the old dict-style access working.
+"""
+
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Enum values (index = code stored in the column)
+SENTIMENTS = ('neutral', 'positive', 'negative')
+STANCES = ('', 'approving', 'disapproving')  # '' = unknown / missing
+
+NEUTRAL, POSITIVE, NEGATIVE = range(3)
+STANCE_UNKNOWN, APPROVING, DISAPPROVING = range(3)
+
+# One-letter codes used in the compact prompt format
+SENTIMENT_LETTERS = ('U', 'P', 'N')
+STANCE_LETTERS = ('U', 'A', 'D')
+
+MISSING = -1  # Post / author / create_time not present
+
+_ABSENT = object()  # Row view: value not present
+
+FIELDS = ('text', 'sentiment', 'post_url', 'post_stance', 'author', 'likes', 'create_time', 'confidence')
+
+_SENTIMENT_CODES = {name: code for code, name in enumerate(SENTIMENTS)}
+
+
+def sentiment_code(value: Optional[str]) -> int:
+    """Sentiment string -> enum code (unknown values count as neutral)"""
+    return _SENTIMENT_CODES.get((value or 'neutral').strip().lower(), NEUTRAL)
+
+
+def stance_code(value: Optional[str]) -> int:
+    """Post stance string -> enum code"""
+    value = (value or '').lower()
+    if 'disapprov' in value:
+        return DISAPPROVING
+    if 'approv' in value:
+        return APPROVING
+    return STANCE_UNKNOWN
+
+
+def post_id_from_url(url: str) -> str:
+    """TikTok video id from a post URL ('UNK' if there is none)"""
+    if url and '/video/' in url:
+        return url.split('/video/')[-1].split('?')[0]
+    return 'UNK'
+
+
+class CommentStore:
+    """
+    Comments stored as parallel columns
+
+    Columns (all length N):
+        texts       list of interned str
+        sentiment   array('b') of SENTIMENTS codes
+        stance      array('b') of STANCES codes
+        post        array('i') index into post_urls / post_ids (MISSING if none)
+        author      array('i') index into authors (MISSING if none)
+        likes       array('q')
+        create_time array('q') unix seconds (MISSING if unknown)
+        confidence  array('d')
+    """
+
+    def __init__(self, comments: Iterable[Dict[str, Any]] = ()):
+        self.texts = []
+        self.sentiment = array('b')
+        self.stance = array('b')
+        self.post = array('i')
+        self.author = array('i')
+        self.likes = array('q')
+        self.create_time = array('q')
+        self.confidence = array('d')
+
+        self.post_urls = []   # post index -> full URL
+        self.post_ids = []    # post index -> video id string
+        self.authors = []     # author index -> username
+        self._post_index = {}
+        self._author_index = {}
+        self._buffer = None  # Backing mmap when loaded from the binary artifact
+
+        for comment in comments:
+            self.append(comment)
+
+    @classmethod
+    def from_columns(cls, tables: Dict[str, List[str]], columns: Dict[str, Any], buffer: Any = None) -> 'CommentStore':
+        """
+        Store over prebuilt columns (see dataset_artifact.py)
+
+        Columns may be memoryviews into buffer; such a store is read-only.
+        """
+        store = cls()
+        for name, values in tables.items():
+            setattr(store, name, values)
+        for name, values in columns.items():
+            setattr(store, name, values)
+        store._post_index = {url: i for i, url in enumerate(store.post_urls)}
+        store._author_index = {author: i for i, author in enumerate(store.authors)}
+        store._buffer = buffer
+        return store
+
+    def _intern_post(self, url: Optional[str]) -> int:
+        if not url:
+            return MISSING
+        index = self._post_index.get(url)
+        if index is None:
+            index = len(self.post_urls)
+            self._post_index[url] = index
+            self.post_urls.append(sys.intern(url))
+            self.post_ids.append(sys.intern(post_id_from_url(url)))
+        return index
+
+    def _intern_author(self, author: Optional[str]) -> int:
+        if not author:
+            return MISSING
+        index = self._author_index.get(author)
+        if index is None:
+            index = len(self.authors)
+            self._author_index[author] = index
+            self.authors.append(sys.intern(author))
+        return index
+
+    def append(self, comment: Dict[str, Any]):
+        """Add one comment dict"""
+        self.texts.append(sys.intern(comment.get('text', '') or ''))
+        self.sentiment.append(sentiment_code(comment.get('sentiment')))
+        self.stance.append(stance_code(comment.get('post_stance')))
+        self.post.append(self._intern_post(comment.get('post_url')))
+        self.author.append(self._intern_author(comment.get('author')))
+        self.likes.append(int(comment.get('likes', 0) or 0))
+        try:
+            self.create_time.append(int(comment.get('create_time')))
+        except (TypeError, ValueError):
+            self.create_time.append(MISSING)
+        self.confidence.append(float(comment.get('confidence', 0.0) or 0.0))
+
+    @classmethod
+    def wrap(cls, comments) -> 'CommentStore':
+        """Use comments as-is if already a store, otherwise build one"""
+        return comments if isinstance(comments, cls) else cls(comments)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CommentRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('comment index out of range')
+        return CommentRow(self, index)
+
+    def __iter__(self) -> Iterator['CommentRow']:
+        for i in range(len(self)):
+            yield CommentRow(self, i)
+
+    def post_id(self, i: int) -> str:
+        """Video id of comment i's post ('UNK' if none)"""
+        post = self.post[i]
+        return self.post_ids[post] if post != MISSING else 'UNK'
+
+    def sentiment_counts(self) -> Dict[str, int]:
+        """Comments per sentiment"""
+        counts = [0] * len(SENTIMENTS)
+        for code in self.sentiment:
+            counts[code] += 1
+        return {name: counts[code] for code, name in enumerate(SENTIMENTS)}
+
+    def compact_line(self, i: int) -> str:
+        """Ultra-compact prompt line: [S]"txt"|postID|st|L"""
+        s = SENTIMENT_LETTERS[self.sentiment[i]]
+        st = STANCE_LETTERS[self.stance[i]]
+        likes = self.likes[i]
+        text = self.texts[i].strip()
+        if likes > 0:
+            return f"[{s}]\"{text}\"|{self.post_id(i)}|{st}|{likes}L"
+        return f"[{s}]\"{text}\"|{self.post_id(i)}|{st}"
+
+    def row_dict(self, i: int) -> Dict[str, Any]:
+        """Comment i as a plain dict (same keys as comments_all.json)"""
+        return {key: value for key, value in CommentRow(self, i).items()}
+
+
+class CommentRow:
+    """
+    Read-only dict-like view of one comment in a CommentStore
+
+    Supports comment['text'], comment.get('likes', 0), 'author' in comment,
+    keys() and items(). Missing values (no post, unknown stance...) behave
+    like absent keys.
+    """
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: CommentStore, index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def compact_line(self) -> str:
+        return self._store.compact_line(self._index)
+
+    def _value(self, key: str):
+        store, i = self._store, self._index
+        if key == 'text':
+            return store.texts[i]
+        if key == 'sentiment':
+            return SENTIMENTS[store.sentiment[i]]
+        if key == 'post_stance':
+            stance = store.stance[i]
+            return STANCES[stance] if stance != STANCE_UNKNOWN else _ABSENT
+        if key == 'post_url':
+            post = store.post[i]
+            return store.post_urls[post] if post != MISSING else _ABSENT
+        if key == 'post_id':
+            return store.post_id(i)
+        if key == 'author':
+            author = store.author[i]
+            return store.authors[author] if author != MISSING else _ABSENT
+        if key == 'likes':
+            return store.likes[i]
+        if key == 'create_time':
+            created = store.create_time[i]
+            return str(created) if created != MISSING else _ABSENT
+        if key == 'confidence':
+            return store.confidence[i]
+        raise KeyError(key)
+
+    def __getitem__(self, key: str):
+        value = self._value(key)
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None):
+        try:
+            value = self._value(key)
+        except KeyError:
+            return default
+        return default if value is _ABSENT else value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _ABSENT) is not _ABSENT
+
+    def keys(self) -> List[str]:
+        return [key for key in FIELDS if key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CommentRow):
+            if self._store is other._store:
+                return self._index == other._index
+            return dict(self.items()) == dict(other.items())
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._store), self._index))
+
+    def __repr__(self) -> str:
+        return f"CommentRow({dict(self.items())!r})"
@@ -0,0 +1,255 @@
+"""
+Context tier planner
+Picks how much of the dataset goes into the prompt for each request. "hola"
+does not need the 44K-token compact dump, and neither does "¿cuántos
+comentarios negativos hay sobre salud?" (the local aggregates answer it).
+
+Tiers, cheapest first:
+    aggregates  dataset-wide counts + exact stats for the query's topics
+    posts       the 20-post table (Interest Index, views, stance)
+    retrieved   post table + stats + BM25/similarity-retrieved comments
+    full        the whole compact dump (every comment) + stats
+
+The query is classified into needs ('posts', 'stats', 'comments', 'broad');
+the first tier that covers them and fits both the per-request token budget
+and what the per-minute bucket can admit is used.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from .full_dataset_loader import get_full_dataset_loader
+    from .analytics_engine import get_analytics_engine
+    from .smart_filter import get_smart_filter
+    from .post_router import POST_WORDS, RANK_WORDS, VIEW_WORDS
+    from .rate_limiter import estimate_tokens
+    from .text_normalizer import normalize_text
+    from .topics import detect_topics
+except ImportError:
+    from full_dataset_loader import get_full_dataset_loader
+    from analytics_engine import get_analytics_engine
+    from smart_filter import get_smart_filter
+    from post_router import POST_WORDS, RANK_WORDS, VIEW_WORDS
+    from rate_limiter import estimate_tokens
+    from text_normalizer import normalize_text
+    from topics import detect_topics
+
+TIERS = ('aggregates', 'posts', 'retrieved', 'full')
+
+# Needs each tier can answer
+TIER_COVERS = {
+    'aggregates': {'stats'},
+    'posts': {'posts'},
+    'retrieved': {'posts', 'stats', 'comments'},
+    'full': {'posts', 'stats', 'comments', 'broad'}
+}
+
+# Tells the model what it is (not) looking at
+TIER_NOTES = {
+    'aggregates': "ALCANCE DEL CONTEXTO: solo agregados calculados localmente (sin textos de comentarios ni tabla de posts).",
+    'posts': "ALCANCE DEL CONTEXTO: solo la tabla de los 20 posts (sin comentarios).",
+    'retrieved': "ALCANCE DEL CONTEXTO: tabla de posts + comentarios recuperados para esta consulta (no el dataset completo)."
+}
+
+DEFAULT_REQUEST_BUDGET = 60000  # Input tokens per request (prompt + context + history)
+
+POST_NEED_WORDS = POST_WORDS | RANK_WORDS | VIEW_WORDS | {'cuenta', 'cuentas', 'account', 'accounts', 'usuario', 'usuarios'}
+STATS_WORDS = {
+    'cuantos', 'cuantas', 'cuanto', 'cuanta', 'porcentaje', 'porcentajes', 'percentage', 'percent',
+    'probabilidad', 'probability', 'estadistica', 'estadisticas', 'statistics', 'stats', 'distribucion',
+    'distribution', 'proporcion', 'mayoria', 'total', 'numero', 'number', 'count', 'many', 'much',
+    'sentimiento', 'sentiment', 'negativos', 'positivos', 'neutrales', 'negative', 'positive', 'neutral',
+    'grafica', 'grafico', 'chart'
+}
+COMMENT_WORDS = {
+    'comentario', 'comentarios', 'comment', 'comments', 'ejemplo', 'ejemplos', 'example', 'examples',
+    'cita', 'citas', 'quote', 'quotes', 'dice', 'dicen', 'opina', 'opinan', 'piensa', 'piensan', 'say',
+    'says', 'textual', 'textuales', 'literal', 'quejas', 'critican', 'opinion', 'opiniones', 'reacciones'
+}
+# Comment words that only ask for a count ("¿cuántos comentarios...?") don't need the texts
+COMMENT_NOUNS = {'comentario', 'comentarios', 'comment', 'comments'}
+ANALYSIS_WORDS = {
+    'analiza', 'analisis', 'analizar', 'analyze', 'analysis', 'compara', 'comparar', 'comparacion',
+    'compare', 'tendencia', 'tendencias', 'patron', 'patrones', 'insights', 'porque', 'why', 'explica', 'explain'
+}
+BROAD_WORDS = {
+    'general', 'todos', 'todas', 'todo', 'overall', 'completo', 'completa', 'global', 'resumen', 'resume',
+    'resumir', 'summary', 'summarize', 'panorama', 'all', 'everything', 'dataset'
+}
+CHAT_WORDS = {
+    'hola', 'hello', 'hi', 'hey', 'gracias', 'thanks', 'thank', 'you', 'buenos', 'buenas', 'dias', 'tardes',
+    'noches', 'adios', 'bye', 'ok', 'vale', 'perfecto', 'genial', 'que', 'tal', 'como', 'estas', 'ayuda',
+    'help', 'puedes', 'hacer', 'quien', 'eres', 'who', 'are', 'what', 'can', 'do'
+}
+
+
+class ContextPlan:
+    """Chosen tier, its prompt parts and the estimates behind the choice"""
+
+    def __init__(self, tier: str, static: str, dynamic: str, needs: Set[str],
+                 estimates: Dict[str, int], degraded: bool = False, over_budget: bool = False):
+        self.tier = tier
+        self.static = static      # Cacheable (goes into the system blocks)
+        self.dynamic = dynamic    # Query-specific (goes into the user prompt)
+        self.needs = needs
+        self.estimates = estimates
+        self.degraded = degraded  # No covering tier fit the budget, a partial one was used
+        self.over_budget = over_budget
+
+    @property
+    def estimated_tokens(self) -> int:
+        return self.estimates[self.tier]
+
+    def summary(self) -> Dict[str, Any]:
+        """For the conversation log"""
+        return {
+            'tier': self.tier,
+            'estimated_tokens': self.estimated_tokens,
+            'needs': sorted(self.needs),
+            'estimates': dict(self.estimates),
+            'degraded': self.degraded,
+            'over_budget': self.over_budget
+        }
+
+
+class ContextPlanner:
+    """
+    Estimates the candidate tiers for a query and picks the cheapest that can
+    answer it within budget
+
+    Tiers are rendered lazily from cheapest to most expensive, so a post
+    question never pays for retrieval. The full tier is always measured
+    (it is memoized) so logs show what was saved.
+    """
+
+    def __init__(self, request_budget: int = DEFAULT_REQUEST_BUDGET, loader=None, analytics=None, smart_filter=None):
+        self.request_budget = request_budget
+        self._loader = loader
+        self._analytics = analytics
+        self._smart_filter = smart_filter
+
+    @property
+    def loader(self):
+        if self._loader is None:
+            self._loader = get_full_dataset_loader()
+        return self._loader
+
+    @property
+    def analytics(self):
+        if self._analytics is None:
+            self._analytics = get_analytics_engine()
+        return self._analytics
+
+    @property
+    def smart_filter(self):
+        if self._smart_filter is None:
+            self._smart_filter = get_smart_filter()
+        return self._smart_filter
+
+    def classify(self, message: str) -> Set[str]:
+        """Needs of a query: subset of {'posts', 'stats', 'comments', 'broad'}"""
+        normalized = normalize_text(message)
+        words = set(normalized.split())
+        topics = detect_topics(message)
+        needs = set()
+
+        if words & POST_NEED_WORDS or '@' in message:
+            needs.add('posts')
+        if words & STATS_WORDS:
+            needs.add('stats')
+        if words & (COMMENT_WORDS - COMMENT_NOUNS) or (words & COMMENT_NOUNS and 'stats' not in needs):
+            needs.add('comments')
+        if words & ANALYSIS_WORDS or 'por que' in normalized:
+            needs.add('comments')
+            if not topics:
+                needs.add('broad')
+        if words & BROAD_WORDS and ('comments' in needs or not needs):
+            needs.add('broad')
+
+        if not needs:
+            if topics:
+                needs = {'stats', 'comments'}    # "carreteras" -> numbers and examples
+            elif not words <= CHAT_WORDS:
+                needs = {'broad'}                # Unknown intent: don't guess, send everything
+        return needs
+
+    def render(self, tier: str, message: str) -> Optional[Tuple[str, str]]:
+        """(static, dynamic) context for a tier, or None when it has nothing to offer"""
+        if tier == 'full':
+            return self.loader.create_compact_context(), self.analytics.create_stats_context(message)
+
+        note = TIER_NOTES[tier]
+        if tier == 'aggregates':
+            return self.analytics.create_overview_context(), self._join(note, self.analytics.create_stats_context(message))
+        if tier == 'posts':
+            return self.loader.render_posts_context(), note
+
+        result = self.smart_filter.filter(message)
+        if not result['examples']:
+            return None
+        # One set of counts per prompt: the exact statistics win when present
+        stats = self.analytics.create_stats_context(message)
+        return self.loader.render_posts_context(), self._join(
+            note, stats, self.smart_filter.format_context(result, include_counts=not stats)
+        )
+
+    def _join(self, *parts: str) -> str:
+        return "\n\n".join(part for part in parts if part)
+
+    def plan(self, message: str, overhead_tokens: int = 0, minute_budget: Optional[float] = None,
+             tier: Optional[str] = None) -> ContextPlan:
+        """
+        Choose the context for a request
+
+        overhead_tokens: system prompt + history + query (sent whatever the tier)
+        minute_budget: input tokens the per-minute bucket can admit (None = no limit)
+        tier: force a tier ('full' is used if it has nothing to offer)
+        """
+        needs = self.classify(message)
+        budget = self.request_budget if minute_budget is None else min(self.request_budget, minute_budget)
+        rendered = {}
+        estimates = {}
+
+        def measure(name: str) -> bool:
+            if name not in rendered:
+                parts = self.render(name, message)
+                if parts is None:
+                    return False
+                rendered[name] = parts
+                estimates[name] = overhead_tokens + sum(estimate_tokens(part) for part in parts if part)
+            return True
+
+        measure('full')
+        if tier in TIERS:
+            chosen = tier if measure(tier) else 'full'
+            return ContextPlan(chosen, *rendered[chosen], needs, estimates, over_budget=estimates[chosen] > budget)
+
+        for name in TIERS:
+            if needs <= TIER_COVERS[name] and measure(name) and estimates[name] <= budget:
+                return ContextPlan(name, *rendered[name], needs, estimates)
+
+        # Nothing that covers the query fits: answer with the most useful tier that does
+        fitting = [name for name in TIERS if measure(name) and estimates[name] <= budget]
+        if fitting:
+            chosen = max(fitting, key=lambda name: (len(needs & TIER_COVERS[name]), -estimates[name]))
+            return ContextPlan(chosen, *rendered[chosen], needs, estimates, degraded=True)
+
+        # Nothing fits at all: send what answers the query and let admission control queue it
+        covering = [name for name in TIERS if name in rendered and needs <= TIER_COVERS[name]]
+        chosen = min(covering, key=lambda name: estimates[name])
+        return ContextPlan(chosen, *rendered[chosen], needs, estimates, over_budget=True)
+
+
+# Singleton instance
+_context_planner = None
+
+
+def get_context_planner() -> ContextPlanner:
+    """Get or create the context planner (budget from CHAT_REQUEST_TOKEN_BUDGET)"""
+    global _context_planner
+    if _context_planner is None:
+        _context_planner = ContextPlanner(
+            request_budget=int(os.environ.get('CHAT_REQUEST_TOKEN_BUDGET', DEFAULT_REQUEST_BUDGET))
+        )
+    return _context_planner
@@ -3,27 +3,75 @@ Vercel Serverless Function for Admin Dashboard API
 """
 
 from http.server import BaseHTTPRequestHandler
+import csv
+import io
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from pathlib import Path
 import hashlib
 
+try:
+    from .log_store import DEFAULT_PAGE_SIZE, LogStore, get_log_store
+except ImportError:
+    import sys
+    sys.path.insert(0, os.path.dirname(__file__))
+    from log_store import DEFAULT_PAGE_SIZE, LogStore, get_log_store
+
+PERCENTILES = (50, 90, 95, 99)
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_FORMATS = {  # format -> (content type, file extension)
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv')
+}
+# CSV columns when the export names no fields
+CSV_FIELDS = (
+    'timestamp', 'session_id', 'user_message', 'assistant_response', 'sources',
+    'model', 'cache_hit', 'total_tokens', 'cost_usd', 'latency_ms'
+)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank percentiles (p50..p99) plus max and mean"""
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {f'p{p}': values[max(0, -(-len(values) * p // 100) - 1)] for p in PERCENTILES}
+    result['max'] = values[-1]
+    result['avg'] = round(sum(values) / len(values), 1)
+    return result
+
+
+def _fields(fields: Any) -> Optional[List[str]]:
+    """Requested field projection (None: whole entries)"""
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return [str(field).strip() for field in fields if str(field).strip()] or None
+
+
+def _project(entry: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return entry
+    return {field: entry[field] for field in fields if field in entry}
+
+
+def _csv_value(value: Any) -> Any:
+    """Lists and objects (sources, usage) go into one CSV cell as JSON"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return '' if value is None else value
+
+
 class handler(BaseHTTPRequestHandler):
     """Vercel serverless handler for dashboard"""
     
     def do_POST(self):
         """Handle POST requests to /api/dashboard"""
         
-        # CORS headers
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        
+        self._streaming = False
         try:
             # Read request body
             content_length = int(self.headers['Content-Length'])
@@ -39,18 +87,28 @@ class handler(BaseHTTPRequestHandler):
                     'error': 'Invalid password',
                     'authenticated': False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                self._send_json(response)
                 return
             
             # Handle different actions
             if action == 'get_logs':
                 days = data.get('days', 7)
-                logs = self._get_logs(days)
-                response = {
-                    'authenticated': True,
-                    'logs': logs,
-                    'total': len(logs)
-                }
+                page_size = min(MAX_PAGE_SIZE, max(1, int(data.get('page_size', DEFAULT_PAGE_SIZE))))
+                fields = _fields(data.get('fields'))
+                try:
+                    logs, next_cursor = self._store().page(self._since(days), data.get('cursor'), page_size)
+                except ValueError as e:  # Malformed cursor
+                    response = {
+                        'error': str(e),
+                        'authenticated': True
+                    }
+                else:
+                    response = {
+                        'authenticated': True,
+                        'logs': [_project(log, fields) for log in logs],
+                        'next_cursor': next_cursor,
+                        'total': sum(day['queries'] for day in self._store().daily(self._since(days)).values())
+                    }
             elif action == 'get_analytics':
                 days = data.get('days', 7)
                 analytics = self._get_analytics(days)
@@ -59,27 +117,92 @@ class handler(BaseHTTPRequestHandler):
                     'analytics': analytics
                 }
             elif action == 'export_logs':
-                days = data.get('days', 30)
-                logs = self._get_logs(days)
-                response = {
-                    'authenticated': True,
-                    'logs': logs,
-                    'export_format': 'json'
-                }
+                export_format = data.get('format', 'ndjson')
+                if export_format not in EXPORT_FORMATS:
+                    response = {
+                        'error': f"Unknown export format {export_format!r} (use one of {', '.join(EXPORT_FORMATS)})",
+                        'authenticated': True
+                    }
+                else:
+                    self._export_logs(data.get('days', 30), export_format, _fields(data.get('fields')))
+                    return
             else:
                 response = {
                     'error': 'Unknown action',
                     'authenticated': True
                 }
             
-            self.wfile.write(json.dumps(response).encode())
+            self._send_json(response)
             
         except Exception as e:
+            if self._streaming:
+                # Headers and part of the body are out: cut the stream short so
+                # the client sees an incomplete transfer, not a finished file
+                print(f"Error exporting logs: {e}")
+                self.close_connection = True
+                return
             error_response = {
                 'error': str(e),
                 'authenticated': False
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self._send_json(error_response)
+    
+    def _send_json(self, response: Dict[str, Any]):
+        """Send a JSON response with CORS headers"""
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode())
+    
+    def _export_logs(self, days: int, export_format: str, fields: Optional[List[str]]):
+        """
+        Stream the window as NDJSON or CSV with chunked transfer encoding
+        
+        Entries are read lazily from the store and sent in chunks of about
+        EXPORT_CHUNK_BYTES, so memory stays flat however long the window.
+        """
+        entries = self._store().iter_entries(self._since(days))
+        content_type, extension = EXPORT_FORMATS[export_format]
+        
+        # Chunked encoding needs HTTP/1.1; the connection closes afterwards
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Disposition', f'attachment; filename="chat_logs_{self._since(days)}.{extension}"')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        self._streaming = True
+        
+        buffer = io.StringIO()
+        if export_format == 'csv':
+            columns = fields or list(CSV_FIELDS)
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+        for entry in entries:
+            if export_format == 'csv':
+                writer.writerow([_csv_value(entry.get(column)) for column in columns])
+            else:
+                buffer.write(json.dumps(_project(entry, fields)) + '\n')
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                self._write_chunk(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+        self._write_chunk(buffer.getvalue().encode('utf-8'))
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+    
+    def _write_chunk(self, data: bytes):
+        """Write one chunk of a chunked response and flush it to the client"""
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
     
     def do_OPTIONS(self):
         """Handle OPTIONS requests (CORS preflight)"""
@@ -108,48 +231,28 @@ class handler(BaseHTTPRequestHandler):
         
         return password_hash == expected_hash
     
-    def _get_logs(self, days: int = 7) -> List[Dict[str, Any]]:
-        """
-        Retrieve conversation logs from the last N days
-        """
-        try:
-            log_dir = Path('/tmp/chat_logs')
-            if not log_dir.exists():
-                return []
-            
-            logs = []
-            
-            # Get logs from the last N days
-            for i in range(days):
-                date = datetime.utcnow() - timedelta(days=i)
-                log_file = log_dir / f"chat_log_{date.strftime('%Y-%m-%d')}.jsonl"
-                
-                if log_file.exists():
-                    with open(log_file, 'r') as f:
-                        for line in f:
-                            try:
-                                log_entry = json.loads(line.strip())
-                                logs.append(log_entry)
-                            except:
-                                continue
-            
-            # Sort by timestamp (newest first)
-            logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            
-            return logs
-            
-        except Exception as e:
-            print(f"Error retrieving logs: {e}")
-            return []
+    def _store(self) -> LogStore:
+        return get_log_store()
+    
+    def _since(self, days: int) -> str:
+        """First day (UTC) of a window of N calendar days ending today"""
+        days = max(1, int(days))
+        return (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
     
     def _get_analytics(self, days: int = 7) -> Dict[str, Any]:
         """
         Generate analytics from conversation logs
+        
+        Merges the store's daily rollups for the window; only the per-request
+        token and latency columns are read, for the exact percentiles.
         """
         try:
-            logs = self._get_logs(days)
+            store = self._store()
+            since = self._since(days)
+            per_day = store.daily(since)
+            total_messages = sum(day['queries'] for day in per_day.values())
             
-            if not logs:
+            if not total_messages:
                 return {
                     'total_conversations': 0,
                     'total_messages': 0,
@@ -158,60 +261,91 @@ class handler(BaseHTTPRequestHandler):
                     'avg_response_length': 0,
                     'queries_per_day': {},
                     'popular_topics': [],
-                    'source_usage': {}
+                    'source_usage': {},
+                    'cache_hit_rate': 0.0,
+                    'cache_hits': 0,
+                    'total_tokens': 0,
+                    'tokens_per_day': {},
+                    'tokens_per_query': {},
+                    'latency_ms': {},
+                    'estimated_spend': {'total_usd': 0.0, 'per_day': {}, 'avg_per_query_usd': 0.0}
                 }
             
-            # Calculate metrics
-            unique_sessions = set(log['session_id'] for log in logs)
-            total_messages = len(logs)
-            
-            # Average lengths
-            avg_msg_length = sum(log.get('message_length', 0) for log in logs) / total_messages
-            avg_resp_length = sum(log.get('response_length', 0) for log in logs) / total_messages
-            
-            # Queries per day
-            queries_per_day = {}
-            for log in logs:
-                date = log['timestamp'][:10]  # Extract YYYY-MM-DD
-                queries_per_day[date] = queries_per_day.get(date, 0) + 1
+            def total(field: str) -> float:
+                return sum(day[field] for day in per_day.values())
             
-            # Popular topics (extract keywords from user messages)
-            topic_keywords = {}
-            keywords = ['sentiment', 'interest', 'topic', 'post', 'comment', 'analysis', 
-                       'chart', 'graph', 'visualization', 'recommendation', 'negative', 
-                       'positive', 'corruption', 'budget', 'presupuesto']
+            # Popular topics (keywords in user messages), most frequent first
+            keyword_counts = {}
+            for day in per_day.values():
+                for keyword, count in day['keywords'].items():
+                    keyword_counts[keyword] = keyword_counts.get(keyword, 0) + count
+            popular_topics = sorted(
+                ((keyword, count) for keyword, count in keyword_counts.items() if count),
+                key=lambda x: x[1], reverse=True
+            )[:10]
             
-            for log in logs:
-                message = log.get('user_message', '').lower()
-                for keyword in keywords:
-                    if keyword in message:
-                        topic_keywords[keyword] = topic_keywords.get(keyword, 0) + 1
+            # Response cache hit rate (only entries logged since the cache existed)
+            cache_logged = total('cache_logged')
+            cache_hits = total('cache_hits')
+            cache_hit_rate = round(cache_hits / cache_logged * 100, 1) if cache_logged else 0.0
             
-            # Sort topics by frequency
-            popular_topics = sorted(topic_keywords.items(), key=lambda x: x[1], reverse=True)[:10]
-            
-            # Source usage
-            source_usage = {}
-            for log in logs:
-                for source in log.get('sources', []):
-                    source_usage[source] = source_usage.get(source, 0) + 1
+            tokens = self._token_analytics(per_day, *store.metered(since))
+            unique_sessions = store.unique_sessions(since)
             
             return {
-                'total_conversations': len(unique_sessions),
+                'total_conversations': unique_sessions,
                 'total_messages': total_messages,
-                'unique_sessions': len(unique_sessions),
-                'avg_message_length': round(avg_msg_length, 1),
-                'avg_response_length': round(avg_resp_length, 1),
-                'queries_per_day': queries_per_day,
+                'unique_sessions': unique_sessions,
+                'avg_message_length': round(total('message_length') / total_messages, 1),
+                'avg_response_length': round(total('response_length') / total_messages, 1),
+                'queries_per_day': {day: row['queries'] for day, row in per_day.items()},
                 'popular_topics': popular_topics,
-                'source_usage': source_usage,
+                'source_usage': store.source_counts(since),
+                'cache_hit_rate': cache_hit_rate,
+                'cache_hits': cache_hits,
+                'total_tokens': tokens['total_tokens'],
+                'tokens_per_day': tokens['tokens_per_day'],
+                'tokens_per_query': tokens['tokens_per_query'],
+                'latency_ms': tokens['latency_ms'],
+                'estimated_spend': tokens['estimated_spend'],
                 'date_range': {
-                    'start': logs[-1]['timestamp'][:10] if logs else None,
-                    'end': logs[0]['timestamp'][:10] if logs else None
+                    'start': min(per_day),
+                    'end': max(per_day)
                 }
             }
             
         except Exception as e:
             print(f"Error generating analytics: {e}")
             return {}
-
+    
+    def _token_analytics(
+        self,
+        per_day: Dict[str, Dict[str, Any]],
+        per_query: List[float],
+        latencies: List[float]
+    ) -> Dict[str, Any]:
+        """
+        Token consumption, latency and estimated spend
+        
+        Only requests that reached the model count (cache hits and errors
+        carry no usage).
+        """
+        metered = {day: row for day, row in per_day.items() if row['metered']}
+        tokens_per_day = {
+            day: {key: row[key] for key in ('input', 'output', 'cache_read', 'cache_write', 'total')}
+            for day, row in metered.items()
+        }
+        spend_per_day = {day: row['spend'] for day, row in metered.items()}
+        
+        total_spend = sum(spend_per_day.values())
+        return {
+            'total_tokens': sum(day['total'] for day in tokens_per_day.values()),
+            'tokens_per_day': tokens_per_day,
+            'tokens_per_query': _percentiles(per_query),
+            'latency_ms': _percentiles(latencies),
+            'estimated_spend': {
+                'total_usd': round(total_spend, 4),
+                'per_day': {date: round(cost, 4) for date, cost in spend_per_day.items()},
+                'avg_per_query_usd': round(total_spend / len(per_query), 5) if per_query else 0.0
+            }
+        }
@@ -0,0 +1,203 @@
+"""
+Binary precompiled dataset artifact (data/build/dataset.bin)
+The comment columns and the posts ⨝ interest-index join, written once by
+build_data.py and memory-mapped by the loader instead of parsing the JSON.
+
+Layout (shared by the other build artifacts, each with its own magic):
+    MAGIC (4 bytes) | VERSION (uint16) | header length (uint32)
+    header (UTF-8 JSON: data_hash, byteorder, counts, section offsets)
+    sections (8-byte aligned): raw column arrays, string tables, posts JSON
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .comment_store import CommentStore
+except ImportError:
+    from comment_store import CommentStore
+
+MAGIC = b'GTDS'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sHI')  # magic, version, header length
+
+# Column name -> array typecode (fixed-size codes only)
+COLUMNS = {
+    'sentiment': 'b',
+    'stance': 'b',
+    'post': 'i',
+    'author': 'i',
+    'likes': 'q',
+    'create_time': 'q',
+    'confidence': 'd',
+}
+
+# String tables stored as one UTF-8 blob + character offsets
+STRING_TABLES = ('texts', 'post_urls', 'post_ids', 'authors')
+
+
+class ArtifactError(Exception):
+    """Artifact missing, corrupt, stale or from another format version"""
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _string_table(values: List[str]) -> Tuple[bytes, array]:
+    """Concatenated text + end offsets (in characters, so one decode splits it)"""
+    offsets = array('q')
+    end = 0
+    for value in values:
+        end += len(value)
+        offsets.append(end)
+    return ''.join(values).encode('utf-8'), offsets
+
+
+def string_table_sections(name: str, values: List[str]) -> List[Tuple[str, bytes]]:
+    """'<name>.offsets' and '<name>.blob' sections for a list of strings"""
+    blob, offsets = _string_table(values)
+    return [(name + '.offsets', offsets.tobytes()), (name + '.blob', blob)]
+
+
+def read_string_table(section: Callable[[str], memoryview], name: str) -> List[str]:
+    """Inverse of string_table_sections (values are interned)"""
+    try:
+        text = bytes(section(name + '.blob')).decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise ArtifactError(f'string table {name} is corrupt ({e})')
+    start = 0
+    values = []
+    for end in section(name + '.offsets', 'q'):
+        values.append(sys.intern(text[start:end]))
+        start = end
+    return values
+
+
+def write_sections(path: str, header: Dict[str, Any], sections: List[Tuple[str, bytes]],
+                   magic: bytes = MAGIC, version: int = VERSION) -> Dict[str, Any]:
+    """Write header + 8-byte aligned sections atomically; returns the full header"""
+    # Offsets are relative to the first section, so they don't depend on the header size
+    layout = {}
+    offset = 0
+    for name, data in sections:
+        offset = _align(offset)
+        layout[name] = [offset, len(data)]
+        offset += len(data)
+
+    header = dict(header, byteorder=sys.byteorder, sections=layout)
+    header_bytes = json.dumps(header).encode('utf-8')
+    base = _align(PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(magic, version, len(header_bytes)))
+        f.write(header_bytes)
+        for name, data in sections:
+            f.seek(base + layout[name][0])
+            f.write(data)
+    os.replace(tmp_path, path)
+    return header
+
+
+def read_header(buffer, magic: bytes = MAGIC, version: int = VERSION) -> Tuple[Dict[str, Any], int]:
+    """Parse and validate the preamble/header; returns (header, section base)"""
+    if len(buffer) < PREAMBLE.size:
+        raise ArtifactError('truncated artifact')
+    found_magic, found_version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if found_magic != magic:
+        raise ArtifactError(f'not a {magic.decode()} artifact')
+    if found_version != version:
+        raise ArtifactError(f'artifact version {found_version}, expected {version}')
+    try:
+        header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]).decode('utf-8'))
+    except ValueError as e:  # JSONDecodeError and UnicodeDecodeError
+        raise ArtifactError(f'corrupt header ({e})')
+    if not isinstance(header, dict) or not isinstance(header.get('sections'), dict):
+        raise ArtifactError('corrupt header (no section table)')
+    if header.get('byteorder') != sys.byteorder:
+        raise ArtifactError('artifact written on a machine with different byte order')
+    return header, _align(PREAMBLE.size + header_length)
+
+
+def map_sections(path: str, expected_hash: Optional[str] = None, magic: bytes = MAGIC,
+                 version: int = VERSION) -> Tuple[Dict[str, Any], Callable[..., memoryview], mmap.mmap]:
+    """
+    Map an artifact read-only; returns (header, section(name[, typecode]) -> memoryview, mapping)
+
+    Raises ArtifactError when the file is missing, corrupt, stale or from
+    another format version; section() does the same for a missing,
+    truncated or misaligned section (typecode casts the view).
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(str(e))
+
+    view = memoryview(buffer)
+    header, base = read_header(view, magic, version)
+    if expected_hash is not None and header.get('data_hash') != expected_hash:
+        raise ArtifactError('artifact is stale (data hash changed)')
+
+    def section(name: str, typecode: Optional[str] = None) -> memoryview:
+        if name not in header['sections']:
+            raise ArtifactError(f'section {name} is missing')
+        try:
+            offset, length = header['sections'][name]
+            start = base + offset
+            if start < base or length < 0 or start + length > len(view):
+                raise ArtifactError(f'section {name} is truncated')
+            data = view[start:start + length]
+            return data.cast(typecode) if typecode else data
+        except (TypeError, ValueError) as e:
+            raise ArtifactError(f'section {name} is corrupt ({e})')
+
+    return header, section, buffer
+
+
+def write_artifact(path: str, store: CommentStore, posts: List[Dict[str, Any]], data_hash: str) -> Dict[str, Any]:
+    """Serialize the store and joined posts; returns the header"""
+    sections = []  # (name, bytes)
+    for name, typecode in COLUMNS.items():
+        sections.append((name, array(typecode, getattr(store, name)).tobytes()))
+    for name in STRING_TABLES:
+        sections.extend(string_table_sections(name, getattr(store, name)))
+    sections.append(('posts', json.dumps(posts, ensure_ascii=False).encode('utf-8')))
+
+    header = {'data_hash': data_hash, 'count': len(store), 'columns': COLUMNS}
+    return write_sections(path, header, sections)
+
+
+def load_artifact(path: str, expected_hash: Optional[str] = None) -> Tuple[CommentStore, List[Dict[str, Any]]]:
+    """
+    Map the artifact and build a CommentStore over it
+
+    Numeric columns are zero-copy memoryviews into the mapping; each string
+    table is one decode + slicing. Raises ArtifactError when the artifact
+    can't be used (the caller falls back to the JSON files).
+    """
+    header, section, buffer = map_sections(path, expected_hash)
+
+    if header.get('columns') != COLUMNS:
+        raise ArtifactError('artifact columns do not match this version')
+    columns = {}
+    for name, typecode in header['columns'].items():
+        columns[name] = section(name, typecode)
+        if len(columns[name]) != header.get('count'):
+            raise ArtifactError(f'column {name} has the wrong length')
+
+    tables = {name: read_string_table(section, name) for name in STRING_TABLES}
+
+    try:
+        posts = json.loads(bytes(section('posts')).decode('utf-8'))
+    except ValueError as e:
+        raise ArtifactError(f'posts section is corrupt ({e})')
+    store = CommentStore.from_columns(tables, columns, buffer=buffer)
+    return store, posts
@@ -3,29 +3,113 @@ Full Dataset Loader for Option A
 Loads all 1,580 comments into the prompt context (86.4% extraction rate)
 """
 
+import hashlib
 import json
 import os
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from .comment_store import CommentStore, SENTIMENTS, STANCES
+    from .dataset_artifact import ArtifactError, load_artifact, write_artifact
+    from .trigram_index import TrigramIndex
+except ImportError:
+    from comment_store import CommentStore, SENTIMENTS, STANCES
+    from dataset_artifact import ArtifactError, load_artifact, write_artifact
+    from trigram_index import TrigramIndex
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BUILD_DIR = os.path.join(DATA_DIR, 'build')  # Generated by build_data.py (excluded from the data hash)
+
+COMPACT_CONTEXT_FILE = 'compact_context.txt'
+COMPACT_CONTEXT_META_FILE = 'compact_context.json'
+DATASET_ARTIFACT_FILE = 'dataset.bin'
+TRIGRAM_INDEX_FILE = 'trigram_index.bin'
+
+# Memoized content hash of data/, keyed by a cheap stat signature
+_fingerprint_cache = (None, None)
+
+
+def _data_files() -> List[str]:
+    """All source data files (relative paths, sorted), excluding build output"""
+    files = []
+    for root, dirs, names in os.walk(DATA_DIR):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != os.path.join(DATA_DIR, 'build'))
+        for name in sorted(names):
+            files.append(os.path.relpath(os.path.join(root, name), DATA_DIR))
+    return files
+
+
+def data_fingerprint() -> str:
+    """
+    Content hash of every file under data/ (except data/build)
+    
+    Re-hashing only happens when a file's size or mtime changes, so calling
+    it again costs a few stat() calls.
+    """
+    global _fingerprint_cache
+    
+    signature = []
+    for rel_path in _data_files():
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, rel_path))
+            signature.append((rel_path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            continue
+    signature = tuple(signature)
+    
+    cached_signature, cached_hash = _fingerprint_cache
+    if cached_signature == signature:
+        return cached_hash
+    
+    digest = hashlib.sha256()
+    for rel_path, _, _ in signature:
+        digest.update(rel_path.replace(os.sep, '/').encode('utf-8') + b'\0')
+        with open(os.path.join(DATA_DIR, rel_path), 'rb') as f:
+            digest.update(f.read())
+        digest.update(b'\0')
+    
+    data_hash = digest.hexdigest()
+    _fingerprint_cache = (signature, data_hash)
+    return data_hash
+
 
 class FullDatasetLoader:
     """
     Loads complete dataset of comments for comprehensive analysis
     """
     
-    def __init__(self):
-        """Initialize and load all comments"""
-        self.comments = []
+    def __init__(self, use_artifact: bool = True):
+        """Initialize and load all comments (from data/build/dataset.bin when current)"""
+        self.use_artifact = use_artifact
+        self.source = None  # 'artifact' or 'json'
+        self.comments = CommentStore()
         self.posts = []
+        self.posts_by_id = {}  # video_id -> post (join target for comment post ids)
+        self.data_hash = None
+        self._compact_context = None  # (data_hash, rendered context)
+        self._trigram_index = None  # (data_hash, TrigramIndex)
         self._load_all_data()
     
     def _load_all_data(self):
         """Load all comments and post metadata with Interest Index"""
         try:
+            self.data_hash = data_fingerprint()
+        except Exception as e:
+            print(f"⚠ Warning: Could not hash data files: {e}")
+            self.data_hash = None
+        
+        if self.use_artifact and self._load_artifact():
+            return
+        
+        try:
+            self.source = 'json'
+            
             # Load comments
             comments_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'comments', 'comments_all.json')
             if os.path.exists(comments_path):
                 with open(comments_path, 'r', encoding='utf-8') as f:
-                    self.comments = json.load(f)
+                    self.comments = CommentStore(json.load(f))
                 print(f"✓ Loaded {len(self.comments)} comments")
             else:
                 print(f"⚠ Warning: Comments file not found at {comments_path}")
@@ -64,6 +148,7 @@ class FullDatasetLoader:
                 
                 # Sort by rank
                 self.posts.sort(key=lambda x: x.get('rank', 999))
+                self.posts_by_id = {str(post.get('video_id', '')): post for post in self.posts}
                 print(f"✓ Loaded {len(self.posts)} posts with Interest Index")
             else:
                 print(f"⚠ Warning: Posts metadata file not found")
@@ -73,8 +158,67 @@ class FullDatasetLoader:
             print(f"Error loading data: {e}")
             import traceback
             traceback.print_exc()
-            self.comments = []
+            self.comments = CommentStore()
             self.posts = []
+            self.posts_by_id = {}
+    
+    def _load_artifact(self) -> bool:
+        """Map the prebuilt binary dataset; False if missing or stale"""
+        if not self.data_hash:
+            return False
+        path = os.path.join(BUILD_DIR, DATASET_ARTIFACT_FILE)
+        if not os.path.exists(path):
+            return False
+        try:
+            self.comments, self.posts = load_artifact(path, self.data_hash)
+        except ArtifactError as e:
+            print(f"⚠ Dataset artifact not used ({e}), loading JSON")
+            return False
+        self.posts_by_id = {str(post.get('video_id', '')): post for post in self.posts}
+        self.source = 'artifact'
+        print(f"✓ Mapped {len(self.comments)} comments and {len(self.posts)} posts from {DATASET_ARTIFACT_FILE}")
+        return True
+    
+    def build_dataset_artifact(self, build_dir: str = BUILD_DIR) -> Tuple[str, Dict[str, Any]]:
+        """Write comments + joined posts to the binary artifact"""
+        path = os.path.join(build_dir, DATASET_ARTIFACT_FILE)
+        header = write_artifact(path, self.comments, self.posts, self.data_hash)
+        return path, header
+    
+    def get_trigram_index(self) -> TrigramIndex:
+        """
+        Typo-tolerant word index, memoized per data hash
+        
+        Mapped from data/build/trigram_index.bin (written by build_data.py)
+        when it matches the data, otherwise built from the comments.
+        """
+        if self._trigram_index is not None and self._trigram_index[0] == self.data_hash:
+            return self._trigram_index[1]
+        
+        index = None
+        if self.data_hash:
+            try:
+                index = TrigramIndex.load(os.path.join(BUILD_DIR, TRIGRAM_INDEX_FILE), self.data_hash)
+                print(f"✓ Mapped trigram index ({len(index):,} words)")
+            except ArtifactError as e:
+                print(f"⚠ Trigram index artifact not used ({e}), building")
+        if index is None:
+            index = TrigramIndex.build(self.comments.texts)
+        
+        self._trigram_index = (self.data_hash, index)
+        return index
+    
+    def build_trigram_index_artifact(self, build_dir: str = BUILD_DIR) -> Tuple[str, Dict[str, Any]]:
+        """Build the trigram index from the comments and write it to build_dir"""
+        index = TrigramIndex.build(self.comments.texts)
+        path = os.path.join(build_dir, TRIGRAM_INDEX_FILE)
+        header = index.write(path, self.data_hash)
+        self._trigram_index = (self.data_hash, index)
+        return path, header
+    
+    def get_post(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """Post metadata for a comment's post id (None if unknown)"""
+        return self.posts_by_id.get(str(post_id))
     
     def get_statistics(self) -> Dict[str, Any]:
         """Calculate overall statistics"""
@@ -82,12 +226,7 @@ class FullDatasetLoader:
             return {}
         
         total = len(self.comments)
-        sentiments = {'positive': 0, 'negative': 0, 'neutral': 0}
-        
-        for comment in self.comments:
-            sentiment = comment.get('sentiment', 'neutral').lower()
-            if sentiment in sentiments:
-                sentiments[sentiment] += 1
+        sentiments = self.comments.sentiment_counts()
         
         return {
             'total_comments': total,
@@ -128,19 +267,17 @@ class FullDatasetLoader:
         context_parts.append("="*80)
         context_parts.append("")
         
-        # All comments in structured format
-        for i, comment in enumerate(self.comments, 1):
-            text = comment.get('text', '').strip()
-            sentiment = comment.get('sentiment', 'neutral').upper()
-            post_url = comment.get('post_url', 'N/A')
-            post_stance = comment.get('post_stance', 'N/A')
-            likes = comment.get('likes', 0)
-            confidence = comment.get('confidence', 0.0)
+        # All comments in structured format (straight from the columns)
+        store = self.comments
+        for i in range(len(store)):
+            post = store.post[i]
+            post_url = store.post_urls[post] if post >= 0 else 'N/A'
+            post_stance = STANCES[store.stance[i]] or 'N/A'
             
             # Compact format to save tokens
             context_parts.append(
-                f"{i}. [{sentiment}] \"{text}\" "
-                f"(Post: {post_url}, Stance: {post_stance}, Likes: {likes}, Confidence: {confidence:.2f})"
+                f"{i + 1}. [{SENTIMENTS[store.sentiment[i]].upper()}] \"{store.texts[i].strip()}\" "
+                f"(Post: {post_url}, Stance: {post_stance}, Likes: {store.likes[i]}, Confidence: {store.confidence[i]:.2f})"
             )
         
         context_parts.append("")
@@ -151,6 +288,66 @@ class FullDatasetLoader:
         return "\n".join(context_parts)
     
     def create_compact_context(self) -> str:
+        """
+        Compact context, memoized per data hash
+        
+        Order of preference: in-memory copy, prebuilt artifact in data/build
+        (written by build_data.py), fresh render. The data is not reloaded
+        while the process runs: the analytics engine, smart filter and other
+        singletons are built from the same load, and a new deploy starts a
+        new process (which ignores build artifacts of older data).
+        """
+        if self._compact_context is not None and self._compact_context[0] == self.data_hash:
+            return self._compact_context[1]
+        
+        context = self._read_compact_context_artifact()
+        if context is None:
+            context = self.render_compact_context()
+        
+        self._compact_context = (self.data_hash, context)
+        return context
+    
+    def _read_compact_context_artifact(self) -> Optional[str]:
+        """Prebuilt context, if it was built from the current data"""
+        meta_path = os.path.join(BUILD_DIR, COMPACT_CONTEXT_META_FILE)
+        context_path = os.path.join(BUILD_DIR, COMPACT_CONTEXT_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if not self.data_hash or meta.get('data_hash') != self.data_hash:
+                print("⚠ Prebuilt compact context is stale, rendering")
+                return None
+            with open(context_path, 'r', encoding='utf-8', newline='') as f:
+                context = f.read()
+            print(f"✓ Loaded prebuilt compact context (~{meta.get('token_estimate', 0):,} tokens)")
+            return context
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠ Warning: Could not read prebuilt compact context: {e}")
+            return None
+    
+    def build_compact_context_artifact(self, build_dir: str = BUILD_DIR) -> Tuple[str, Dict[str, Any]]:
+        """Render the compact context and write it (plus metadata) to build_dir"""
+        context = self.render_compact_context()
+        meta = {
+            'data_hash': self.data_hash,
+            'chars': len(context),
+            'token_estimate': len(context) // 4,
+            'built_at': datetime.utcnow().isoformat()
+        }
+        
+        os.makedirs(build_dir, exist_ok=True)
+        context_path = os.path.join(build_dir, COMPACT_CONTEXT_FILE)
+        with open(context_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(context)
+        with open(os.path.join(build_dir, COMPACT_CONTEXT_META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        
+        self._compact_context = (self.data_hash, context)
+        return context_path, meta
+    
+    def render_compact_context(self) -> str:
         """
         Create ULTRA-COMPACT version to save tokens (Option A1)
         Includes comments + post metadata with Interest Index
@@ -170,75 +367,56 @@ class FullDatasetLoader:
         context_parts.append("")
         
         # Add post metadata with Interest Index FIRST (before comments)
-        if self.posts:
-            context_parts.append("="*40)
-            context_parts.append("POSTS WITH INTEREST INDEX (20 posts)")
-            context_parts.append("="*40)
-            context_parts.append("FMT:Rank|Username|PostID|Views(Date)|IntIdx|Stance|Description")
-            context_parts.append("")
-            
-            for post in self.posts:
-                rank = post.get('rank', 'N/A')
-                username = post.get('username', 'N/A')
-                video_id = post.get('video_id', 'N/A')
-                views = post.get('views', 0)
-                views_date = post.get('views_as_of_date', 'Oct 30, 2025')
-                interest_index = post.get('interest_index', 0)
-                
-                # Get stance from post_stance field (correct source)
-                post_stance = post.get('post_stance', 'N/A').lower()
-                if post_stance == 'approving':
-                    stance = 'A'
-                elif post_stance == 'disapproving':
-                    stance = 'D'
-                else:
-                    stance = 'U'  # Unknown
-                
-                # Get description (truncate if too long to save tokens)
-                description = post.get('description', 'N/A')
-                if len(description) > 100:
-                    description = description[:97] + "..."
-                
-                context_parts.append(f"{rank}|{username}|{video_id}|{views:,}v({views_date})|{interest_index:.2f}|{stance}|{description}")
-            
-            context_parts.append("")
-            context_parts.append("IntIdx=Interest Index (higher=more interest)")
-            context_parts.append("="*40)
+        posts_context = self.render_posts_context()
+        if posts_context:
+            context_parts.append(posts_context)
             context_parts.append("")
         
-        # Extract post ID from URL for compression
-        def get_post_id(url):
-            """Extract video ID from TikTok URL"""
-            try:
-                if '/video/' in url:
-                    return url.split('/video/')[-1].split('?')[0]
-                return 'UNK'
-            except:
-                return 'UNK'
+        # All comments in ultra-compact format (enum columns, no per-row string work)
+        store = self.comments
+        context_parts.extend(store.compact_line(i) for i in range(len(store)))
         
-        # All comments in ultra-compact format
-        for comment in self.comments:
-            text = comment.get('text', '').strip()
-            
-            # Abbreviate sentiment
-            sentiment = comment.get('sentiment', 'neutral').lower()
-            s = 'N' if sentiment == 'negative' else ('P' if sentiment == 'positive' else 'U')
-            
-            # Get post ID instead of full URL
-            post_url = comment.get('post_url', 'N/A')
-            post_id = get_post_id(post_url)
+        return "\n".join(context_parts)
+    
+    def render_posts_context(self) -> str:
+        """Post table with Interest Index, as it appears in the compact context"""
+        if not self.posts:
+            return ""
+        
+        context_parts = []
+        context_parts.append("="*40)
+        context_parts.append("POSTS WITH INTEREST INDEX (20 posts)")
+        context_parts.append("="*40)
+        context_parts.append("FMT:Rank|Username|PostID|Views(Date)|IntIdx|Stance|Description")
+        context_parts.append("")
+        
+        for post in self.posts:
+            rank = post.get('rank', 'N/A')
+            username = post.get('username', 'N/A')
+            video_id = post.get('video_id', 'N/A')
+            views = post.get('views', 0)
+            views_date = post.get('views_as_of_date', 'Oct 30, 2025')
+            interest_index = post.get('interest_index', 0)
             
-            # Abbreviate stance
-            stance = comment.get('post_stance', 'N/A').lower()
-            st = 'A' if 'approv' in stance else ('D' if 'disapprov' in stance else 'U')
+            # Get stance from post_stance field (correct source)
+            post_stance = post.get('post_stance', 'N/A').lower()
+            if post_stance == 'approving':
+                stance = 'A'
+            elif post_stance == 'disapproving':
+                stance = 'D'
+            else:
+                stance = 'U'  # Unknown
             
-            likes = comment.get('likes', 0)
+            # Get description (truncate if too long to save tokens)
+            description = post.get('description', 'N/A')
+            if len(description) > 100:
+                description = description[:97] + "..."
             
-            # Ultra-compact format: only include likes if > 0
-            if likes > 0:
-                context_parts.append(f"[{s}]\"{text}\"|{post_id}|{st}|{likes}L")
-            else:
-                context_parts.append(f"[{s}]\"{text}\"|{post_id}|{st}")
+            context_parts.append(f"{rank}|{username}|{video_id}|{views:,}v({views_date})|{interest_index:.2f}|{stance}|{description}")
+        
+        context_parts.append("")
+        context_parts.append("IntIdx=Interest Index (higher=more interest)")
+        context_parts.append("="*40)
         
         return "\n".join(context_parts)
     
@@ -0,0 +1,149 @@
+"""
+Token-aware conversation history compaction
+The client resends the whole conversation every turn; this keeps the part
+that goes into the prompt within a token budget. Chart JSON, chart tags and post
+listings are stripped from assistant turns first, then old assistant turns
+are shortened, then the oldest turns are dropped. The latest user message
+is always kept.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+try:
+    from .rate_limiter import estimate_tokens
+    from .streaming import CHART_TAG_PATTERN
+except ImportError:
+    from rate_limiter import estimate_tokens
+    from streaming import CHART_TAG_PATTERN
+
+DEFAULT_TOKEN_BUDGET = 1200   # Estimated tokens for the whole history section
+DEFAULT_MAX_MESSAGES = 6      # Most recent messages considered at all
+SHORT_ASSISTANT_TOKENS = 120  # Old assistant turns are cut to about this size
+
+# Inline chart JSON ([CHART_START]...[CHART_END]) or a chart tag ([CHART:sentiment topic=salud])
+CHART_PATTERN = re.compile(
+    r'\[CHART_START\].*?(?:\[/?CHART_END\]|$)|' + CHART_TAG_PATTERN.pattern, re.DOTALL
+)
+
+# One post entry of the mandatory post list format:
+#   **[Rank #1] @user - description**
+#   🔗 https://www.tiktok.com/@user/video/123
+#   📊 Interest Index: 12.79 | 👁️ Views: ...
+POST_ENTRY_PATTERN = re.compile(
+    r'\*\*\[Rank #(\d+)\]\s*(@[\w.]+)[^\n]*\n\s*🔗[^\n]*(?:\n\s*📊[^\n]*)?'
+)
+
+CHART_PLACEHOLDER = '[gráfico omitido]'
+TRUNCATION_MARK = ' [...]'
+
+
+def strip_charts(text: str) -> str:
+    """Replace chart specs and chart tags with a short placeholder"""
+    return CHART_PATTERN.sub(CHART_PLACEHOLDER, text)
+
+
+def strip_post_listings(text: str) -> str:
+    """Collapse formatted post entries to 'Rank #N @user' (the posts are in the system data)"""
+    return POST_ENTRY_PATTERN.sub(lambda m: f"Rank #{m.group(1)} {m.group(2)}", text)
+
+
+def shorten(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens estimated tokens, at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(TRUNCATION_MARK))
+    cut = text[:limit]
+    if ' ' in cut:
+        cut = cut[:cut.rfind(' ')]
+    return cut.rstrip() + TRUNCATION_MARK
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """Estimated tokens of one history line as rendered in the prompt"""
+    return estimate_tokens(f"{str(message.get('role', 'user')).upper()}: {message.get('content', '')}")
+
+
+class HistoryManager:
+    """Fits conversation history into a token budget"""
+
+    def __init__(
+        self,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        max_messages: int = DEFAULT_MAX_MESSAGES,
+        short_assistant_tokens: int = SHORT_ASSISTANT_TOKENS
+    ):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.short_assistant_tokens = short_assistant_tokens
+
+    def compact(self, history: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """
+        Returns (messages to include, stats)
+
+        stats: tokens_in (whole history as received), tokens_kept,
+        tokens_saved and messages_dropped.
+        """
+        history = [m for m in (history or []) if isinstance(m, dict) and m.get('content')]
+        tokens_in = sum(message_tokens(m) for m in history)
+
+        messages = [
+            {'role': str(m.get('role', 'user')), 'content': str(m['content'])}
+            for m in history[-self.max_messages:]
+        ] if self.max_messages > 0 else []
+
+        # 1. Charts and post listings never need to be repeated back
+        for m in messages:
+            if m['role'] == 'assistant':
+                m['content'] = strip_post_listings(strip_charts(m['content']))
+
+        # 2. Shorten assistant turns, oldest first
+        for m in messages:
+            if self._total(messages) <= self.token_budget:
+                break
+            if m['role'] == 'assistant':
+                m['content'] = shorten(m['content'], self.short_assistant_tokens)
+
+        # 3. Drop the oldest turns, but keep the latest user message
+        last_user = max((i for i, m in enumerate(messages) if m['role'] == 'user'), default=None)
+        while len(messages) > 1 and self._total(messages) > self.token_budget:
+            drop = 0 if last_user != 0 else 1
+            if drop >= len(messages):
+                break
+            del messages[drop]
+            if last_user is not None and drop < last_user:
+                last_user -= 1
+
+        # 4. A single huge message is cut to the budget
+        if messages and self._total(messages) > self.token_budget:
+            for m in messages:
+                m['content'] = shorten(m['content'], max(1, self.token_budget // len(messages) - 4))
+
+        tokens_kept = self._total(messages)
+        stats = {
+            'tokens_in': tokens_in,
+            'tokens_kept': tokens_kept,
+            'tokens_saved': max(0, tokens_in - tokens_kept),
+            'messages_dropped': len(history) - len(messages)
+        }
+        return messages, stats
+
+    @staticmethod
+    def _total(messages: List[Dict[str, str]]) -> int:
+        return sum(message_tokens(m) for m in messages)
+
+
+# Singleton instance
+_history_manager = None
+
+
+def get_history_manager() -> HistoryManager:
+    """Get or create the history manager (configured from environment)"""
+    global _history_manager
+    if _history_manager is None:
+        _history_manager = HistoryManager(
+            token_budget=int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET)),
+            max_messages=int(os.environ.get('CHAT_HISTORY_MAX_MESSAGES', DEFAULT_MAX_MESSAGES))
+        )
+    return _history_manager
@@ -0,0 +1,425 @@
+"""
+SQLite conversation log store
+One narrow row per logged request with the columns the dashboard filters
+and aggregates on; the full entry (with the assistant response) is kept as
+JSON in a side table so aggregate scans never read it. WAL mode lets the
+log writer insert while dashboard queries read; timestamp and session_id
+are indexed so a window query touches only its own rows.
+
+Per-day rollups (counts and sums, session sets, keyword and source
+counters) are updated in the same transaction as each insert, so dashboard
+analytics for any window merge a handful of day rows instead of scanning
+the log. rebuild_rollups() regenerates them from the conversations table.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .usage_cost import estimate_cost, total_tokens
+except ImportError:
+    from usage_cost import estimate_cost, total_tokens
+
+DEFAULT_DB_PATH = '/tmp/chat_logs.sqlite'
+IMPORT_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 50
+FETCH_BATCH_SIZE = 500  # Rows fetched at a time when iterating a window
+
+# Counted in user messages for the dashboard's "popular topics". Stored as a
+# bitmask per row when the entry is inserted (bit i = KEYWORDS[i]); append
+# only, existing bits must keep their meaning.
+KEYWORDS = (
+    'sentiment', 'interest', 'topic', 'post', 'comment', 'analysis', 'chart', 'graph', 'visualization',
+    'recommendation', 'negative', 'positive', 'corruption', 'budget', 'presupuesto'
+)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS conversations ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' entry_hash TEXT NOT NULL UNIQUE,'
+    ' timestamp TEXT NOT NULL,'
+    ' session_id TEXT NOT NULL,'
+    ' keywords INTEGER NOT NULL,'   # Bitmask over KEYWORDS
+    ' message_length INTEGER NOT NULL,'
+    ' response_length INTEGER NOT NULL,'
+    ' model TEXT,'
+    ' cache_hit INTEGER,'          # NULL for entries logged before the response cache
+    ' input_tokens INTEGER NOT NULL,'
+    ' output_tokens INTEGER NOT NULL,'
+    ' cache_read_tokens INTEGER NOT NULL,'
+    ' cache_write_tokens INTEGER NOT NULL,'
+    ' total_tokens INTEGER NOT NULL,'
+    ' cost_usd REAL NOT NULL,'
+    ' latency_ms REAL,'
+    ' sources TEXT)',              # JSON array, NULL when the entry has none
+    'CREATE TABLE IF NOT EXISTS conversation_entries (id INTEGER PRIMARY KEY, entry TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id, timestamp)',
+    # Rollups, keyed by UTC day ('YYYY-MM-DD')
+    'CREATE TABLE IF NOT EXISTS daily_rollups ('
+    ' day TEXT PRIMARY KEY, queries INTEGER NOT NULL, message_length INTEGER NOT NULL,'
+    ' response_length INTEGER NOT NULL, cache_logged INTEGER NOT NULL, cache_hits INTEGER NOT NULL,'
+    ' input INTEGER NOT NULL, output INTEGER NOT NULL, cache_read INTEGER NOT NULL,'
+    ' cache_write INTEGER NOT NULL, total INTEGER NOT NULL, metered INTEGER NOT NULL, spend REAL NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS daily_sessions (day TEXT NOT NULL, session_id TEXT NOT NULL, PRIMARY KEY (day, session_id))',
+    'CREATE TABLE IF NOT EXISTS daily_keywords ('
+    ' day TEXT NOT NULL, keyword TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (day, keyword))',
+    'CREATE TABLE IF NOT EXISTS daily_sources ('
+    ' day TEXT NOT NULL, source TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (day, source))'
+)
+ROLLUP_TABLES = ('daily_rollups', 'daily_sessions', 'daily_keywords', 'daily_sources')
+
+COLUMNS = (
+    'entry_hash', 'timestamp', 'session_id', 'keywords', 'message_length', 'response_length', 'model',
+    'cache_hit', 'input_tokens', 'output_tokens', 'cache_read_tokens', 'cache_write_tokens', 'total_tokens',
+    'cost_usd', 'latency_ms', 'sources'
+)
+DAILY_FIELDS = (
+    'queries', 'message_length', 'response_length', 'cache_logged', 'cache_hits',
+    'input', 'output', 'cache_read', 'cache_write', 'total', 'metered', 'spend'
+)
+INSERT_SQL = f"INSERT OR IGNORE INTO conversations ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+ROLLUP_SQL = (
+    f"INSERT INTO daily_rollups (day, {', '.join(DAILY_FIELDS)}) VALUES (?{', ?' * len(DAILY_FIELDS)}) "
+    f"ON CONFLICT (day) DO UPDATE SET {', '.join(f'{field} = {field} + excluded.{field}' for field in DAILY_FIELDS)}"
+)
+COUNTER_SQL = (
+    'INSERT INTO {table} (day, {key}, count) VALUES (?, ?, ?) '
+    'ON CONFLICT (day, {key}) DO UPDATE SET count = count + excluded.count'
+)
+
+
+def keyword_mask(message: str) -> int:
+    """Bitmask of the KEYWORDS contained in a message (case-insensitive)"""
+    message = message.lower()
+    return sum(1 << i for i, keyword in enumerate(KEYWORDS) if keyword in message)
+
+
+def entry_row(entry: Dict[str, Any], text: str) -> Tuple:
+    """Column values for a log entry (older entries only have usage and texts)"""
+    usage = entry.get('usage') or {}
+    total = total_tokens(usage)
+    cost = entry.get('cost_usd')
+    if cost is None:
+        cost = estimate_cost(usage, entry.get('model')) if total else 0.0
+    cache_hit = entry.get('cache_hit')
+    return (
+        hashlib.sha1(text.encode('utf-8')).hexdigest(),
+        entry.get('timestamp', ''),
+        entry.get('session_id', 'default'),
+        keyword_mask(entry.get('user_message', '')),
+        entry.get('message_length', len(entry.get('user_message', ''))),
+        entry.get('response_length', len(entry.get('assistant_response', ''))),
+        entry.get('model'),
+        None if cache_hit is None else int(bool(cache_hit)),
+        usage.get('input_tokens', 0),
+        usage.get('output_tokens', 0),
+        usage.get('cache_read_input_tokens', 0),
+        usage.get('cache_creation_input_tokens', 0),
+        total,
+        cost if total else 0.0,
+        entry.get('latency_ms'),
+        json.dumps(entry['sources']) if entry.get('sources') else None
+    )
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    """Opaque position after a row, for the next page (newest first)"""
+    return f"{timestamp}|{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(timestamp, id) of a cursor; raises ValueError when it is malformed"""
+    timestamp, separator, row_id = str(cursor).rpartition('|')
+    if not separator or not timestamp:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return timestamp, int(row_id)
+
+
+def rollup_values(row: Tuple) -> Tuple:
+    """A conversations row's contribution to its day, in DAILY_FIELDS order"""
+    values = dict(zip(COLUMNS, row))
+    cache_hit = values['cache_hit']
+    return (
+        1, values['message_length'], values['response_length'],
+        int(cache_hit is not None), cache_hit or 0,
+        values['input_tokens'], values['output_tokens'], values['cache_read_tokens'],
+        values['cache_write_tokens'], values['total_tokens'], int(values['total_tokens'] > 0), values['cost_usd']
+    )
+
+
+class LogStore:
+    """
+    Conversation log table with windowed queries for the dashboard
+
+    Windows are given as a 'YYYY-MM-DD' (or full ISO) lower bound on the
+    timestamp, so every query is an index range scan. Rollup queries work
+    on whole days: only the date part of the bound is used.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, durable: bool = False):
+        self.db_path = db_path
+        self.durable = durable
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL: a crash can lose the last transactions but never corrupts the file
+        conn.execute(f"PRAGMA synchronous={'FULL' if self.durable else 'NORMAL'}")
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            has_logs = conn.execute('SELECT EXISTS (SELECT 1 FROM conversations)').fetchone()[0]
+            has_rollups = conn.execute('SELECT EXISTS (SELECT 1 FROM daily_rollups)').fetchone()[0]
+        finally:
+            conn.close()
+        if has_logs and not has_rollups:
+            # A store written before rollups existed
+            self.rebuild_rollups()
+
+    def insert_many(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Insert entries in one transaction; returns the number of new rows"""
+        rows = []
+        for entry in entries:
+            text = json.dumps(entry, sort_keys=True)
+            rows.append((entry_row(entry, text), text, entry))
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            new = []
+            for row, text, entry in rows:
+                cursor = conn.execute(INSERT_SQL, row)
+                if cursor.rowcount:  # 0 when the entry is already stored
+                    conn.execute('INSERT INTO conversation_entries (id, entry) VALUES (?, ?)', (cursor.lastrowid, text))
+                    new.append((row, entry))
+            self._add_to_rollups(conn, new)
+            conn.execute('COMMIT')
+            return len(new)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _add_to_rollups(self, conn: sqlite3.Connection, rows: List[Tuple[Tuple, Dict[str, Any]]]):
+        """Fold newly inserted rows into their days' rollups (inside the insert transaction)"""
+        days, sessions, keywords, sources = {}, set(), {}, {}
+        for row, entry in rows:
+            day = row[COLUMNS.index('timestamp')][:10]
+            values = rollup_values(row)
+            days[day] = [a + b for a, b in zip(days[day], values)] if day in days else list(values)
+            sessions.add((day, row[COLUMNS.index('session_id')]))
+            mask = row[COLUMNS.index('keywords')]
+            for i, keyword in enumerate(KEYWORDS):
+                if mask & (1 << i):
+                    keywords[day, keyword] = keywords.get((day, keyword), 0) + 1
+            for source in entry.get('sources') or ():
+                sources[day, source] = sources.get((day, source), 0) + 1
+
+        conn.executemany(ROLLUP_SQL, [(day, *values) for day, values in days.items()])
+        conn.executemany('INSERT OR IGNORE INTO daily_sessions (day, session_id) VALUES (?, ?)', sessions)
+        conn.executemany(
+            COUNTER_SQL.format(table='daily_keywords', key='keyword'),
+            [(day, keyword, count) for (day, keyword), count in keywords.items()]
+        )
+        conn.executemany(
+            COUNTER_SQL.format(table='daily_sources', key='source'),
+            [(day, source, count) for (day, source), count in sources.items()]
+        )
+
+    def rebuild_rollups(self) -> int:
+        """Regenerate every rollup from the conversations table; returns the number of days"""
+        keyword_sums = ''.join(f', SUM((keywords & {1 << i}) != 0)' for i in range(len(KEYWORDS)))
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for table in ROLLUP_TABLES:
+                conn.execute(f'DELETE FROM {table}')
+            rows = conn.execute(
+                'SELECT substr(timestamp, 1, 10) AS day, COUNT(*), SUM(message_length), SUM(response_length), '
+                'COUNT(cache_hit), COALESCE(SUM(cache_hit), 0), '
+                'SUM(input_tokens), SUM(output_tokens), SUM(cache_read_tokens), SUM(cache_write_tokens), '
+                f'SUM(total_tokens), SUM(total_tokens > 0), SUM(cost_usd){keyword_sums} '
+                'FROM conversations GROUP BY day'
+            ).fetchall()
+            conn.executemany(ROLLUP_SQL, [row[:len(DAILY_FIELDS) + 1] for row in rows])
+            conn.executemany(
+                'INSERT INTO daily_keywords (day, keyword, count) VALUES (?, ?, ?)',
+                [
+                    (row[0], keyword, count)
+                    for row in rows
+                    for keyword, count in zip(KEYWORDS, row[len(DAILY_FIELDS) + 1:]) if count
+                ]
+            )
+            conn.execute(
+                'INSERT INTO daily_sessions (day, session_id) '
+                'SELECT DISTINCT substr(timestamp, 1, 10), session_id FROM conversations'
+            )
+            conn.execute(
+                'INSERT INTO daily_sources (day, source, count) '
+                'SELECT substr(timestamp, 1, 10) AS day, source.value, COUNT(*) '
+                'FROM conversations, json_each(conversations.sources) AS source '
+                'WHERE sources IS NOT NULL GROUP BY day, source.value'
+            )
+            conn.execute('COMMIT')
+            return len(rows)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def import_jsonl(self, path: str) -> Tuple[int, int]:
+        """
+        Import a JSONL log file; returns (inserted, skipped)
+
+        Re-importing is safe: entries already in the store are skipped.
+        """
+        inserted = skipped = 0
+        batch = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    skipped += 1
+                    continue
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    new = self.insert_many(batch)
+                    inserted, skipped = inserted + new, skipped + len(batch) - new
+                    batch = []
+        new = self.insert_many(batch)
+        return inserted + new, skipped + len(batch) - new
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def page(
+        self,
+        since: str,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of entries since a timestamp, newest first
+
+        Returns the entries and the cursor of the next page (None on the last
+        page). Keyset pagination on (timestamp, id): every page is an index
+        range scan, however deep, and rows inserted meanwhile never shift it.
+        """
+        sql = (
+            'SELECT c.timestamp, c.id, e.entry FROM conversations AS c JOIN conversation_entries AS e ON e.id = c.id '
+            'WHERE c.timestamp >= ?'
+        )
+        params = (since,)
+        if cursor:
+            sql += ' AND (c.timestamp, c.id) < (?, ?)'
+            params += decode_cursor(cursor)
+        sql += ' ORDER BY c.timestamp DESC, c.id DESC LIMIT ?'
+        rows = self._query(sql, params + (max(1, limit) + 1,))
+
+        more = len(rows) > max(1, limit)
+        rows = rows[:max(1, limit)]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1]) if more else None
+        return [json.loads(entry) for _, _, entry in rows], next_cursor
+
+    def iter_entries(self, since: str) -> Iterator[Dict[str, Any]]:
+        """
+        Every entry since a timestamp, newest first, read lazily
+
+        Rows are fetched FETCH_BATCH_SIZE at a time from one read snapshot,
+        so an export never holds the window in memory.
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'SELECT e.entry FROM conversations AS c JOIN conversation_entries AS e ON e.id = c.id '
+                'WHERE c.timestamp >= ? ORDER BY c.timestamp DESC, c.id DESC', (since,)
+            )
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    return
+                for entry, in rows:
+                    yield json.loads(entry)
+        finally:
+            conn.close()
+
+    def daily(self, since: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-day rollups: queries, message/response length, cache hits,
+        tokens, metered requests, spend and keyword counts
+        """
+        rows = self._query(
+            f"SELECT day, {', '.join(DAILY_FIELDS)} FROM daily_rollups WHERE day >= ? ORDER BY day", (since[:10],)
+        )
+        days = {}
+        for row in rows:
+            days[row[0]] = dict(zip(DAILY_FIELDS, row[1:]))
+            days[row[0]]['keywords'] = dict.fromkeys(KEYWORDS, 0)
+        for day, keyword, count in self._query(
+            'SELECT day, keyword, count FROM daily_keywords WHERE day >= ?', (since[:10],)
+        ):
+            if day in days and keyword in days[day]['keywords']:
+                days[day]['keywords'][keyword] = count
+        return days
+
+    def unique_sessions(self, since: str) -> int:
+        """Distinct sessions over the window (merged daily session sets)"""
+        return self._query('SELECT COUNT(DISTINCT session_id) FROM daily_sessions WHERE day >= ?', (since[:10],))[0][0]
+
+    def source_counts(self, since: str) -> Dict[str, int]:
+        """How often each source was cited"""
+        rows = self._query(
+            'SELECT source, SUM(count) FROM daily_sources WHERE day >= ? GROUP BY source', (since[:10],)
+        )
+        return dict(rows)
+
+    def metered(self, since: str) -> Tuple[List[int], List[float]]:
+        """Total tokens and latencies of the requests that reached the model"""
+        rows = self._query(
+            'SELECT total_tokens, latency_ms FROM conversations WHERE timestamp >= ? AND total_tokens > 0', (since,)
+        )
+        return [tokens for tokens, _ in rows], [latency for _, latency in rows if latency is not None]
+
+    def session(self, session_id: str) -> List[Dict[str, Any]]:
+        """One session's entries in order"""
+        rows = self._query(
+            'SELECT e.entry FROM conversations AS c JOIN conversation_entries AS e ON e.id = c.id '
+            'WHERE c.session_id = ? ORDER BY c.timestamp, c.id', (session_id,)
+        )
+        return [json.loads(entry) for entry, in rows]
+
+
+# Singleton instance
+_log_store = None
+
+
+def get_log_store() -> LogStore:
+    """Get or create the log store (configured from environment)"""
+    global _log_store
+    if _log_store is None:
+        _log_store = LogStore(
+            db_path=os.environ.get('CHAT_LOG_DB', DEFAULT_DB_PATH),
+            durable=os.environ.get('CHAT_LOG_DURABILITY', 'buffered') != 'buffered'
+        )
+    return _log_store
@@ -0,0 +1,211 @@
+"""
+Buffered conversation log writer
+Requests hand their log entry to write() and return; a background thread
+writes batches to the SQLite log store (log_store.py, the default) or, with
+CHAT_LOG_BACKEND=jsonl, appends them to the daily JSONL files
+(chat_log_YYYY-MM-DD.jsonl). A JSONL batch goes out as one O_APPEND write
+under an exclusive advisory lock, so lines from concurrent workers never
+interleave.
+
+Durability policies (CHAT_LOG_DURABILITY):
+    buffered  background flush, no fsync (default)
+    fsync     background flush, fsync after every batch
+    sync      write + fsync in the caller before write() returns
+For the SQLite store, fsync and sync mean synchronous=FULL (buffered: NORMAL).
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: O_APPEND alone
+    fcntl = None
+
+try:
+    from .log_store import get_log_store
+except ImportError:
+    from log_store import get_log_store
+
+DEFAULT_LOG_DIR = '/tmp/chat_logs'
+DEFAULT_BATCH_SIZE = 64          # Entries that trigger an early flush
+DEFAULT_FLUSH_INTERVAL = 1.0     # Seconds between background flushes
+DEFAULT_MAX_PENDING = 10000      # Entries kept in memory if the disk is failing
+DURABILITY_POLICIES = ('buffered', 'fsync', 'sync')
+
+LOG_DIR = os.environ.get('CHAT_LOG_DIR', DEFAULT_LOG_DIR)  # JSONL files (and the migration source)
+LOG_BACKEND = os.environ.get('CHAT_LOG_BACKEND', 'sqlite')  # 'sqlite' or 'jsonl'
+
+
+def log_file_name(timestamp: Optional[str] = None) -> str:
+    """Daily log file for an ISO timestamp (default: today, UTC)"""
+    day = (timestamp or datetime.utcnow().isoformat())[:10]
+    return f"chat_log_{day}.jsonl"
+
+
+def append_lines(path: str, data: bytes, fsync: bool = False):
+    """Append whole lines to a file under an exclusive advisory lock"""
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        if fsync:
+            os.fsync(fd)
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+class LogWriter:
+    """
+    In-memory batch of log entries, flushed on size, time and exit
+
+    write() serializes the entry (so later changes to the dict don't reach
+    the log, and an unserializable entry fails in the caller instead of
+    taking its batch down) and queues the JSON line under a short lock. The
+    flush thread starts on first use (and again after a fork). With a
+    store, entries go to it instead of the JSONL files in log_dir.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = DEFAULT_LOG_DIR,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        durability: str = 'buffered',
+        max_pending: int = DEFAULT_MAX_PENDING,
+        store=None
+    ):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy {durability!r} (use one of {', '.join(DURABILITY_POLICIES)})")
+        self.log_dir = log_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.max_pending = max_pending
+        self.store = store
+        self.dropped = 0
+        self._pending = deque()  # (log file name, JSON line), oldest first
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush at a time within the process
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+        os.makedirs(log_dir, exist_ok=True)
+        atexit.register(self.close)
+
+    def write(self, entry: Dict[str, Any]):
+        """Queue one log entry (TypeError/ValueError if it isn't JSON-serializable)"""
+        record = (log_file_name(entry.get('timestamp')), json.dumps(entry))
+        if self.durability == 'sync':
+            self._append([record])
+            return
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(record)
+            backlog = len(self._pending)
+        self._ensure_thread()
+        if backlog >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything pending now; returns the number of lines written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+
+            try:
+                self._append(batch)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Warning: Failed to write conversation log: {e}")
+                with self._lock:
+                    # Keep the batch (oldest first) for the next attempt
+                    self._pending.extendleft(reversed(batch))
+                    while len(self._pending) > self.max_pending:
+                        self._pending.popleft()
+                        self.dropped += 1
+                return 0
+            return len(batch)
+
+    def _append(self, records: List[Tuple[str, str]]):
+        if self.store is not None:
+            self.store.insert_many(json.loads(line) for _, line in records)
+            return
+
+        by_file = {}
+        for name, line in records:
+            by_file.setdefault(name, []).append((line + '\n').encode('utf-8'))
+        os.makedirs(self.log_dir, exist_ok=True)
+        for name, lines in by_file.items():
+            append_lines(os.path.join(self.log_dir, name), b''.join(lines), fsync=self.durability != 'buffered')
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _ensure_thread(self):
+        # A forked child inherits the buffer but not the thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._pending.clear()  # The parent writes its own entries
+            self._stopped = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='chat-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flush thread and write what is left"""
+        self._stopped = True
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread() and self._pid == os.getpid():
+            thread.join(timeout=5)
+        self.flush()
+
+
+# Singleton instance
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> LogWriter:
+    """Get or create the conversation log writer (configured from environment)"""
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = LogWriter(
+                    log_dir=LOG_DIR,
+                    batch_size=int(os.environ.get('CHAT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+                    flush_interval=float(os.environ.get('CHAT_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)),
+                    durability=os.environ.get('CHAT_LOG_DURABILITY', 'buffered'),
+                    store=get_log_store() if LOG_BACKEND == 'sqlite' else None
+                )
+    return _log_writer
@@ -0,0 +1,201 @@
+"""
+Local fast path for structured post questions
+"lista de posts", "¿cuál post generó más interés?", "posts de @usuario" only
+need the 20 rows in FullDatasetLoader.posts, so they are answered here in the
+mandated link/metadata format instead of with a full LLM call. Only
+questions made entirely of words the router understands are answered;
+anything else (topics, sentiment, "sobre ...", "por qué") goes to the model.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+try:
+    from .full_dataset_loader import get_full_dataset_loader
+    from .text_normalizer import normalize_text
+    from .topics import detect_topics
+except ImportError:
+    from full_dataset_loader import get_full_dataset_loader
+    from text_normalizer import normalize_text
+    from topics import detect_topics
+
+LOCAL_MODEL = 'local:post_router'
+
+DESCRIPTION_LENGTH = 100
+
+POST_WORDS = {'post', 'posts', 'video', 'videos', 'publicacion', 'publicaciones', 'tiktok', 'tiktoks'}
+
+# Anything about what posts say or how people reacted needs the model
+OPEN_ENDED_WORDS = {
+    'comentario', 'comentarios', 'comment', 'comments', 'sentimiento', 'sentimientos', 'sentiment',
+    'opinion', 'opiniones', 'opina', 'opinan', 'piensa', 'piensan', 'reaccion', 'reacciones',
+    'analiza', 'analisis', 'analizar', 'analyze', 'analysis', 'porque', 'why', 'compara', 'comparar',
+    'comparacion', 'compare', 'grafica', 'grafico', 'chart', 'tema', 'temas', 'topic', 'topics',
+    'dice', 'dicen', 'resumen', 'resume', 'resumir', 'summary', 'summarize', 'explica', 'explicame',
+    'explain', 'significa', 'contenido', 'habla', 'hablan', 'trata', 'about', 'probabilidad'
+}
+
+LIST_WORDS = {'lista', 'listado', 'list', 'todos', 'todas', 'all', 'muestra', 'muestrame', 'show', 'cuales', 'which', 'ver', 'dame'}
+RANK_WORDS = {'interes', 'interest', 'engagement', 'ranking', 'rank', 'top', 'popular', 'populares', 'viral', 'virales'}
+VIEW_WORDS = {'vistas', 'views', 'visualizaciones', 'reproducciones', 'vista', 'visto', 'vistos'}
+MOST_WORDS = {'mas', 'mayor', 'mejor', 'mejores', 'most', 'highest', 'best', 'top'}
+LEAST_WORDS = {'menos', 'menor', 'peor', 'peores', 'least', 'lowest', 'worst'}
+SINGULAR_WORDS = {'cual', 'which', 'what'}
+PLURAL_POST_WORDS = {'posts', 'videos', 'publicaciones', 'tiktoks'}
+ENGLISH_WORDS = {'show', 'which', 'what', 'list', 'the', 'most', 'least', 'all', 'by', 'me', 'generated'}
+
+STANCE_WORDS = {
+    'approving': {'aprobatorio', 'aprobatorios', 'approving', 'favor'},
+    'disapproving': {'desaprobatorio', 'desaprobatorios', 'disapproving', 'contra', 'critico', 'criticos'}
+}
+
+NUMBER_WORDS = {
+    'uno': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6, 'siete': 7, 'ocho': 8,
+    'nueve': 9, 'diez': 10, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'ten': 10
+}
+
+# Function words and verbs that carry no filter ("¿cuál post generó más interés?")
+FILLER_WORDS = {
+    'de', 'del', 'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'con', 'en', 'y', 'a', 'al', 'que',
+    'me', 'mi', 'por', 'para', 'es', 'son', 'fue', 'fueron', 'hay', 'tiene', 'tienen', 'tuvo', 'tuvieron',
+    'genero', 'generaron', 'generan', 'quiero', 'puedes', 'podrias', 'dataset', 'cuenta', 'cuentas',
+    'the', 'of', 'with', 'an', 'in', 'is', 'are', 'has', 'have', 'had', 'got', 'please', 'account', 'accounts'
+}
+
+# Every word a routed question may contain; anything else means the
+# question filters or asks about something the post table can't answer
+KNOWN_WORDS = (
+    POST_WORDS | LIST_WORDS | RANK_WORDS | VIEW_WORDS | MOST_WORDS | LEAST_WORDS | SINGULAR_WORDS
+    | ENGLISH_WORDS | set(NUMBER_WORDS) | FILLER_WORDS | set().union(*STANCE_WORDS.values())
+)
+
+_HANDLE = re.compile(r'@?([a-z0-9_.]+)')
+_HANDLE_MENTION = re.compile(r'@[a-z0-9_.]+')
+
+
+def format_post(post: Dict[str, Any]) -> str:
+    """One post in the mandated link/metadata format"""
+    username = post.get('username', '')
+    handle = username if username.startswith('@') else f'@{username}'
+    description = ' '.join(str(post.get('description') or '').split())
+    if len(description) > DESCRIPTION_LENGTH:
+        description = description[:DESCRIPTION_LENGTH].rsplit(' ', 1)[0].rstrip(' ,.;:') + '...'
+    stance = (post.get('post_stance') or '').capitalize() or 'N/A'
+    url = post.get('url') or f"https://www.tiktok.com/{handle}/video/{post.get('video_id')}"
+    return (
+        f"**[Rank #{post.get('rank', 'N/A')}] {handle} - {description}**\n"
+        f"🔗 {url}\n"
+        f"📊 Interest Index: {post.get('interest_index', 0):.2f} | "
+        f"👁️ Views: {post.get('views', 0):,} (as of {post.get('views_as_of_date', 'October 30, 2025')}) | "
+        f"Stance: {stance}"
+    )
+
+
+class PostRouter:
+    """
+    Recognizes post list / ranking / by-account questions
+
+    route(message) returns the finished answer, or None when the question
+    needs the model.
+    """
+
+    def __init__(self, posts: Optional[List[Dict[str, Any]]] = None):
+        self.posts = posts if posts is not None else get_full_dataset_loader().posts
+        self.handles = {str(post.get('username', '')).lstrip('@').lower() for post in self.posts}
+
+    def classify(self, message: str) -> Optional[Dict[str, Any]]:
+        """Parsed intent ({'sort', 'descending', 'limit', 'accounts', 'stance'}) or None"""
+        words = set(normalize_text(message).split())
+        if not words & POST_WORDS or words & OPEN_ENDED_WORDS or 'por que' in normalize_text(message):
+            return None
+
+        accounts = sorted(handle for handle in _HANDLE.findall(message.lower()) if handle in self.handles)
+        if self._unknown_words(words, accounts) or detect_topics(_HANDLE_MENTION.sub(' ', message.lower())):
+            return None
+        stance = next((name for name, markers in STANCE_WORDS.items() if words & markers), None)
+        by_views = bool(words & VIEW_WORDS)
+        ranked = bool(words & (RANK_WORDS | VIEW_WORDS))
+        least = bool(words & LEAST_WORDS)
+        most = bool(words & MOST_WORDS) or ranked
+
+        if not (accounts or stance or ranked or words & LIST_WORDS or least):
+            return None
+
+        limit = self._limit(message, words)
+        if limit is None and (most or least) and not words & PLURAL_POST_WORDS and (
+                words & SINGULAR_WORDS or not words & LIST_WORDS):
+            limit = 1  # "¿cuál post generó más interés?"
+
+        return {
+            'sort': 'views' if by_views else 'interest_index',
+            'descending': not least,
+            'limit': limit,
+            'accounts': accounts,
+            'stance': stance,
+            'english': len(words & ENGLISH_WORDS) >= 2
+        }
+
+    def _unknown_words(self, words: set, accounts: List[str]) -> set:
+        """Words the router can't turn into a filter (topics, sentiment, "sobre", ...)"""
+        handle_words = set(normalize_text(' '.join(accounts)).split())
+        return {word for word in words - KNOWN_WORDS - handle_words if not word.isdigit()}
+
+    def _limit(self, message: str, words: set) -> Optional[int]:
+        digits = re.search(r'\b(\d{1,2})\b', message)
+        if digits and not re.search(r'@\w*' + digits.group(1), message.lower()):
+            return max(1, int(digits.group(1)))
+        for word, value in NUMBER_WORDS.items():
+            if word in words:
+                return value
+        return None
+
+    def route(self, message: str) -> Optional[str]:
+        """Local answer for a structured post question (None = ask the model)"""
+        intent = self.classify(message)
+        if intent is None:
+            return None
+
+        posts = [post for post in self.posts
+                 if (not intent['accounts'] or str(post.get('username', '')).lstrip('@').lower() in intent['accounts'])
+                 and (not intent['stance'] or (post.get('post_stance') or '').lower() == intent['stance'])]
+        posts.sort(key=lambda post: (post.get(intent['sort']) or 0), reverse=intent['descending'])
+        if intent['limit']:
+            posts = posts[:intent['limit']]
+
+        return self._answer(posts, intent)
+
+    def _answer(self, posts: List[Dict[str, Any]], intent: Dict[str, Any]) -> str:
+        english = intent['english']
+        if not posts:
+            return ("No posts in the dataset match that request." if english
+                    else "No hay posts en el dataset que coincidan con esa búsqueda.")
+
+        metric = ('views' if english else 'vistas') if intent['sort'] == 'views' else 'Interest Index'
+        if english:
+            order = 'highest first' if intent['descending'] else 'lowest first'
+            scope = f" by {', '.join('@' + a for a in intent['accounts'])}" if intent['accounts'] else ''
+            scope += f" ({intent['stance']})" if intent['stance'] else ''
+            header = f"{len(posts)} post{'s' if len(posts) != 1 else ''}{scope}, ranked by {metric} ({order}):"
+            footer = ("Interest Index measures engagement against the account's own baseline "
+                      "(e.g. 12.80 = 12.8x its usual interest). Ranks are over all 20 posts.")
+        else:
+            order = 'de mayor a menor' if intent['descending'] else 'de menor a mayor'
+            scope = f" de {', '.join('@' + a for a in intent['accounts'])}" if intent['accounts'] else ''
+            if intent['stance']:
+                scope += ' aprobatorios' if intent['stance'] == 'approving' else ' desaprobatorios'
+            header = f"{len(posts)} post{'s' if len(posts) != 1 else ''}{scope}, ordenados por {metric} ({order}):"
+            footer = ("El Interest Index mide el interés frente a la línea base de la cuenta "
+                      "(p. ej. 12.80 = 12.8 veces su interés habitual). El rank es sobre los 20 posts.")
+
+        return "\n\n".join([header] + [format_post(post) for post in posts] + [footer])
+
+
+# Singleton instance
+_post_router = None
+
+def get_post_router() -> PostRouter:
+    """Get or create the post router"""
+    global _post_router
+    if _post_router is None:
+        _post_router = PostRouter()
+    return _post_router
@@ -0,0 +1,138 @@
+"""
+Cold-start profiling for the serverless handlers
+Times the first occurrence of each startup phase (import, data load, context
+build, client setup, first request) and, with CHAT_COLD_START_PROFILE=1,
+every module import. The report is attached once to the chat log.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+PROFILE_ENABLED = os.environ.get('CHAT_COLD_START_PROFILE', '0') == '1'
+TOP_IMPORTS = 15  # Slowest imports included in the report
+
+PROCESS_START = time.perf_counter()
+
+
+class ImportTimer:
+    """
+    Meta path hook that times each module's execution
+
+    Specs still come from the regular finders; per-module loader instances
+    get a timed exec_module. Inclusive time contains nested imports, self
+    time does not.
+    """
+
+    def __init__(self):
+        self.timings = {}  # module -> [inclusive_ms, self_ms]
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._local, 'finding', False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+
+        loader = spec.loader
+        # Builtin/frozen importers are shared classes (and cheap); leave them alone
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, fullname: str, exec_module):
+        def timed_exec_module(module):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                inclusive = (time.perf_counter() - start) * 1000
+                children = stack.pop()
+                if stack:
+                    stack[-1] += inclusive
+                self.timings[fullname] = [round(inclusive, 2), round(inclusive - children, 2)]
+        return timed_exec_module
+
+    def slowest(self, limit: int = TOP_IMPORTS) -> List[Dict[str, Any]]:
+        """Top-level view: the slowest imports by inclusive time"""
+        ranked = sorted(self.timings.items(), key=lambda item: -item[1][0])
+        return [{'module': name, 'ms': ms, 'self_ms': self_ms} for name, (ms, self_ms) in ranked[:limit]]
+
+
+class ColdStartProfile:
+    """First-occurrence timings of the startup phases of one process"""
+
+    def __init__(self, enabled: bool = PROFILE_ENABLED):
+        self.enabled = enabled
+        self.phases = {}
+        self.import_timer = ImportTimer() if enabled else None
+        self._reported = False
+        self._lock = threading.Lock()
+        if self.import_timer:
+            self.import_timer.install()
+
+    def record(self, name: str, seconds: float):
+        """Keep the first timing of a phase (later ones are warm)"""
+        with self._lock:
+            self.phases.setdefault(name, round(seconds * 1000, 2))
+
+    @contextmanager
+    def phase(self, name: str):
+        if name in self.phases:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def take_report(self) -> Optional[Dict[str, Any]]:
+        """The profile, once per process (None if disabled or already reported)"""
+        with self._lock:
+            if not self.enabled or self._reported:
+                return None
+            self._reported = True
+
+        report = {
+            'phases_ms': dict(self.phases),
+            'process_uptime_ms': round((time.perf_counter() - PROCESS_START) * 1000, 2),
+            'modules_loaded': len(sys.modules)
+        }
+        if self.import_timer:
+            report['slowest_imports'] = self.import_timer.slowest()
+
+        summary = ', '.join(f"{name}={ms:.0f}ms" for name, ms in report['phases_ms'].items())
+        print(f"✓ Cold start profile: {summary}")
+        return report
+
+
+# Singleton instance
+_profile = None
+
+
+def get_cold_start_profile() -> ColdStartProfile:
+    """Get or create the process-wide cold-start profile"""
+    global _profile
+    if _profile is None:
+        _profile = ColdStartProfile()
+    return _profile
@@ -0,0 +1,305 @@
+"""
+Post-generation verifier for quoted comment examples
+Every [SENTIMENT] "..." quote in an answer is checked against the dataset:
+an exact hash set first, then a word-level Aho-Corasick automaton over the
+normalized comments, so a whole response is verified in one linear pass.
+Near-misses (changed case, accents, punctuation) are repaired to the original
+text and quotes that match nothing are marked before the answer is sent.
+"""
+
+import os
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .full_dataset_loader import get_full_dataset_loader
+    from .text_normalizer import normalize_text
+except ImportError:
+    from full_dataset_loader import get_full_dataset_loader
+    from text_normalizer import normalize_text
+
+# 'repair' = fix near-misses, mark the rest; 'mark' = only mark; 'strip' = fix
+# near-misses, drop the rest; 'off' = no verification
+QUOTE_POLICY = os.environ.get('CHAT_QUOTE_POLICY', 'repair')
+
+SENTIMENT_TAGS = ('NEGATIVE', 'POSITIVE', 'NEUTRAL', 'NEGATIVO', 'POSITIVO', 'NEUTRO')
+
+# [NEGATIVE] "text" (straight or curly quotes, one line)
+QUOTE_PATTERN = re.compile(
+    r'\[(' + '|'.join(SENTIMENT_TAGS) + r')\][ \t]*(?:"([^"\n]+)"|“([^”\n]+)”)'
+)
+# A quote that has started but not been closed yet (streaming holdback)
+_OPEN_QUOTE_PATTERN = re.compile(
+    r'\[(?:[A-Z]{0,8}|(?:' + '|'.join(SENTIMENT_TAGS) + r')\][ \t]*(?:["“][^"”\n]*)?)'
+)
+ELLIPSIS_PATTERN = re.compile(r'\.{3,}|…')
+
+MAX_REPAIR_LENGTH = 400  # Longer comments are marked rather than pasted in
+MIN_EXCERPT_WORDS = 3    # Shorter excerpts prove nothing
+
+FABRICATED_MARK = ' ⚠️ _(cita no verificada: no aparece en el dataset)_'
+STRIPPED_TEXT = '_(cita omitida: no aparece en el dataset)_'
+
+EXACT, EXCERPT, REPAIRED, FABRICATED = 'exact', 'excerpt', 'repaired', 'fabricated'
+
+
+class WordAutomaton:
+    """
+    Aho-Corasick automaton over word sequences
+
+    Patterns are lists of words; find() reports every (pattern id, end
+    position) occurring in a word sequence in time linear in its length plus
+    the number of matches.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[int, List[str]]]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # state -> [(pattern id, length)]
+        for pattern_id, words in patterns:
+            if words:
+                self._add(pattern_id, words)
+        self._link()
+
+    def _add(self, pattern_id: int, words: List[str]):
+        state = 0
+        for word in words:
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((pattern_id, len(words)))
+
+    def _link(self):
+        """Breadth-first failure links; outputs inherit their fallback's"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                if self._out[self._fail[child]]:
+                    self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, words: List[str]) -> List[Tuple[int, int, int]]:
+        """[(pattern id, start, end)] for every occurrence (end exclusive)"""
+        matches = []
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for pattern_id, length in self._out[state]:
+                matches.append((pattern_id, position + 1 - length, position + 1))
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class QuoteVerifier:
+    """
+    Checks quoted examples against the comment texts
+
+    verify(answer) returns (answer with repairs/marks applied, per-quote report).
+    Statuses: 'exact' (verbatim comment), 'excerpt' (verbatim part of one
+    comment, '...' allowed between parts), 'repaired' (same words as a real
+    comment, replaced with its original text) and 'fabricated'.
+    """
+
+    def __init__(self, texts: Optional[List[str]] = None, policy: str = QUOTE_POLICY):
+        self.policy = policy
+        if texts is None:
+            texts = get_full_dataset_loader().comments.texts
+        self.texts = [text.strip() for text in texts]
+        self.exact = {text: i for i, text in reversed(list(enumerate(self.texts)))}
+        self.normalized = [normalize_text(text) for text in self.texts]
+        self.automaton = WordAutomaton((i, words.split()) for i, words in enumerate(self.normalized))
+
+        # Newline-joined corpora for excerpt search; offsets map back to comments
+        self._raw_blob, self._raw_starts = self._join(self.texts)
+        self._norm_blob, self._norm_starts = self._join(self.normalized)
+
+    @staticmethod
+    def _join(texts: List[str]) -> Tuple[str, List[int]]:
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + 1
+        return '\n'.join(texts), starts
+
+    def verify(self, answer: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Verified answer and one report entry per quote"""
+        if self.policy == 'off' or not answer:
+            return answer, []
+        report = []
+
+        def replace(match):
+            fixed, result = self.fix(match)
+            report.append(result)
+            return fixed
+
+        return QUOTE_PATTERN.sub(replace, answer), report
+
+    def fix(self, match) -> Tuple[str, Dict[str, Any]]:
+        """Rewritten text and report entry for one QUOTE_PATTERN match"""
+        result = self.check(match.group(2) or match.group(3))
+        result['sentiment'] = match.group(1)
+        if self.policy == 'off':
+            return match.group(0), result
+        return self._rewrite(match, result), result
+
+    def check(self, quote: str) -> Dict[str, Any]:
+        """Match status of one quote ({'quote', 'status', 'comment_index'})"""
+        quote = quote.strip()
+        index = self.exact.get(quote)
+        if index is not None:
+            return {'quote': quote, 'status': EXACT, 'comment_index': index}
+
+        segments = [part.strip() for part in ELLIPSIS_PATTERN.split(quote) if part.strip()]
+        if len(quote.split()) >= MIN_EXCERPT_WORDS:
+            index = self._find_excerpt(segments, self._raw_blob, self._raw_starts, self.texts)
+            if index is not None:
+                return {'quote': quote, 'status': EXCERPT, 'comment_index': index}
+
+        # Same words as a whole comment: the automaton finds it in one pass
+        words = normalize_text(quote).split()
+        for pattern_id, start, end in self.automaton.find(words):
+            if start == 0 and end == len(words):
+                return {'quote': quote, 'status': REPAIRED, 'comment_index': pattern_id}
+
+        # Same words as part of one comment: show the whole comment instead
+        normalized_segments = [normalize_text(part) for part in segments]
+        if sum(len(part.split()) for part in normalized_segments) >= MIN_EXCERPT_WORDS:
+            index = self._find_excerpt(normalized_segments, self._norm_blob, self._norm_starts, self.normalized)
+            if index is not None:
+                return {'quote': quote, 'status': REPAIRED, 'comment_index': index}
+
+        return {'quote': quote, 'status': FABRICATED, 'comment_index': None}
+
+    def _find_excerpt(self, segments: List[str], blob: str, starts: List[int], texts: List[str]) -> Optional[int]:
+        """Comment containing every segment in order (None if there is none)"""
+        if not segments or any('\n' in part for part in segments):
+            return None
+        first = segments[0]
+        position = blob.find(first)
+        while position >= 0:
+            index = self._comment_at(starts, position)
+            text = texts[index]
+            offset = position - starts[index] + len(first)
+            for part in segments[1:]:
+                offset = text.find(part, offset)
+                if offset < 0:
+                    break
+                offset += len(part)
+            else:
+                return index
+            position = blob.find(first, position + 1)
+        return None
+
+    @staticmethod
+    def _comment_at(starts: List[int], position: int) -> int:
+        low, high = 0, len(starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if starts[middle] <= position:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _rewrite(self, match, result: Dict[str, Any]) -> str:
+        """Quote as it should appear in the answer under the current policy"""
+        status = result['status']
+        if status in (EXACT, EXCERPT):
+            return match.group(0)
+
+        if status == REPAIRED and self.policy != 'mark':
+            original = self.texts[result['comment_index']]
+            if len(original) <= MAX_REPAIR_LENGTH and '"' not in original:
+                return f'[{match.group(1)}] "{original}"'
+            result['status'] = status = FABRICATED  # Can't be shown safely
+
+        if self.policy == 'strip' and status == FABRICATED:
+            return STRIPPED_TEXT
+        return match.group(0) + FABRICATED_MARK
+
+
+class QuoteStreamFilter:
+    """
+    Verifies quotes in streamed text before it is released
+
+    Text is passed through as soon as it cannot be part of an open quote; a
+    quote is held back until its closing mark arrives, then emitted repaired
+    or marked.
+    """
+
+    def __init__(self, verifier: QuoteVerifier):
+        self._verifier = verifier
+        self._buffer = ''
+        self.report = []
+
+    def feed(self, text: str) -> str:
+        """Feed a text delta, return the text that is ready"""
+        self._buffer += text
+        ready = []
+        while True:
+            match = QUOTE_PATTERN.search(self._buffer)
+            if match is None:
+                break
+            fixed, result = self._verifier.fix(match)
+            self.report.append(result)
+            ready.append(self._buffer[:match.start()] + fixed)
+            self._buffer = self._buffer[match.end():]
+
+        hold = self._open_quote_start(self._buffer)
+        ready.append(self._buffer[:hold])
+        self._buffer = self._buffer[hold:]
+        return ''.join(ready)
+
+    def flush(self) -> str:
+        """Whatever is left once the stream ends (unclosed quotes pass as text)"""
+        text, self._buffer = self._buffer, ''
+        return text
+
+    def _open_quote_start(self, text: str) -> int:
+        """Where a possibly unfinished quote starts (len(text) if none)"""
+        line_start = text.rfind('\n') + 1
+        position = text.find('[', line_start)
+        while position >= 0:
+            candidate = text[position:]
+            if _OPEN_QUOTE_PATTERN.fullmatch(candidate) and (
+                ']' in candidate or any(tag.startswith(candidate[1:]) for tag in SENTIMENT_TAGS)
+            ):
+                return position
+            position = text.find('[', position + 1)
+        return len(text)
+
+
+def summarize_quotes(report: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Counts per status for the conversation log"""
+    summary = {'total': len(report), EXACT: 0, EXCERPT: 0, REPAIRED: 0, FABRICATED: 0}
+    for result in report:
+        summary[result['status']] += 1
+    return summary
+
+
+# Singleton instance
+_quote_verifier = None
+
+def get_quote_verifier() -> QuoteVerifier:
+    """Get or create the quote verifier (built once per process)"""
+    global _quote_verifier
+    if _quote_verifier is None:
+        _quote_verifier = QuoteVerifier()
+    return _quote_verifier
@@ -0,0 +1,240 @@
+"""
+Client-side token-bucket scheduler for Claude's per-minute token limits
+Shared by all workers on one host through a small SQLite database
+"""
+
+import math
+import os
+import random
+import sqlite3
+import time
+from typing import Dict, Optional
+
+DEFAULT_DB_PATH = '/tmp/chat_rate_limit.sqlite'
+DEFAULT_INPUT_TPM = 50000   # Input tokens per minute
+DEFAULT_OUTPUT_TPM = 10000  # Output tokens per minute
+DEFAULT_MAX_WAIT = 20.0     # Seconds a request may queue before we give up
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class RateLimitExceeded(Exception):
+    """
+    Request cannot be admitted in time
+
+    status is 429 when our own bucket refused the request and 503 when the
+    upstream API rate-limited us after admission.
+    """
+
+    def __init__(self, retry_after: float, status: int = 429):
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.status = status
+        super().__init__(f"Rate limit exceeded, retry after {self.retry_after}s")
+
+
+class Reservation:
+    """Tokens actually taken from the buckets for one request (estimates clamped to capacity)"""
+
+    def __init__(self, input_tokens: int, output_tokens: int, waited: float):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.waited = waited
+
+
+class TokenBucketScheduler:
+    """
+    Admission control against input/output tokens-per-minute budgets
+
+    Each bucket refills continuously at TPM/60 tokens per second up to one
+    minute's worth. Requests take their *estimated* tokens up front; real
+    usage from the response is reconciled afterwards.
+    """
+
+    BUCKETS = ('input', 'output')
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        input_tpm: int = DEFAULT_INPUT_TPM,
+        output_tpm: int = DEFAULT_OUTPUT_TPM,
+        max_wait: float = DEFAULT_MAX_WAIT
+    ):
+        self.db_path = db_path
+        self.capacity = {'input': float(input_tpm), 'output': float(output_tpm)}
+        self.rate = {name: cap / 60.0 for name, cap in self.capacity.items()}
+        self.max_wait = max_wait
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            now = time.time()
+            for name in self.BUCKETS:
+                conn.execute(
+                    'INSERT OR IGNORE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                    (name, self.capacity[name], now)
+                )
+        finally:
+            conn.close()
+
+    def _refilled(self, conn: sqlite3.Connection, now: float) -> Dict[str, float]:
+        """Current bucket levels after refill (inside a transaction)"""
+        levels = {}
+        for name, tokens, updated in conn.execute('SELECT name, tokens, updated FROM buckets'):
+            if name in self.capacity:
+                elapsed = max(0.0, now - updated)
+                levels[name] = min(self.capacity[name], tokens + elapsed * self.rate[name])
+        return levels
+
+    def _store(self, conn: sqlite3.Connection, levels: Dict[str, float], now: float):
+        for name, tokens in levels.items():
+            conn.execute('UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?', (tokens, now, name))
+
+    def try_acquire(self, input_tokens: int, output_tokens: int) -> float:
+        """
+        Take tokens if both buckets have room
+
+        Returns 0 on success, otherwise the seconds until the request fits.
+        """
+        need = self._clamp(input_tokens, output_tokens)
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            levels = self._refilled(conn, now)
+
+            wait = max((need[name] - levels[name]) / self.rate[name] for name in self.BUCKETS)
+            if wait <= 0:
+                for name in self.BUCKETS:
+                    levels[name] -= need[name]
+                wait = 0.0
+
+            self._store(conn, levels, now)
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _clamp(self, input_tokens: int, output_tokens: int) -> Dict[str, float]:
+        """Tokens a request takes: a request larger than the whole bucket waits for a full bucket"""
+        return {
+            'input': min(float(input_tokens), self.capacity['input']),
+            'output': min(float(output_tokens), self.capacity['output'])
+        }
+
+    def acquire(self, input_tokens: int, output_tokens: int, max_wait: Optional[float] = None) -> Reservation:
+        """
+        Wait (up to max_wait seconds) until the request fits
+
+        Raises RateLimitExceeded straight away when the projected wait is
+        longer than the remaining deadline.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        start = time.time()
+        deadline = start + max_wait
+
+        while True:
+            wait = self.try_acquire(input_tokens, output_tokens)
+            now = time.time()
+            if wait <= 0:
+                # Refunds and reconciliation start from what was debited
+                taken = self._clamp(input_tokens, output_tokens)
+                return Reservation(taken['input'], taken['output'], now - start)
+            if now + wait > deadline:
+                raise RateLimitExceeded(wait)
+
+            # Sleep in short slices with jitter so queued workers don't stampede
+            time.sleep(min(wait, 1.0) + random.uniform(0, 0.05))
+
+    def available(self, within: float = 0.0) -> Dict[str, float]:
+        """
+        Tokens per bucket a request could take now, or after queueing for
+        `within` seconds (read-only, nothing is reserved)
+        """
+        conn = self._connect()
+        try:
+            now = time.time()
+            levels = self._refilled(conn, now)
+        finally:
+            conn.close()
+        return {
+            name: min(self.capacity[name], levels.get(name, self.capacity[name]) + within * self.rate[name])
+            for name in self.BUCKETS
+        }
+
+    def reconcile(self, reservation: Reservation, usage: Dict[str, int]):
+        """Correct the buckets with the real token usage of a response"""
+        if not usage:
+            return
+
+        actual_input = (
+            usage.get('input_tokens', 0)
+            + usage.get('cache_creation_input_tokens', 0)
+            + usage.get('cache_read_input_tokens', 0)
+        )
+        delta = {
+            'input': reservation.input_tokens - actual_input,
+            'output': reservation.output_tokens - usage.get('output_tokens', 0)
+        }
+        self._adjust(delta)
+
+    def release(self, reservation: Reservation):
+        """Give back all tokens of a request that never reached the model"""
+        self._adjust({'input': float(reservation.input_tokens), 'output': float(reservation.output_tokens)})
+
+    def drain(self):
+        """Empty the buckets (upstream told us we are over the limit)"""
+        self._adjust({name: 0.0 for name in self.BUCKETS}, empty=True)
+
+    def _adjust(self, delta: Dict[str, float], empty: bool = False):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            levels = self._refilled(conn, now)
+            for name, change in delta.items():
+                if empty:
+                    levels[name] = min(levels[name], 0.0)
+                    continue
+                # Overdraft is allowed so overshoot is paid back by later requests
+                levels[name] = max(-self.capacity[name], min(self.capacity[name], levels[name] + change))
+            self._store(conn, levels, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+
+# Singleton instance
+_scheduler = None
+
+
+def get_rate_limiter() -> TokenBucketScheduler:
+    """Get or create the token bucket scheduler (configured from environment)"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TokenBucketScheduler(
+            db_path=os.environ.get('CHAT_RATE_LIMIT_DB', DEFAULT_DB_PATH),
+            input_tpm=int(os.environ.get('CHAT_INPUT_TPM', DEFAULT_INPUT_TPM)),
+            output_tpm=int(os.environ.get('CHAT_OUTPUT_TPM', DEFAULT_OUTPUT_TPM)),
+            max_wait=float(os.environ.get('CHAT_MAX_QUEUE_WAIT', DEFAULT_MAX_WAIT))
+        )
+    return _scheduler
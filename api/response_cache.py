@@ -0,0 +1,200 @@
+"""
+Response cache for repeated chat questions
+In-memory LRU (with TTL) in front of a size-bounded disk layer under /tmp
+that survives warm restarts of the serverless instance
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = '/tmp/chat_cache'
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r'[^\w\s@#]', ' ', text)
+    return ' '.join(text.split())
+
+
+def make_request_key(query: str, conversation_history: List[Dict[str, str]], version: str) -> str:
+    """Key identifying equivalent requests: normalized query, history, prompt/dataset version"""
+    history = [
+        f"{msg.get('role', 'user')}:{' '.join(str(msg.get('content', '')).split())}"
+        for msg in (conversation_history or [])
+    ]
+    raw = json.dumps([version, normalize_query(query), history], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-layer response cache
+
+    Keys combine the normalized query, the recent conversation history and a
+    version string (dataset + prompt hash), so a new deploy or prompt change
+    never serves stale answers.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached response (memory first, then disk)"""
+        now = time.time()
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        entry = self._read_disk(key, now)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            created, value = entry
+            # Promoted entries keep their original age, not a fresh TTL
+            self._remember(key, value, created)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a response in both layers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        self._write_disk(key, value, now)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'memory_entries': len(self._memory)
+        }
+
+    def _remember(self, key: str, value: Dict[str, Any], created: float):
+        """Insert into the LRU layer, expiring ttl_seconds after created (caller holds the lock)"""
+        self._memory[key] = (created + self.ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Read (created, value) from disk, dropping the entry if expired"""
+        if self.cache_dir is None:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read cache entry: {e}")
+            return None
+
+        created = entry.get('created', 0)
+        if created + self.ttl_seconds <= now:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        return created, entry.get('value')
+
+    def _write_disk(self, key: str, value: Dict[str, Any], now: float):
+        """Atomically write an entry, then evict the oldest files over the size limit"""
+        if self.cache_dir is None:
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f".{key}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created': now, 'value': value}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except Exception as e:
+            print(f"Warning: Failed to write cache entry: {e}")
+
+    def _evict_disk(self):
+        """Delete least recently written entries until under max_disk_bytes"""
+        files = []
+        total = 0
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+# Singleton instance
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Get or create the response cache (configured from environment)"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            cache_dir=os.environ.get('CHAT_CACHE_DIR', DEFAULT_CACHE_DIR),
+            max_entries=int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.environ.get('CHAT_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+            max_disk_bytes=int(os.environ.get('CHAT_CACHE_MAX_BYTES', DEFAULT_MAX_DISK_BYTES))
+        )
+    return _response_cache
@@ -0,0 +1,284 @@
+"""
+Vectorized TF-IDF similarity search over comments
+Comments are embedded as sublinear TF-IDF vectors over the normalized,
+stemmed tokens (the same ones BM25 uses), optionally reduced with LSA
+(randomized truncated SVD). The matrix is built offline by build_data.py into
+data/build/tfidf_index.npz; queries score every comment with a few NumPy
+operations and return the top-k by cosine similarity.
+
+NumPy is only needed by this module; without it the chat falls back to the
+other retrieval paths.
+"""
+
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .full_dataset_loader import BUILD_DIR, get_full_dataset_loader
+    from .text_normalizer import tokenize
+except ImportError:
+    from full_dataset_loader import BUILD_DIR, get_full_dataset_loader
+    from text_normalizer import tokenize
+
+TFIDF_INDEX_FILE = 'tfidf_index.npz'
+FORMAT_VERSION = 1
+
+DEFAULT_TOP_K = 20
+DEFAULT_LSA_COMPONENTS = 100
+LSA_OVERSAMPLING = 10
+LSA_POWER_ITERATIONS = 2
+SEED = 2026  # Deterministic build output
+
+
+class TfidfIndex:
+    """
+    Sparse TF-IDF matrix stored column-major (one posting list per term)
+
+        vocabulary            sorted terms; term id = position
+        idf[t]                smoothed inverse document frequency
+        term_ptr[t:t+1]       slice of doc_ids / weights for term t
+        doc_ids, weights      L2-normalized TF-IDF values per (term, doc)
+        components (V x k)    LSA term loadings (optional)
+        embeddings (N x k)    L2-normalized LSA document vectors (optional)
+    """
+
+    def __init__(self, vocabulary: Sequence[str], idf: np.ndarray, term_ptr: np.ndarray,
+                 doc_ids: np.ndarray, weights: np.ndarray, n_docs: int,
+                 components: Optional[np.ndarray] = None, embeddings: Optional[np.ndarray] = None,
+                 data_hash: Optional[str] = None):
+        self.vocabulary = list(vocabulary)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.idf = idf
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+        self.components = components
+        self.embeddings = embeddings
+        self.data_hash = data_hash
+
+    # ------------------------------------------------------------------
+    # Build (offline)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, texts: Iterable[str], lsa_components: int = 0,
+              data_hash: Optional[str] = None) -> 'TfidfIndex':
+        """TF-IDF over tokenized texts, plus LSA when lsa_components > 0"""
+        documents = [Counter(tokenize(text)) for text in texts]
+        n_docs = len(documents)
+        vocabulary = sorted({term for counts in documents for term in counts})
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+        # Document-major (CSR) triplets first
+        row_ptr = np.zeros(n_docs + 1, dtype=np.int64)
+        row_ptr[1:] = np.cumsum([len(counts) for counts in documents])
+        cols = np.fromiter((term_ids[t] for counts in documents for t in counts), dtype=np.int32, count=row_ptr[-1])
+        tf = np.fromiter((c for counts in documents for c in counts.values()), dtype=np.float32, count=row_ptr[-1])
+        rows = np.repeat(np.arange(n_docs, dtype=np.int32), np.diff(row_ptr))
+
+        df = np.bincount(cols, minlength=len(vocabulary))
+        idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        values = (1 + np.log(tf)) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n_docs))
+        values = (values / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+
+        # Term-major (CSC) for query-time scoring: only touch the query's terms
+        order = np.argsort(cols, kind='stable')
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum(df)
+        index = cls(vocabulary, idf, term_ptr, rows[order], values[order], n_docs, data_hash=data_hash)
+
+        if lsa_components > 0 and n_docs > 1 and len(vocabulary) > 1:
+            index._fit_lsa(row_ptr, cols, values, lsa_components)
+        return index
+
+    def _fit_lsa(self, row_ptr: np.ndarray, cols: np.ndarray, values: np.ndarray, k: int):
+        """Randomized truncated SVD of the TF-IDF matrix (Halko et al.)"""
+        k = min(k, self.n_docs - 1, len(self.vocabulary) - 1)
+        rank = min(k + LSA_OVERSAMPLING, self.n_docs, len(self.vocabulary))
+        rng = np.random.default_rng(SEED)
+
+        def times(matrix):  # X @ M   (N x V) @ (V x r), CSR segments
+            return _segment_sum(values[:, None] * matrix[cols], row_ptr)
+
+        def times_transposed(matrix):  # X.T @ M   (V x N) @ (N x r), CSC segments
+            return _segment_sum(self.weights[:, None] * matrix[self.doc_ids], self.term_ptr)
+
+        basis, _ = np.linalg.qr(times(rng.standard_normal((len(self.vocabulary), rank)).astype(np.float32)))
+        for _ in range(LSA_POWER_ITERATIONS):
+            basis, _ = np.linalg.qr(times_transposed(basis))
+            basis, _ = np.linalg.qr(times(basis))
+
+        small = times_transposed(basis).T  # Q.T @ X   (r x V)
+        _, singular, vt = np.linalg.svd(small, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:k].T, dtype=np.float32)  # V x k
+        self.embeddings = _normalize_rows(times(self.components))
+        print(f"✓ LSA: {k} components, {singular[:k].sum() / max(singular.sum(), 1e-12):.0%} of singular value mass")
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        """Write all arrays to one .npz (no pickles)"""
+        arrays = {
+            'version': np.array(FORMAT_VERSION),
+            'data_hash': np.array(self.data_hash or ''),
+            'vocabulary': np.array(self.vocabulary, dtype=str),
+            'idf': self.idf,
+            'term_ptr': self.term_ptr,
+            'doc_ids': self.doc_ids,
+            'weights': self.weights,
+            'n_docs': np.array(self.n_docs)
+        }
+        if self.components is not None:
+            arrays['components'] = self.components
+            arrays['embeddings'] = self.embeddings
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, expected_hash: Optional[str] = None) -> Optional['TfidfIndex']:
+        """Load a saved index; None if missing, stale or from another version"""
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                if int(saved['version']) != FORMAT_VERSION:
+                    return None
+                data_hash = str(saved['data_hash'])
+                if expected_hash is not None and data_hash != expected_hash:
+                    return None
+                has_lsa = 'components' in saved.files
+                return cls(
+                    saved['vocabulary'].tolist(), saved['idf'], saved['term_ptr'], saved['doc_ids'],
+                    saved['weights'], int(saved['n_docs']),
+                    saved['components'] if has_lsa else None, saved['embeddings'] if has_lsa else None,
+                    data_hash=data_hash
+                )
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ TF-IDF index not loaded: {e}")
+            return None
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @property
+    def has_lsa(self) -> bool:
+        return self.embeddings is not None
+
+    def vectorize(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sparse query vectors as (query row, term id, weight) triplets, L2-normalized per query"""
+        query_rows, term_ids, weights = [], [], []
+        for row, text in enumerate(texts):
+            counts = Counter(term for term in tokenize(text) if term in self.term_ids)
+            if not counts:
+                continue
+            ids = np.fromiter((self.term_ids[t] for t in counts), dtype=np.int64, count=len(counts))
+            values = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[ids]
+            values /= np.linalg.norm(values)
+            query_rows.append(np.full(len(ids), row))
+            term_ids.append(ids)
+            weights.append(values)
+        if not term_ids:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+        return np.concatenate(query_rows), np.concatenate(term_ids), np.concatenate(weights).astype(np.float32)
+
+    def scores(self, texts: Sequence[str], mode: str = 'auto') -> np.ndarray:
+        """Cosine similarity of every comment to every query (len(texts) x N)"""
+        query_rows, term_ids, weights = self.vectorize(texts)
+        use_lsa = mode == 'lsa' or (mode == 'auto' and self.has_lsa)
+        if use_lsa:
+            if not self.has_lsa:
+                raise ValueError('index was built without LSA')
+            queries = np.zeros((len(texts), self.components.shape[1]), dtype=np.float32)
+            np.add.at(queries, query_rows, weights[:, None] * self.components[term_ids])
+            return _normalize_rows(queries) @ self.embeddings.T
+
+        # Sparse: expand only the query terms' posting lists, one scatter-add for the batch
+        result = np.zeros((len(texts), self.n_docs), dtype=np.float32)
+        if len(term_ids):
+            starts, ends = self.term_ptr[term_ids], self.term_ptr[term_ids + 1]
+            lengths = ends - starts
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            np.add.at(
+                result,
+                (np.repeat(query_rows, lengths), self.doc_ids[positions]),
+                np.repeat(weights, lengths) * self.weights[positions]
+            )
+        return result
+
+    def search_batch(self, texts: Sequence[str], k: int = DEFAULT_TOP_K, mode: str = 'auto',
+                     exclude: Optional[Sequence[Optional[int]]] = None) -> List[List[Tuple[int, float]]]:
+        """Top-k (comment id, similarity) per query, best first"""
+        matrix = self.scores(texts, mode)
+        if exclude is not None:
+            for row, doc_id in enumerate(exclude):
+                if doc_id is not None:
+                    matrix[row, doc_id] = -np.inf
+        k = min(k, self.n_docs)
+        if k <= 0:
+            return [[] for _ in texts]
+        top = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-matrix[row, candidates], kind='stable')]
+            results.append([(int(i), float(matrix[row, i])) for i in ranked if matrix[row, i] > 0])
+        return results
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K, mode: str = 'auto') -> List[Tuple[int, float]]:
+        """Top-k comments most similar to a free-text query"""
+        return self.search_batch([query], k, mode)[0]
+
+    def similar_to(self, text: str, k: int = DEFAULT_TOP_K, mode: str = 'auto',
+                   comment_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Comments similar to a given comment text (excluding the comment itself)"""
+        return self.search_batch([text], k, mode, exclude=[comment_id])[0]
+
+
+def _segment_sum(products: np.ndarray, ptr: np.ndarray) -> np.ndarray:
+    """Row sums of products over the segments [ptr[i], ptr[i+1]) (empty -> 0)"""
+    out = np.zeros((len(ptr) - 1, products.shape[1]), dtype=np.float32)
+    nonempty = np.flatnonzero(np.diff(ptr))
+    if len(nonempty):
+        out[nonempty] = np.add.reduceat(products, ptr[nonempty], axis=0)
+    return out
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def build_similarity_artifact(loader=None, build_dir: str = BUILD_DIR,
+                              lsa_components: int = DEFAULT_LSA_COMPONENTS) -> Tuple[str, TfidfIndex]:
+    """Build the TF-IDF (+LSA) index from the loader's comments and save it"""
+    loader = loader or get_full_dataset_loader()
+    index = TfidfIndex.build(loader.comments.texts, lsa_components, data_hash=loader.data_hash)
+    path = os.path.join(build_dir, TFIDF_INDEX_FILE)
+    index.save(path)
+    return path, index
+
+
+# Singleton instance
+_similarity_index = None
+
+def get_similarity_index() -> TfidfIndex:
+    """Prebuilt index when it matches the data, otherwise built (sparse only) in memory"""
+    global _similarity_index
+    loader = get_full_dataset_loader()
+    if _similarity_index is not None and _similarity_index.data_hash == loader.data_hash:
+        return _similarity_index
+
+    index = TfidfIndex.load(os.path.join(BUILD_DIR, TFIDF_INDEX_FILE), loader.data_hash)
+    if index is None:
+        print("⚠ TF-IDF index artifact missing or stale, building without LSA")
+        index = TfidfIndex.build(loader.comments.texts, data_hash=loader.data_hash)
+    _similarity_index = index
+    return index
@@ -0,0 +1,107 @@
+"""
+Single-flight coalescing of identical in-flight requests
+The first request for a key (the leader) does the work; identical requests
+that arrive while it is running (followers) wait for its result instead of
+making their own upstream call. Coalescing is per worker process; across
+processes the shared response cache covers requests that arrive later.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_WAIT = 60.0  # Seconds a follower waits before giving up on the leader
+
+
+class Call:
+    """One in-flight unit of work and its eventual result"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the leader finishes; None on timeout or leader failure"""
+        if not self._done.wait(timeout):
+            return None
+        return self.result if self.error is None else None
+
+
+class SingleFlight:
+    """Registry of in-flight calls keyed by request key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Call
+
+    def join(self, key: str) -> Tuple[Call, bool]:
+        """
+        Register interest in key
+
+        Returns (call, is_leader). The leader must call finish() exactly once,
+        even on failure, or followers wait until their timeout.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                return call, False
+            call = Call(key)
+            self._calls[key] = call
+            return call, True
+
+    def finish(self, call: Call, result: Any = None, error: Optional[BaseException] = None):
+        """Publish the leader's result and release followers (idempotent)"""
+        with self._lock:
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+            if call._done.is_set():
+                return
+            call.result = result
+            call.error = error
+            call._done.set()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = DEFAULT_MAX_WAIT) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Returns (result, shared). Errors in the leader are raised in the
+        leader only; followers then run fn themselves.
+        """
+        call, leader = self.join(key)
+        if not leader:
+            result = call.wait(timeout)
+            if result is not None:
+                return result, True
+            return fn(), False
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(call, error=e)
+            raise
+        self.finish(call, result)
+        return result, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiting': sum(call.followers for call in self._calls.values())
+            }
+
+
+# Singleton instance
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the process-wide single-flight registry"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -0,0 +1,263 @@
+"""
+Smart Filter (Option B) - BM25 retrieval over comments
+Sends only the relevant comments (+ exact counts) instead of the full dataset
+Target: ~5K tokens per prompt instead of ~44K
+"""
+
+import math
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .comment_store import SENTIMENTS, CommentRow, CommentStore
+    from .full_dataset_loader import get_full_dataset_loader
+    from .text_normalizer import STOPWORDS, normalize_text, stem, tokenize
+    from .topics import MIN_PREFIX_LENGTH, detect_topics, expand_keyword, load_topic_keywords
+    from .trigram_index import TrigramIndex
+except ImportError:
+    from comment_store import SENTIMENTS, CommentRow, CommentStore
+    from full_dataset_loader import get_full_dataset_loader
+    from text_normalizer import STOPWORDS, normalize_text, stem, tokenize
+    from topics import MIN_PREFIX_LENGTH, detect_topics, expand_keyword, load_topic_keywords
+    from trigram_index import TrigramIndex
+
+
+def _load_similarity_index():
+    """
+    Shared TF-IDF/LSA index, or None without NumPy
+
+    Imported on first use so importing the chat handler stays cheap.
+    """
+    try:
+        try:
+            from .similarity_search import get_similarity_index
+        except ImportError:
+            from similarity_search import get_similarity_index
+    except ImportError:
+        return None
+    return get_similarity_index()
+
+
+# Words that describe the request, not the topic ("qué piensa la gente sobre...")
+QUERY_NOISE = {
+    'piensa', 'piensan', 'opina', 'opinan', 'opinion', 'dice', 'dicen', 'gente',
+    'persona', 'comentario', 'ejemplo', 'dame', 'muestrame', 'muestra', 'sobre',
+    'cuanta', 'cuanto', 'cuantos', 'cuantas', 'habra', 'tema', 'topico', 'acerca',
+    'mejor', 'peor', 'lista', 'show', 'what', 'people', 'think', 'comment', 'how', 'many'
+}
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Query expansion terms count less than words the user actually typed
+EXPANSION_WEIGHT = 0.5
+
+# Misspelled query words are looked up in the trigram index
+FUZZY_THRESHOLD = 0.5
+FUZZY_LIMIT = 5
+
+
+class SmartFilter:
+    """
+    Inverted index with BM25 scoring over FullDatasetLoader.comments
+
+    Terms are normalized (accents, slang, plurals). Query terms are expanded
+    with the topic keyword lists from data/sentiment/sentiment_by_topic.json,
+    which are matched as prefixes ("corrup" -> corrupto, corrupcion, ...).
+    Query words that match nothing are looked up in the trigram index and
+    replaced by similarly spelled words, weighted by their similarity.
+    When BM25 finds nothing, the most similar comments by TF-IDF/LSA cosine
+    (similarity_search.py) are returned as examples instead.
+    """
+
+    def __init__(self, comments: Optional[List[Dict[str, Any]]] = None, topics: Optional[Dict[str, List[str]]] = None,
+                 trigram_index: Optional[TrigramIndex] = None, similarity_index=None):
+        if comments is None:
+            loader = get_full_dataset_loader()
+            comments = loader.comments
+            trigram_index = trigram_index or loader.get_trigram_index()
+            if similarity_index is None:
+                similarity_index = _load_similarity_index()
+        self.similarity_index = similarity_index
+        self.comments = CommentStore.wrap(comments)
+        self.topics = topics if topics is not None else load_topic_keywords()
+        self.trigram_index = trigram_index or TrigramIndex.build(self.comments.texts)
+
+        self.postings = {}  # term -> [(doc_id, tf)]
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
+        self.vocabulary = []  # sorted, for prefix lookups
+        self._build_index()
+
+    def _build_index(self):
+        """Build the inverted index once"""
+        postings = defaultdict(list)
+        for doc_id, text in enumerate(self.comments.texts):
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        total = len(self.doc_lengths)
+        self.avg_doc_length = sum(self.doc_lengths) / total if total else 0.0
+
+    def _expand(self, term: str) -> List[str]:
+        """
+        Index terms a query word or topic keyword matches: the word and its
+        plurals, or every word an explicit stem starts (the analytics
+        engine's rule, so "transporte" never retrieves "busco")
+        """
+        return expand_keyword(term, self.vocabulary)
+
+    def detect_topics(self, query: str) -> List[str]:
+        """Topics whose name or keywords appear in the query"""
+        return detect_topics(query, self.topics)
+
+    def query_terms(self, query: str) -> Dict[str, float]:
+        """Index terms to score, with their weights"""
+        weights = {}
+
+        for word in normalize_text(query).split():
+            if word in STOPWORDS:
+                continue
+            token = stem(word)
+            if token in QUERY_NOISE or len(token) < 2:
+                continue
+            matches = self._expand(token)
+            for term in matches:
+                weights[term] = 1.0
+            if not matches and len(token) >= MIN_PREFIX_LENGTH:
+                for similar, similarity in self.trigram_index.similar(word, FUZZY_THRESHOLD, FUZZY_LIMIT):
+                    term = stem(similar)
+                    if term in self.postings and similar not in STOPWORDS:
+                        weights[term] = max(weights.get(term, 0.0), similarity)
+
+        for topic in self.detect_topics(query):
+            for keyword in self.topics.get(topic, []):
+                for term in self._expand(keyword):
+                    weights.setdefault(term, EXPANSION_WEIGHT)
+
+        return weights
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """All matching comments as (doc_id, score), best first"""
+        scores = defaultdict(float)
+        total_docs = len(self.doc_lengths)
+
+        for term, weight in self.query_terms(query).items():
+            postings = self.postings[term]
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += weight * idf * tf * (K1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def filter(self, query: str, top_n: int = 60) -> Dict[str, Any]:
+        """
+        Exact statistics over every matching comment + the top-N examples
+        """
+        results = self.search(query)
+        if not results and self.similarity_index is not None:
+            return self._similar(query, top_n)
+        sentiment = self.comments.sentiment
+
+        counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+        for doc_id, _ in results:
+            counts[SENTIMENTS[sentiment[doc_id]]] += 1
+
+        total = len(results)
+        return {
+            'query': query,
+            'method': 'bm25',
+            'topics': self.detect_topics(query),
+            'total': total,
+            'counts': counts,
+            'pct': {k: round(v / total * 100, 1) if total else 0.0 for k, v in counts.items()},
+            'examples': [(self.comments[doc_id], score) for doc_id, score in results[:top_n]]
+        }
+
+    def _similar(self, query: str, top_n: int) -> Dict[str, Any]:
+        """Nearest comments by vector similarity (examples only, no counts)"""
+        matches = self.similarity_index.search(query, top_n)
+        return {
+            'query': query,
+            'method': 'similarity',
+            'topics': [],
+            'total': len(matches),
+            'counts': {},
+            'pct': {},
+            'examples': [(self.comments[doc_id], score) for doc_id, score in matches]
+        }
+
+    def create_context_for_llm(self, query: str, top_n: int = 60) -> str:
+        """Compact prompt section with exact counts and real examples"""
+        return self.format_context(self.filter(query, top_n))
+
+    def format_context(self, result: Dict[str, Any], include_counts: bool = True) -> str:
+        """
+        Prompt section for a filter() result
+
+        include_counts=False leaves out the totals and sentiment split, for
+        prompts that already carry the analytics engine's exact statistics.
+        """
+        if result['method'] == 'similarity' and result['examples']:
+            parts = ["=== DATOS REALES FILTRADOS ==="]
+            parts.append("Ningún comentario contiene los términos de la consulta.")
+            parts.append(f"COMENTARIOS MÁS SIMILARES (top {len(result['examples'])} por similitud, texto exacto, sin conteos):")
+            parts.append("FMT:[S]txt|postID|st|L")
+            parts.extend(format_comment(comment) for comment, _ in result['examples'])
+            parts.append("=== FIN DATOS FILTRADOS ===")
+            return "\n".join(parts)
+        total = result['total']
+        counts = result['counts']
+        pct = result['pct']
+        dataset_total = len(self.comments)
+
+        parts = []
+        parts.append("=== DATOS REALES FILTRADOS ===")
+        if result['topics']:
+            parts.append(f"Tópicos detectados: {', '.join(result['topics'])}")
+        if not include_counts and total:
+            parts.append("Conteos: ver ESTADÍSTICAS EXACTAS")
+            return "\n".join(parts + self._example_lines(result))
+        parts.append(f"Total de comentarios relevantes: {total}")
+        if total == 0:
+            parts.append("No se encontraron comentarios relevantes para esta consulta.")
+            return "\n".join(parts)
+
+        share = round(total / dataset_total * 100, 1) if dataset_total else 0.0
+        parts.append(f"Porcentaje del total ({dataset_total:,}): {share}%")
+        parts.append(f"Negativos: {counts['negative']} ({pct['negative']:.1f}%)")
+        parts.append(f"Positivos: {counts['positive']} ({pct['positive']:.1f}%)")
+        parts.append(f"Neutrales: {counts['neutral']} ({pct['neutral']:.1f}%)")
+        return "\n".join(parts + self._example_lines(result))
+
+    def _example_lines(self, result: Dict[str, Any]) -> List[str]:
+        lines = ["", f"EJEMPLOS REALES (top {len(result['examples'])} por relevancia, texto exacto):"]
+        lines.append("FMT:[S]txt|postID|st|L")
+        lines.extend(format_comment(comment) for comment, _ in result['examples'])
+        lines.append("=== FIN DATOS FILTRADOS ===")
+        return lines
+
+
+def format_comment(comment: Dict[str, Any]) -> str:
+    """Ultra-compact comment line, same format as create_compact_context()"""
+    if not isinstance(comment, CommentRow):
+        comment = CommentStore([comment])[0]
+    return comment.compact_line()
+
+
+# Singleton instance
+_smart_filter = None
+
+
+def get_smart_filter() -> SmartFilter:
+    """Get or create smart filter instance"""
+    global _smart_filter
+    if _smart_filter is None:
+        _smart_filter = SmartFilter()
+    return _smart_filter
@@ -0,0 +1,138 @@
+"""
+Server-Sent Events helpers for streaming chat responses
+Splits Claude's token deltas into text and chart events
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CHART_START = '[CHART_START]'
+CHART_END_PATTERN = re.compile(r'\[/?CHART_END\]')  # Be forgiving, like the frontend
+
+# Short chart requests expanded server-side: [CHART:kind] or [CHART:kind param=value ...]
+CHART_TAG_PREFIX = '[CHART:'
+CHART_TAG_PATTERN = re.compile(r'\[CHART:(\w+)((?:[ \t]+\w+=[^\s\]]+)*)[ \t]*\]')
+MAX_TAG_LENGTH = 160  # Longer "tags" are treated as text
+
+ChartResolver = Callable[[str], Optional[Dict[str, Any]]]
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Event"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class ChartStreamSplitter:
+    """
+    Incrementally splits streamed text into events
+
+    Plain text is emitted as ('delta', {'text': ...}) as soon as it cannot be
+    the start of a chart marker. Everything between [CHART_START] and
+    [CHART_END] is held back and emitted as one ('chart', {'chart': spec})
+    event once the block is complete. Invalid chart JSON is passed through
+    as text so nothing is lost.
+
+    With a resolver, [CHART:...] tags are replaced by the chart the resolver
+    builds for them; tags it can't build are dropped.
+    """
+
+    def __init__(self, resolver: Optional[ChartResolver] = None):
+        self._buffer = ''
+        self._in_chart = False
+        self._resolver = resolver
+        self._markers = (CHART_START, CHART_TAG_PREFIX) if resolver else (CHART_START,)
+
+    def feed(self, text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Feed a text delta, return the events that are ready"""
+        self._buffer += text
+        events = []
+
+        while self._buffer:
+            if self._in_chart:
+                end_match = CHART_END_PATTERN.search(self._buffer)
+                if not end_match:
+                    break
+                raw = self._buffer[:end_match.start()]
+                block = CHART_START + self._buffer[:end_match.end()]
+                self._buffer = self._buffer[end_match.end():]
+                self._in_chart = False
+                events.append(self._chart_event(raw, block))
+            else:
+                start = self._buffer.find(CHART_START)
+                tag_start = self._buffer.find(CHART_TAG_PREFIX) if self._resolver else -1
+                if tag_start >= 0 and (start < 0 or tag_start < start):
+                    if tag_start > 0:
+                        events.append(('delta', {'text': self._buffer[:tag_start]}))
+                    self._buffer = self._buffer[tag_start:]
+                    if not self._take_tag(events):
+                        break
+                    continue
+                if start >= 0:
+                    if start > 0:
+                        events.append(('delta', {'text': self._buffer[:start]}))
+                    self._buffer = self._buffer[start + len(CHART_START):]
+                    self._in_chart = True
+                    continue
+
+                # Hold back a suffix that could still become a marker
+                holdback = self._marker_prefix_length(self._buffer)
+                ready = self._buffer[:len(self._buffer) - holdback]
+                if ready:
+                    events.append(('delta', {'text': ready}))
+                self._buffer = self._buffer[len(ready):]
+                break
+
+        return events
+
+    def flush(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Emit whatever is left once the stream ends (unterminated charts become text)"""
+        events = []
+        if self._buffer or self._in_chart:
+            text = (CHART_START if self._in_chart else '') + self._buffer
+            if text:
+                events.append(('delta', {'text': text}))
+        self._buffer = ''
+        self._in_chart = False
+        return events
+
+    def _take_tag(self, events: List[Tuple[str, Dict[str, Any]]]) -> bool:
+        """
+        Consume the [CHART:...] tag at the start of the buffer
+
+        Returns False if the tag isn't complete yet (wait for more text).
+        """
+        end = self._buffer.find(']')
+        if end < 0:
+            if len(self._buffer) < MAX_TAG_LENGTH:
+                return False
+            end = len(CHART_TAG_PREFIX) - 1  # Not a tag: release the prefix as text
+
+        tag = self._buffer[:end + 1]
+        self._buffer = self._buffer[end + 1:]
+        if not CHART_TAG_PATTERN.fullmatch(tag):
+            events.append(('delta', {'text': tag}))
+            return True
+
+        spec = self._resolver(tag)
+        if spec is not None:
+            events.append(('chart', {'chart': spec}))
+        else:
+            print(f"Warning: Dropped chart tag that could not be built: {tag}")
+        return True
+
+    def _chart_event(self, raw: str, block: str) -> Tuple[str, Dict[str, Any]]:
+        """Parse a complete chart block"""
+        try:
+            return ('chart', {'chart': json.loads(raw.strip())})
+        except (ValueError, TypeError):
+            print("Warning: Failed to parse streamed chart specification")
+            return ('delta', {'text': block})
+
+    def _marker_prefix_length(self, text: str) -> int:
+        """Length of the longest suffix of text that is a prefix of a marker"""
+        for size in range(min(len(text), len(CHART_START) - 1), 0, -1):
+            if any(marker.startswith(text[-size:]) for marker in self._markers):
+                return size
+        return 0
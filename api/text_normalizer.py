@@ -0,0 +1,77 @@
+"""
+Text normalization for Guatemalan Spanish comments
+Accent stripping, slang expansion, repeated-letter collapsing and light plural
+stemming shared by the retrieval and matching modules
+"""
+
+import re
+import unicodedata
+from typing import List
+
+# Informal spellings / slang -> standard word (applied per token)
+SLANG = {
+    'q': 'que', 'k': 'que', 'ke': 'que', 'qe': 'que', 'xq': 'porque', 'pq': 'porque',
+    'porq': 'porque', 'x': 'por', 'xa': 'para', 'pa': 'para', 'tmb': 'tambien',
+    'tb': 'tambien', 'tbn': 'tambien', 'bn': 'bien', 'd': 'de', 'dl': 'del',
+    'ps': 'pues', 'pz': 'pues', 'vrd': 'verdad', 'xfa': 'favor', 'nd': 'nada',
+    'ntc': 'nada', 'sta': 'esta', 'stan': 'estan', 'toy': 'estoy', 'aki': 'aqui',
+    'ay': 'hay', 'ai': 'hay', 'govierno': 'gobierno', 'prezidente': 'presidente',
+    'corruto': 'corrupto', 'corupto': 'corrupto', 'corupcion': 'corrupcion',
+    'corrucion': 'corrupcion', 'pisto': 'dinero', 'chamba': 'trabajo', 'chance': 'trabajo',
+    'chonte': 'policia', 'chontes': 'policia'
+}
+
+# Function words ignored in queries and the index
+STOPWORDS = {
+    'a', 'al', 'algo', 'ante', 'asi', 'con', 'de', 'del', 'desde', 'e', 'el', 'ella',
+    'ellos', 'en', 'entre', 'era', 'es', 'esa', 'ese', 'eso', 'esta', 'este', 'esto',
+    'fue', 'ha', 'han', 'hay', 'la', 'las', 'le', 'les', 'lo', 'los', 'me', 'mi', 'mas',
+    'muy', 'nos', 'o', 'para', 'pero', 'por', 'que', 'se', 'si', 'sin', 'son', 'su',
+    'sus', 'te', 'tu', 'un', 'una', 'uno', 'y', 'ya', 'yo', 'the', 'and', 'of', 'about'
+}
+
+
+def strip_accents(text: str) -> str:
+    """Remove diacritics (á -> a, ñ -> n)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token: str) -> str:
+    """Very light plural stemming so "carreteras" matches "carretera\""""
+    if len(token) > 4 and token.endswith('es') and token[-3] in 'rnd':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+_REPEATS = re.compile(r'([a-z])\1+')
+
+
+def collapse_repeats(word: str) -> str:
+    """Collapse runs of a letter ("corrupto" -> "corupto", "siii" -> "si")"""
+    return _REPEATS.sub(r'\1', word)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, expand slang"""
+    text = strip_accents(text.lower())
+    words = re.findall(r'[a-z0-9]+', text)
+    return ' '.join(SLANG.get(word, word) for word in words)
+
+
+def tokenize(text: str, remove_stopwords: bool = True) -> List[str]:
+    """Normalized, stemmed tokens"""
+    tokens = []
+    for word in normalize_text(text).split():
+        if remove_stopwords and word in STOPWORDS:
+            continue
+        tokens.append(stem(word))
+    return tokens
+
+
+def fuzzy_key(word: str) -> str:
+    """Spelling-insensitive form of a normalized word (for the trigram index)"""
+    collapsed = collapse_repeats(word)
+    return collapse_repeats(SLANG.get(word, SLANG.get(collapsed, collapsed)))
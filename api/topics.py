@@ -0,0 +1,99 @@
+"""
+Topic keyword lists (from data/sentiment/sentiment_by_topic.json)
+Shared by the smart filter and the analytics engine, which must agree on
+which comments a keyword matches: both expand it with expand_keyword().
+"""
+
+import bisect
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .text_normalizer import normalize_text, stem, tokenize
+except ImportError:
+    from text_normalizer import normalize_text, stem, tokenize
+
+MIN_PREFIX_LENGTH = 4
+
+# Keywords in sentiment_by_topic.json meant as stems of a word family: only
+# these match every word they start ("corrup" -> corrupcion, corruptos;
+# "roba" -> robar, robaron; "pobre" -> pobreza)
+PREFIX_STEMS = frozenset({'corrup', 'legisl', 'roba', 'ladron', 'pobre'})
+
+TOPICS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sentiment', 'sentiment_by_topic.json')
+
+_topic_keywords = None
+
+
+def load_topic_keywords() -> Dict[str, List[str]]:
+    """Normalized, stemmed keyword stems per topic (loaded once)"""
+    global _topic_keywords
+    if _topic_keywords is None:
+        try:
+            with open(TOPICS_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _topic_keywords = {
+                topic: sorted({stem(normalize_text(kw)) for kw in info.get('keywords', []) if normalize_text(kw)})
+                for topic, info in data.items()
+            }
+        except Exception as e:
+            print(f"⚠ Warning: Could not load topic keywords: {e}")
+            _topic_keywords = {}
+    return _topic_keywords
+
+
+def keyword_stems(keywords: Iterable[str]) -> List[str]:
+    """Keywords tokenized like the comments (multi-word keywords space-joined)"""
+    return sorted({' '.join(tokenize(kw)) for kw in keywords if tokenize(kw)})
+
+
+def word_forms(keyword: str) -> List[str]:
+    """Tokens of a whole-word keyword in the singular or plural ("bus" -> bus, buses)"""
+    return sorted({keyword, stem(keyword + 's'), stem(keyword + 'es')})
+
+
+def expand_keyword(keyword: str, vocabulary: List[str]) -> List[str]:
+    """
+    Terms of a sorted token vocabulary matched by a single-word keyword
+
+    Keywords are whole words: they match themselves and their plurals, so
+    "bus" is neither in "abuso" nor in "buscan" and "salud" is not "saludo".
+    Only the stems in PREFIX_STEMS match every word they start.
+    """
+    if keyword in PREFIX_STEMS:
+        start = bisect.bisect_left(vocabulary, keyword)
+        matches = []
+        for term in vocabulary[start:]:
+            if not term.startswith(keyword):
+                break
+            matches.append(term)
+        return matches
+
+    matches = []
+    for term in word_forms(keyword):
+        i = bisect.bisect_left(vocabulary, term)
+        if i < len(vocabulary) and vocabulary[i] == term:
+            matches.append(term)
+    return matches
+
+
+def detect_topics(query: str, topics: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """Topics whose name or keywords appear in the query"""
+    if topics is None:
+        topics = load_topic_keywords()
+
+    tokens = set(tokenize(query))
+    found = []
+    for topic, keywords in topics.items():
+        names = {stem(part) for part in topic.split('_')} | set(keywords)
+        for token in tokens:
+            if any(
+                token == kw
+                or (len(kw) >= MIN_PREFIX_LENGTH and token.startswith(kw))
+                or (len(token) >= MIN_PREFIX_LENGTH and kw.startswith(token))
+                for kw in names
+            ):
+                found.append(topic)
+                break
+    return found
@@ -0,0 +1,167 @@
+"""
+Typo-tolerant word lookup over the comments
+Every distinct normalized word is indexed by the character trigrams of its
+spelling-insensitive form (accents stripped, slang expanded, repeated letters
+collapsed), so "corruto", "corupto" and "corrrupto" all find "corrupto".
+Built by build_data.py into data/build/trigram_index.bin and mapped by
+FullDatasetLoader; built in memory when the artifact is missing or stale.
+"""
+
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .dataset_artifact import ArtifactError, map_sections, read_string_table, string_table_sections, write_sections
+    from .text_normalizer import fuzzy_key, normalize_text
+except ImportError:
+    from dataset_artifact import ArtifactError, map_sections, read_string_table, string_table_sections, write_sections
+    from text_normalizer import fuzzy_key, normalize_text
+
+MAGIC = b'GTTI'
+VERSION = 1
+
+DEFAULT_THRESHOLD = 0.4  # Jaccard similarity of trigram sets
+DEFAULT_LIMIT = 10
+MIN_WORD_LENGTH = 2
+
+
+def trigrams(word: str) -> Set[str]:
+    """Padded character trigrams of a word's fuzzy key ("  c", " co", "cor", ...)"""
+    padded = f"  {fuzzy_key(word)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _flatten(lists: Iterable[Iterable[int]]) -> Tuple[array, array]:
+    """Concatenated int lists + end offsets"""
+    values = array('i')
+    ends = array('q')
+    for items in lists:
+        values.extend(items)
+        ends.append(len(values))
+    return values, ends
+
+
+class TrigramIndex:
+    """
+    Words -> trigrams -> similar words -> comment ids
+
+    Storage is flat arrays (memoryviews when mapped from the artifact):
+        words                       distinct normalized words
+        word_sizes[w]               number of trigrams of word w
+        comment_ids[w_start:w_end]  comments containing word w (sorted)
+        word_ids[t_start:t_end]     words containing trigram t
+    """
+
+    def __init__(self, words: List[str], word_sizes, comment_ids, comment_ends,
+                 trigram_keys: List[str], word_ids, word_ends, buffer=None):
+        self.words = words
+        self.word_sizes = word_sizes
+        self._comment_ids = comment_ids
+        self._comment_ends = comment_ends
+        self._word_ids = word_ids
+        self._word_ends = word_ends
+        self._trigrams = {key: i for i, key in enumerate(trigram_keys)}
+        self._word_lookup = None
+        self._buffer = buffer  # Keeps the mapping alive
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'TrigramIndex':
+        """Index every word of every comment text"""
+        postings = defaultdict(list)
+        for comment_id, text in enumerate(texts):
+            for word in set(normalize_text(text).split()):
+                if len(word) >= MIN_WORD_LENGTH:
+                    postings[word].append(comment_id)
+
+        words = sorted(postings)
+        trigram_words = defaultdict(list)
+        word_sizes = array('H')
+        for word_id, word in enumerate(words):
+            grams = trigrams(word)
+            word_sizes.append(len(grams))
+            for gram in grams:
+                trigram_words[gram].append(word_id)
+
+        comment_ids, comment_ends = _flatten(postings[word] for word in words)
+        trigram_keys = sorted(trigram_words)
+        word_ids, word_ends = _flatten(trigram_words[key] for key in trigram_keys)
+        return cls(words, word_sizes, comment_ids, comment_ends, trigram_keys, word_ids, word_ends)
+
+    def write(self, path: str, data_hash: Optional[str]) -> Dict[str, object]:
+        """Serialize to a build artifact; returns the header"""
+        trigram_keys = sorted(self._trigrams, key=self._trigrams.get)
+        sections = string_table_sections('words', self.words)
+        sections.append(('word_sizes', array('H', self.word_sizes).tobytes()))
+        sections.append(('comment_ids', array('i', self._comment_ids).tobytes()))
+        sections.append(('comment_ends', array('q', self._comment_ends).tobytes()))
+        sections.extend(string_table_sections('trigrams', trigram_keys))
+        sections.append(('word_ids', array('i', self._word_ids).tobytes()))
+        sections.append(('word_ends', array('q', self._word_ends).tobytes()))
+        header = {'data_hash': data_hash, 'words': len(self.words), 'trigrams': len(trigram_keys)}
+        return write_sections(path, header, sections, MAGIC, VERSION)
+
+    @classmethod
+    def load(cls, path: str, expected_hash: Optional[str] = None) -> 'TrigramIndex':
+        """Map a build artifact (raises ArtifactError if it can't be used)"""
+        header, section, buffer = map_sections(path, expected_hash, MAGIC, VERSION)
+        words = read_string_table(section, 'words')
+        trigram_keys = read_string_table(section, 'trigrams')
+        word_sizes = section('word_sizes', 'H')
+        comment_ends = section('comment_ends', 'q')
+        word_ends = section('word_ends', 'q')
+        if not (len(words) == len(word_sizes) == len(comment_ends) == header.get('words')) or len(word_ends) != len(trigram_keys):
+            raise ArtifactError('trigram index sections have inconsistent lengths')
+        return cls(
+            words, word_sizes, section('comment_ids', 'i'), comment_ends,
+            trigram_keys, section('word_ids', 'i'), word_ends, buffer=buffer
+        )
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def word_id(self, word: str) -> Optional[int]:
+        if self._word_lookup is None:
+            self._word_lookup = {w: i for i, w in enumerate(self.words)}
+        return self._word_lookup.get(word)
+
+    def similar(self, term: str, threshold: float = DEFAULT_THRESHOLD,
+                limit: int = DEFAULT_LIMIT) -> List[Tuple[str, float]]:
+        """Indexed words whose trigram Jaccard similarity to term is >= threshold, best first"""
+        words = normalize_text(term).split()
+        if len(words) != 1:
+            return []
+        grams = trigrams(words[0])
+        size = len(grams)
+        shared = defaultdict(int)
+        for gram in grams:
+            index = self._trigrams.get(gram)
+            if index is None:
+                continue
+            start = self._word_ends[index - 1] if index else 0
+            for word_id in self._word_ids[start:self._word_ends[index]]:
+                shared[word_id] += 1
+
+        # |A∩B| / |A∪B| >= t  needs  |A∩B| >= t * (|A| + |B|) / (1 + t)
+        matches = []
+        for word_id, common in shared.items():
+            if common >= threshold * (size + self.word_sizes[word_id]) / (1 + threshold):
+                similarity = common / (size + self.word_sizes[word_id] - common)
+                matches.append((self.words[word_id], round(similarity, 3)))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def comments_with(self, word: str) -> List[int]:
+        """Comment ids containing an indexed word (exact normalized spelling)"""
+        word_id = self.word_id(word)
+        if word_id is None:
+            return []
+        start = self._comment_ends[word_id - 1] if word_id else 0
+        return list(self._comment_ids[start:self._comment_ends[word_id]])
+
+    def search(self, term: str, threshold: float = DEFAULT_THRESHOLD) -> List[int]:
+        """Comment ids containing any word similar to term (sorted)"""
+        found = set()
+        for word, _ in self.similar(term, threshold, limit=len(self.words)):
+            found.update(self.comments_with(word))
+        return sorted(found)
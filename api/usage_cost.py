@@ -0,0 +1,50 @@
+"""
+Token pricing for cost estimates in the chat log and dashboard
+Prices in USD per million tokens (Anthropic list prices)
+"""
+
+from typing import Any, Dict, Optional
+
+PRICING = {
+    'claude-3-5-haiku': {
+        'input': 0.80,
+        'output': 4.00,
+        'cache_write': 1.00,
+        'cache_read': 0.08
+    }
+}
+
+DEFAULT_MODEL = 'claude-3-5-haiku'
+
+
+def _price(model: Optional[str]) -> Dict[str, float]:
+    """Price table for a model id ('claude-3-5-haiku-20241022' matches 'claude-3-5-haiku')"""
+    model = model or DEFAULT_MODEL
+    for prefix, price in PRICING.items():
+        if model.startswith(prefix):
+            return price
+    return PRICING[DEFAULT_MODEL]
+
+
+def total_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """All tokens billed for one request (input incl. cache reads/writes + output)"""
+    usage = usage or {}
+    return (
+        usage.get('input_tokens', 0)
+        + usage.get('cache_creation_input_tokens', 0)
+        + usage.get('cache_read_input_tokens', 0)
+        + usage.get('output_tokens', 0)
+    )
+
+
+def estimate_cost(usage: Optional[Dict[str, Any]], model: Optional[str] = None) -> float:
+    """Estimated USD cost of one request from its usage block"""
+    usage = usage or {}
+    price = _price(model)
+    cost = (
+        usage.get('input_tokens', 0) * price['input']
+        + usage.get('output_tokens', 0) * price['output']
+        + usage.get('cache_creation_input_tokens', 0) * price['cache_write']
+        + usage.get('cache_read_input_tokens', 0) * price['cache_read']
+    ) / 1_000_000
+    return round(cost, 6)
@@ -0,0 +1,61 @@
+"""
+Cold-start benchmark: binary dataset artifact vs JSON files
+Each run is a fresh Python process (like a new serverless instance) that
+imports the loader and loads the dataset; we time both paths.
+
+Usage:
+    python build_data.py            # make sure data/build/dataset.bin is current
+    python benchmark_cold_start.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = """
+import contextlib, io, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {api!r})
+from full_dataset_loader import FullDatasetLoader
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    loader = FullDatasetLoader(use_artifact={use_artifact})
+    loaded = time.perf_counter()
+    stats = loader.get_statistics()
+end = time.perf_counter()
+print(loader.source, len(loader.comments), loaded - imported, end - start)
+"""
+
+
+def run_once(use_artifact: bool):
+    code = CHILD.format(api=os.path.join(ROOT, 'api'), use_artifact=use_artifact)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    source, count, load_seconds, total_seconds = output.split()
+    return source, int(count), float(load_seconds) * 1000, float(total_seconds) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+
+    print("=" * 80)
+    print(f"COLD-START BENCHMARK ({runs} fresh processes per path)")
+    print("=" * 80)
+
+    for label, use_artifact in (("JSON files", False), ("Binary artifact", True)):
+        results = [run_once(use_artifact) for _ in range(runs)]
+        sources = {r[0] for r in results}
+        loads = [r[2] for r in results]
+        totals = [r[3] for r in results]
+        print(f"\n{label} (source: {', '.join(sorted(sources))}, {results[0][1]:,} comments)")
+        print(f"  load only:              median {statistics.median(loads):7.1f} ms | min {min(loads):7.1f} ms")
+        print(f"  import + load + stats:  median {statistics.median(totals):7.1f} ms | min {min(totals):7.1f} ms")
+
+        if use_artifact and sources != {'artifact'}:
+            print("  ⚠ Artifact was not used - run python build_data.py first")
+
+
+if __name__ == "__main__":
+    main()
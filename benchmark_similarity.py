@@ -0,0 +1,76 @@
+"""
+Similarity search benchmark: query latency vs dataset size
+Synthetic corpora are sampled from the real comments' word distribution
+(Zipf-like, same lengths) and scaled from 1.5K to 100K comments. For each
+size we time the build, single queries and a batch of queries, for both the
+sparse TF-IDF and the LSA-reduced search.
+
+Usage:
+    python benchmark_similarity.py [sizes...]     # e.g. 1580 10000 100000
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from full_dataset_loader import FullDatasetLoader
+from similarity_search import DEFAULT_LSA_COMPONENTS, TfidfIndex
+
+SIZES = (1580, 10000, 50000, 100000)
+QUERIES = [
+    'carreteras destruidas puentes', 'salud hospitales medicinas', 'corrupcion diputados sueldo',
+    'educacion escuelas maestros', 'impuestos canasta basica', 'seguridad policia',
+    'presidente arevalo', 'empleo trabajo jovenes'
+]
+REPEATS = 20
+BATCH = 32
+
+
+def synthetic_corpus(texts, size, seed=7):
+    """size comments whose words and lengths follow the real distribution"""
+    rng = random.Random(seed)
+    words = [word for text in texts for word in text.split()]
+    lengths = [len(text.split()) for text in texts]
+    return [' '.join(rng.choices(words, k=max(1, rng.choice(lengths)))) for _ in range(size)]
+
+
+def time_ms(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    loader = FullDatasetLoader()
+    texts = list(loader.comments.texts)
+
+    print("=" * 80)
+    print(f"SIMILARITY SEARCH BENCHMARK (median of {REPEATS} runs, top-20)")
+    print("=" * 80)
+    print(f"{'comments':>9} {'terms':>7} {'nnz':>9} {'build':>9} | {'sparse':>8} {'batch/q':>8} | {'lsa':>8} {'batch/q':>8}")
+
+    for size in sizes:
+        corpus = texts if size == len(texts) else synthetic_corpus(texts, size)
+        started = time.perf_counter()
+        index = TfidfIndex.build(corpus, DEFAULT_LSA_COMPONENTS)
+        build_s = time.perf_counter() - started
+
+        batch = (QUERIES * (BATCH // len(QUERIES) + 1))[:BATCH]
+        row = [f"{size:>9,}", f"{len(index.vocabulary):>7,}", f"{len(index.weights):>9,}", f"{build_s:>8.2f}s"]
+        for mode in ('sparse', 'lsa'):
+            single = time_ms(lambda: [index.search(q, mode=mode) for q in QUERIES]) / len(QUERIES)
+            batched = time_ms(lambda: index.search_batch(batch, mode=mode)) / BATCH
+            row.append(f"| {single:>6.2f}ms {batched:>6.2f}ms")
+        print(' '.join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Build step for the chat API
+Pre-renders the compact dataset context, compiles the dataset into a
+memory-mappable binary and builds the typo-tolerant trigram index and the
+TF-IDF/LSA similarity matrix in data/build/, so a cold function reads them
+without parsing the JSON or re-rendering 1,580 comments.
+
+Run after any change under data/ (the API falls back to rendering when the
+artifacts' data hash no longer matches):
+    python build_data.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from full_dataset_loader import BUILD_DIR, FullDatasetLoader
+
+
+def main():
+    print("=" * 80)
+    print("BUILDING CHAT API DATA ARTIFACTS")
+    print("=" * 80)
+
+    # Always compile from the JSON sources, never from a previous artifact
+    loader = FullDatasetLoader(use_artifact=False)
+    if not loader.comments:
+        print("⚠ No comments loaded, nothing to build")
+        return 1
+
+    print(f"\n1. Rendering compact context (data hash {loader.data_hash[:12]})")
+    path, meta = loader.build_compact_context_artifact()
+    print(f"   ✓ {os.path.relpath(path)}: {meta['chars']:,} chars, ~{meta['token_estimate']:,} tokens")
+
+    print("\n2. Compiling binary dataset (comments + posts ⨝ interest index)")
+    path, header = loader.build_dataset_artifact()
+    print(f"   ✓ {os.path.relpath(path)}: {header['count']:,} comments, {os.path.getsize(path):,} bytes")
+
+    print("\n3. Building trigram index (normalized words, collapsed repeats)")
+    path, header = loader.build_trigram_index_artifact()
+    print(f"   ✓ {os.path.relpath(path)}: {header['words']:,} words, {header['trigrams']:,} trigrams, {os.path.getsize(path):,} bytes")
+
+    print("\n4. Building TF-IDF similarity index (LSA-reduced)")
+    try:
+        from similarity_search import build_similarity_artifact
+    except ImportError as e:
+        print(f"   ⚠ Skipped ({e}); install numpy to enable vector search")
+    else:
+        path, index = build_similarity_artifact(loader)
+        print(f"   ✓ {os.path.relpath(path)}: {len(index.vocabulary):,} terms, {len(index.weights):,} non-zeros, {os.path.getsize(path):,} bytes")
+
+    print(f"\n✓ Artifacts written to {os.path.relpath(BUILD_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Offline evaluation of the context tiers (no API calls)
+For a set of representative questions, each tier's context is checked for the
+facts a correct answer needs: post IDs, precomputed counts and the comment
+lines it should quote. Counts only count as covered when they are given
+precomputed - nobody should trust a model to count 1,580 lines by hand.
+
+Prints coverage and estimated tokens per tier, the planner's pick, and the
+totals for the planner vs always sending the full dump.
+
+Usage:
+    python evaluate_context_tiers.py [-v]     # -v lists the missing facts
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from analytics_engine import get_analytics_engine
+from context_planner import TIERS, get_context_planner
+from full_dataset_loader import get_full_dataset_loader
+from rate_limiter import estimate_tokens
+
+OVERHEAD_TOKENS = 2000  # System prompt + query, sent with every tier
+
+
+def top_comments(mask, limit):
+    """Compact lines of the most-liked comments in a bitset"""
+    store = get_full_dataset_loader().comments
+    ids = [i for i in range(len(store)) if mask >> i & 1]
+    ids.sort(key=lambda i: -store.likes[i])
+    return [store.compact_line(i) for i in ids[:limit]]
+
+
+def build_questions():
+    """(question, facts the context must contain)"""
+    loader = get_full_dataset_loader()
+    analytics = get_analytics_engine()
+    posts = loader.posts
+
+    def negative(topic):
+        count = analytics.query(topic=topic, group_by='sentiment')['groups']['negative']['count']
+        return f"Negativos: {count} comentarios"
+
+    def topic_row(topic):
+        counts = analytics.crosstab('topic', 'sentiment')[topic]
+        total = analytics.query(topic=topic)['count']
+        return f"{topic}|{total}|{counts['negative']}|{counts['positive']}|{counts['neutral']}"
+
+    by_interest = sorted(posts, key=lambda p: -p['interest_index'])
+    by_views = sorted(posts, key=lambda p: -p['views'])
+    topics = sorted(analytics.topic_masks, key=lambda t: -analytics.query(topic=t)['count'])
+
+    return [
+        ('hola', []),
+        ('¿Cuál post generó más interés?', [str(by_interest[0]['video_id'])]),
+        ('muéstrame los 3 posts con más vistas', [str(p['video_id']) for p in by_views[:3]]),
+        ('¿cuántos comentarios negativos hay sobre salud?', [negative('salud')]),
+        ('¿qué porcentaje de comentarios es negativo?', [f"{loader.get_statistics()['pct_negative']}%"]),
+        ('muestra una gráfica del sentimiento por tema', [topic_row(t) for t in topics[:5]]),
+        ('¿qué dicen sobre las carreteras?', top_comments(analytics.keyword_mask(['carretera']), 5)),
+        ('dame ejemplos de comentarios sobre corrupción', top_comments(analytics.keyword_mask(['corrup']), 5)),
+        ('what do people say about the president?', top_comments(analytics.keyword_mask(['presidente', 'arevalo']), 5)),
+        ('compara salud y educación', top_comments(analytics.topic_masks['salud'], 3)
+         + top_comments(analytics.topic_masks['educacion'], 3)),
+        ('resumen general de los comentarios', [line for t in topics for line in top_comments(analytics.topic_masks[t], 1)]),
+        ('¿por qué la gente está enojada?', top_comments(analytics.all_mask, 10))
+    ]
+
+
+def coverage(context, facts):
+    """Share of facts present in the context (1.0 when nothing is needed)"""
+    if not facts:
+        return 1.0, []
+    missing = [fact for fact in facts if fact not in context]
+    return 1 - len(missing) / len(facts), missing
+
+
+def main():
+    verbose = '-v' in sys.argv[1:]
+    planner = get_context_planner()
+    questions = build_questions()
+
+    print("=" * 100)
+    print(f"CONTEXT TIER EVALUATION ({len(questions)} questions, coverage % / ~tokens incl. {OVERHEAD_TOKENS} overhead)")
+    print("=" * 100)
+    print(f"{'question':<46}" + ''.join(f"{tier:>13}" for tier in TIERS) + f"  {'planner':<12}")
+
+    totals = {'planner': [0.0, 0], 'full': [0.0, 0]}
+    for question, facts in questions:
+        plan = planner.plan(question, OVERHEAD_TOKENS)
+        cells = []
+        results = {}
+        for tier in TIERS:
+            parts = planner.render(tier, question)
+            if parts is None:
+                cells.append(f"{'n/a':>13}")
+                continue
+            context = "\n".join(parts)
+            share, missing = coverage(context, facts)
+            tokens = OVERHEAD_TOKENS + sum(estimate_tokens(part) for part in parts if part)
+            results[tier] = (share, tokens, missing)
+            cells.append(f"{share * 100:>5.0f}%/{tokens:>6,}")
+
+        chosen = results[plan.tier]
+        for name, (share, tokens, _) in (('planner', chosen), ('full', results['full'])):
+            totals[name][0] += share
+            totals[name][1] += tokens
+        print(f"{question[:45]:<46}" + ''.join(cells) + f"  {plan.tier}{' *' if plan.degraded else ''}")
+        if verbose and chosen[2]:
+            for fact in chosen[2]:
+                print(f"    missing: {' '.join(fact.split())[:90]}")
+
+    print("-" * 100)
+    n = len(questions)
+    for name, (share, tokens) in totals.items():
+        print(f"{name:<10} mean coverage {share / n * 100:5.1f}% | ~{tokens:,} input tokens ({tokens // n:,} per question)")
+    saved = 1 - totals['planner'][1] / totals['full'][1]
+    print(f"Planner sends {saved * 100:.0f}% fewer input tokens than always using the full dump")
+
+
+if __name__ == "__main__":
+    main()
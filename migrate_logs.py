@@ -0,0 +1,64 @@
+"""
+Import JSONL conversation logs into the SQLite log store
+Reads chat_log_YYYY-MM-DD.jsonl files (by default every one in the log
+directory) and inserts their entries. Entries already in the store are
+skipped, so the import can be re-run at any time.
+
+Usage:
+    python migrate_logs.py                       # all files in CHAT_LOG_DIR
+    python migrate_logs.py logs/*.jsonl --db /tmp/chat_logs.sqlite
+    python migrate_logs.py --rebuild-rollups     # regenerate the daily analytics rollups
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from log_store import DEFAULT_DB_PATH, LogStore
+from log_writer import LOG_DIR
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import JSONL chat logs into the SQLite log store")
+    parser.add_argument('files', nargs='*', help="JSONL files (default: chat_log_*.jsonl in the log directory)")
+    parser.add_argument('--log-dir', default=LOG_DIR, help="Directory searched when no files are given")
+    parser.add_argument('--db', default=os.environ.get('CHAT_LOG_DB', DEFAULT_DB_PATH), help="SQLite database")
+    parser.add_argument(
+        '--rebuild-rollups', action='store_true',
+        help="Regenerate the daily analytics rollups from the stored logs instead of importing"
+    )
+    args = parser.parse_args(argv)
+
+    if args.rebuild_rollups:
+        started = time.perf_counter()
+        days = LogStore(args.db).rebuild_rollups()
+        print(f"✓ Rebuilt rollups for {days:,} days in {args.db} in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    files = args.files or sorted(glob.glob(os.path.join(args.log_dir, 'chat_log_*.jsonl')))
+    if not files:
+        print(f"No log files found in {args.log_dir}")
+        return 0
+
+    store = LogStore(args.db)
+    started = time.perf_counter()
+    total_inserted = total_skipped = 0
+    for path in files:
+        inserted, skipped = store.import_jsonl(path)
+        total_inserted += inserted
+        total_skipped += skipped
+        print(f"✓ {os.path.basename(path)}: {inserted:,} imported, {skipped:,} skipped")
+
+    print(
+        f"✓ {total_inserted:,} entries imported into {args.db} from {len(files)} files "
+        f"({total_skipped:,} duplicates or unreadable lines skipped) in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -84,19 +84,45 @@ async function sendMessage() {
         const response = await fetch(`${API_BASE_URL}/api/chat`, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream, application/json'
             },
             body: JSON.stringify({
                 message: message,
                 conversation_history: conversationHistory,
-                session_id: sessionId
+                session_id: sessionId,
+                stream: true
             })
         });
         
+        // Rate limited: show the server's message (includes when to retry)
+        if (response.status === 429 || response.status === 503) {
+            const data = await response.json().catch(() => ({}));
+            const retryAfter = response.headers.get('Retry-After') || data.retry_after;
+            removeLoadingMessage(loadingId);
+            addMessage('assistant', data.response || `⏱️ Rate limit reached. Please try again in ${retryAfter || 60} seconds.`);
+            return;
+        }
+        
         if (!response.ok) {
             throw new Error(`API error: ${response.status}`);
         }
         
+        // Streaming response (SSE) - render incrementally
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.includes('text/event-stream')) {
+            const answer = await readStreamedResponse(response, loadingId);
+            
+            conversationHistory.push(
+                { role: 'user', content: message },
+                { role: 'assistant', content: answer }
+            );
+            if (conversationHistory.length > 10) {
+                conversationHistory = conversationHistory.slice(-10);
+            }
+            return;
+        }
+        
         const data = await response.json();
         
         console.log('DEBUG: Received data from API:', data);
@@ -115,7 +141,7 @@ async function sendMessage() {
         removeLoadingMessage(loadingId);
         
         // Add assistant response
-        addMessage('assistant', data.response, data.sources);
+        addMessage('assistant', data.response, data.sources, data.charts);
         
         // Update conversation history
         conversationHistory.push(
@@ -139,7 +165,7 @@ async function sendMessage() {
 }
 
 // Add message to chat
-function addMessage(role, content, sources = null) {
+function addMessage(role, content, sources = null, charts = null) {
     const chatContainer = document.getElementById('chatContainer');
     
     const messageDiv = document.createElement('div');
@@ -148,19 +174,21 @@ function addMessage(role, content, sources = null) {
     const icon = role === 'user' ? '👤' : '<img src="wendy.png" alt="Wendy AI" style="width: 32px; height: 32px; border-radius: 50%;">';
     const label = role === 'user' ? 'You' : 'Wendy AI';
     
-    // Extract chart specifications if present
-    let chartSpec = null;
+    // Charts come pre-built from the server ([CHART:...] tags in the text);
+    // older answers may still embed [CHART_START] JSON
+    let chartSpecs = charts ? charts.slice() : [];
     let textContent = content;
-    let chartId = null;  // Declare chartId in outer scope
     
     if (role === 'assistant') {
+        textContent = textContent.replace(/\[CHART:[^\]\n]*\]/g, '').trim();
+        
         // Match both [CHART_END] and [/CHART_END] (be forgiving)
-        const chartMatch = content.match(/\[CHART_START\]([\s\S]*?)\[\/?CHART_END\]/);
+        const chartMatch = textContent.match(/\[CHART_START\]([\s\S]*?)\[\/?CHART_END\]/);
         if (chartMatch) {
             try {
-                chartSpec = JSON.parse(chartMatch[1].trim());
+                chartSpecs.push(JSON.parse(chartMatch[1].trim()));
                 // Remove chart spec from text content (handle both formats)
-                textContent = content.replace(/\[CHART_START\][\s\S]*?\[\/?CHART_END\]/, '').trim();
+                textContent = textContent.replace(/\[CHART_START\][\s\S]*?\[\/?CHART_END\]/, '').trim();
             } catch (e) {
                 console.error('Failed to parse chart specification:', e);
                 console.error('Chart JSON:', chartMatch[1]);
@@ -177,15 +205,15 @@ function addMessage(role, content, sources = null) {
             <div class="message-text">${role === 'assistant' ? renderMarkdown(textContent) : escapeHtml(textContent)}</div>
     `;
     
-    // Add chart container if chart spec exists
-    if (chartSpec) {
-        chartId = `chart-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;  // Assign to outer variable
+    // Add a chart container per chart spec
+    const chartIds = chartSpecs.map(() => `chart-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`);
+    chartIds.forEach(chartId => {
         html += `
             <div class="chart-container">
                 <canvas id="${chartId}"></canvas>
             </div>
         `;
-    }
+    });
     
     // Add sources if available
     if (sources && sources.length > 0) {
@@ -210,16 +238,162 @@ function addMessage(role, content, sources = null) {
             hljs.highlightElement(block);
         });
         
-        // Render chart if spec exists
-        if (chartSpec) {
-            const chartCanvas = messageDiv.querySelector(`#${chartId}`);
+        // Render charts
+        chartSpecs.forEach((chartSpec, i) => {
+            const chartCanvas = messageDiv.querySelector(`#${chartIds[i]}`);
             if (chartCanvas) {
                 renderChart(chartCanvas, chartSpec);
             }
+        });
+    }
+}
+
+// Read a Server-Sent Events response and render it as it arrives
+async function readStreamedResponse(response, loadingId) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let view = null;
+    let finalData = null;
+    
+    const ensureView = () => {
+        if (!view) {
+            removeLoadingMessage(loadingId);
+            view = createStreamingMessage();
+        }
+        return view;
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            const event = parseSSEBlock(block);
+            if (!event) continue;
+            
+            if (event.name === 'delta') {
+                ensureView().appendText(event.data.text || '');
+            } else if (event.name === 'chart') {
+                ensureView().appendChart(event.data.chart);
+            } else if (event.name === 'error') {
+                ensureView().replaceText(event.data.response || 'Sorry, there was an error processing your request.');
+            } else if (event.name === 'done') {
+                finalData = event.data;
+            }
+        }
+    }
+    
+    if (!finalData) {
+        throw new Error('Stream ended unexpectedly');
+    }
+    
+    ensureView().finish(finalData.sources);
+    return finalData.response;
+}
+
+// Parse one SSE block ("event: x\ndata: {...}")
+function parseSSEBlock(block) {
+    let name = 'message';
+    let dataLines = [];
+    
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            name = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
         }
+    });
+    
+    if (dataLines.length === 0) return null;
+    
+    try {
+        return { name: name, data: JSON.parse(dataLines.join('\n')) };
+    } catch (e) {
+        console.error('Failed to parse SSE event:', e);
+        return null;
     }
 }
 
+// Create an assistant message that is filled in incrementally
+function createStreamingMessage() {
+    const chatContainer = document.getElementById('chatContainer');
+    
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message assistant';
+    messageDiv.innerHTML = `
+        <div class="message-content">
+            <div class="message-header">
+                <img src="wendy.png" alt="Wendy AI" style="width: 32px; height: 32px; border-radius: 50%;">
+                <div class="message-label">Wendy AI</div>
+            </div>
+            <div class="message-text"></div>
+        </div>
+    `;
+    chatContainer.appendChild(messageDiv);
+    
+    const contentEl = messageDiv.querySelector('.message-content');
+    const textEl = messageDiv.querySelector('.message-text');
+    let text = '';
+    let renderPending = false;
+    
+    // Re-render markdown at most once per frame
+    const scheduleRender = () => {
+        if (renderPending) return;
+        renderPending = true;
+        requestAnimationFrame(() => {
+            renderPending = false;
+            textEl.innerHTML = renderMarkdown(text);
+            scrollToBottom();
+        });
+    };
+    
+    return {
+        appendText(delta) {
+            text += delta;
+            scheduleRender();
+        },
+        replaceText(newText) {
+            text = newText;
+            scheduleRender();
+        },
+        appendChart(chartSpec) {
+            const chartId = `chart-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`;
+            const chartDiv = document.createElement('div');
+            chartDiv.className = 'chart-container';
+            chartDiv.innerHTML = `<canvas id="${chartId}"></canvas>`;
+            contentEl.appendChild(chartDiv);
+            renderChart(chartDiv.querySelector('canvas'), chartSpec);
+            scrollToBottom();
+        },
+        finish(sources) {
+            textEl.innerHTML = renderMarkdown(text);
+            textEl.querySelectorAll('pre code').forEach(block => {
+                hljs.highlightElement(block);
+            });
+            
+            if (sources && sources.length > 0) {
+                const uniqueSources = [...new Set(sources.map(s => s.source))];
+                const sourcesDiv = document.createElement('div');
+                sourcesDiv.className = 'message-sources';
+                sourcesDiv.innerHTML = `
+                    <strong>Sources:</strong> 
+                    ${uniqueSources.map(s => `<span class="source-tag">${s}</span>`).join('')}
+                `;
+                contentEl.appendChild(sourcesDiv);
+            }
+            scrollToBottom();
+        }
+    };
+}
+
 // Add loading message
 function addLoadingMessage() {
     const chatContainer = document.getElementById('chatContainer');
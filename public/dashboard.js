@@ -5,9 +5,14 @@ const API_BASE_URL = window.location.hostname === 'localhost'
     ? 'http://localhost:3000' 
     : '';
 
+// Logs are fetched a page at a time (cursor-paginated)
+const LOGS_PAGE_SIZE = 50;
+
 // State
 let currentPassword = '';
 let allLogs = [];
+let logsCursor = null;
+let logsTotal = 0;
 let analytics = {};
 
 // Initialize
@@ -44,7 +49,9 @@ async function login(event) {
             body: JSON.stringify({
                 action: 'get_logs',
                 password: password,
-                days: 7
+                days: 7,
+                page_size: 1,
+                fields: ['timestamp']
             })
         });
         
@@ -108,25 +115,10 @@ async function loadDashboardData() {
     const days = parseInt(document.getElementById('daysFilter').value);
     
     try {
-        // Load logs
-        const logsResponse = await fetch(`${API_BASE_URL}/api/dashboard`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                action: 'get_logs',
-                password: currentPassword,
-                days: days
-            })
-        });
-        
-        const logsData = await logsResponse.json();
-        
-        if (logsData.authenticated) {
-            allLogs = logsData.logs || [];
-            displayLogs(allLogs);
-        }
+        // Load the first page of logs
+        allLogs = [];
+        logsCursor = null;
+        await loadLogsPage(days);
         
         // Load analytics
         const analyticsResponse = await fetch(`${API_BASE_URL}/api/dashboard`, {
@@ -154,6 +146,52 @@ async function loadDashboardData() {
     }
 }
 
+// Load one page of logs (the next one after logsCursor) and append it
+async function loadLogsPage(days) {
+    const response = await fetch(`${API_BASE_URL}/api/dashboard`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            action: 'get_logs',
+            password: currentPassword,
+            days: days,
+            page_size: LOGS_PAGE_SIZE,
+            cursor: logsCursor
+        })
+    });
+    
+    const data = await response.json();
+    
+    if (data.authenticated && !data.error) {
+        allLogs = allLogs.concat(data.logs || []);
+        logsCursor = data.next_cursor || null;
+        logsTotal = data.total || allLogs.length;
+        filterLogs();
+    }
+}
+
+// Load More Logs
+async function loadMoreLogs() {
+    if (!logsCursor) {
+        return;
+    }
+    
+    const days = parseInt(document.getElementById('daysFilter').value);
+    const button = document.getElementById('loadMoreBtn');
+    button.disabled = true;
+    
+    try {
+        await loadLogsPage(days);
+    } catch (error) {
+        console.error('Error loading logs:', error);
+        alert('Failed to load more logs. Please try again.');
+    } finally {
+        button.disabled = false;
+    }
+}
+
 // Display Analytics
 function displayAnalytics(data) {
     // Update stats
@@ -161,6 +199,16 @@ function displayAnalytics(data) {
     document.getElementById('uniqueSessions').textContent = data.unique_sessions || 0;
     document.getElementById('avgMessageLength').textContent = data.avg_message_length || 0;
     document.getElementById('avgResponseLength').textContent = data.avg_response_length || 0;
+    document.getElementById('cacheHitRate').textContent = `${data.cache_hit_rate || 0}%`;
+    document.getElementById('totalTokens').textContent = (data.total_tokens || 0).toLocaleString();
+    
+    const perQuery = data.tokens_per_query || {};
+    document.getElementById('tokensPerQuery').textContent = perQuery.p50
+        ? `${perQuery.p50.toLocaleString()} / ${perQuery.p95.toLocaleString()}`
+        : '-';
+    
+    const spend = data.estimated_spend || {};
+    document.getElementById('estimatedSpend').textContent = `$${(spend.total_usd || 0).toFixed(2)}`;
     
     // Queries per day chart
     if (data.queries_per_day && Object.keys(data.queries_per_day).length > 0) {
@@ -250,12 +298,55 @@ function displayAnalytics(data) {
             }
         });
     }
+    
+    // Tokens per day chart (stacked by token type)
+    if (data.tokens_per_day && Object.keys(data.tokens_per_day).length > 0) {
+        const tokensCtx = document.getElementById('tokensChart');
+        
+        // Destroy existing chart if any
+        if (window.tokensChartInstance) {
+            window.tokensChartInstance.destroy();
+        }
+        
+        const dates = Object.keys(data.tokens_per_day).sort();
+        const series = [
+            { key: 'input', label: 'Input', color: '#667eea' },
+            { key: 'cache_read', label: 'Cache read', color: '#48bb78' },
+            { key: 'cache_write', label: 'Cache write', color: '#ed8936' },
+            { key: 'output', label: 'Output', color: '#764ba2' }
+        ];
+        
+        window.tokensChartInstance = new Chart(tokensCtx, {
+            type: 'bar',
+            data: {
+                labels: dates,
+                datasets: series.map(s => ({
+                    label: s.label,
+                    data: dates.map(date => data.tokens_per_day[date][s.key] || 0),
+                    backgroundColor: s.color
+                }))
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: true,
+                scales: {
+                    x: { stacked: true },
+                    y: { stacked: true, beginAtZero: true }
+                }
+            }
+        });
+    }
 }
 
 // Display Logs
 function displayLogs(logs) {
     const container = document.getElementById('logsContainer');
     
+    document.getElementById('logsCount').textContent = allLogs.length
+        ? `Showing ${allLogs.length.toLocaleString()} of ${logsTotal.toLocaleString()}`
+        : '';
+    document.getElementById('loadMoreBtn').style.display = logsCursor ? 'inline-flex' : 'none';
+    
     if (logs.length === 0) {
         container.innerHTML = `
             <div class="empty-state">
@@ -316,7 +407,7 @@ function refreshData() {
     loadDashboardData();
 }
 
-// Export Logs
+// Export Logs (streamed as NDJSON, one entry per line)
 async function exportLogs() {
     const days = parseInt(document.getElementById('daysFilter').value);
     
@@ -329,24 +420,26 @@ async function exportLogs() {
             body: JSON.stringify({
                 action: 'export_logs',
                 password: currentPassword,
-                days: days
+                days: days,
+                format: 'ndjson'
             })
         });
         
-        const data = await response.json();
-        
-        if (data.authenticated && data.logs) {
-            // Create downloadable file
-            const blob = new Blob([JSON.stringify(data.logs, null, 2)], { type: 'application/json' });
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = `presupuesto_2026_logs_${new Date().toISOString().split('T')[0]}.json`;
-            a.click();
-            URL.revokeObjectURL(url);
-        } else {
-            alert('Failed to export logs');
+        // Errors come back as JSON, the export itself as NDJSON
+        if ((response.headers.get('Content-Type') || '').includes('application/json')) {
+            const data = await response.json();
+            alert(data.error || 'Failed to export logs');
+            return;
         }
+        
+        // Create downloadable file
+        const blob = await response.blob();
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = `presupuesto_2026_logs_${new Date().toISOString().split('T')[0]}.ndjson`;
+        a.click();
+        URL.revokeObjectURL(url);
     } catch (error) {
         console.error('Export error:', error);
         alert('Failed to export logs. Please try again.');
@@ -0,0 +1,310 @@
+"""
+Local asyncio server for the chat app
+Mounts /api/chat and /api/dashboard (the same BaseHTTPRequestHandler classes
+Vercel runs) and serves public/ with HTTP/1.1 keep-alive, so the app can be
+load-tested on one box with real concurrency.
+
+Handlers block (upstream calls, SQLite, disk cache), so each API request runs
+on a bounded thread pool; the event loop only parses requests and moves bytes.
+Non-streaming API responses get a Content-Length, SSE responses are sent with
+chunked transfer encoding, so connections stay open in both cases. Responses
+the handler chunk-encodes itself (dashboard exports) are passed through.
+
+Usage:
+    python serve_local.py [--host 127.0.0.1] [--port 3000] [--workers 16]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import mimetypes
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.client import parse_headers
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(ROOT, 'public')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+
+DEFAULT_WORKERS = 16
+KEEPALIVE_TIMEOUT = 15.0       # Seconds an idle connection stays open
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = BaseHTTPRequestHandler.responses
+
+
+def load_routes() -> Dict[str, type]:
+    """API path -> handler class (imported here so --help stays fast)"""
+    import chat
+    import dashboard
+    return {'/api/chat': chat.handler, '/api/dashboard': dashboard.handler}
+
+
+def simple_response(status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None, keep_alive: bool = True) -> bytes:
+    """Serialize a complete HTTP/1.1 response"""
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, ('',))[0]}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+class ResponseAdapter:
+    """
+    wfile for a handler running on a worker thread
+
+    Collects the raw response the handler writes. Once the header block is
+    complete it is rewritten as HTTP/1.1: event streams are forwarded to the
+    client as chunks on every write, bodies the handler already chunk-encodes
+    are forwarded as they are, everything else is buffered and sent with a
+    Content-Length when the handler returns. A handler's 'Connection: close'
+    is honoured.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter, keep_alive: bool):
+        self.loop = loop
+        self.writer = writer
+        self.keep_alive = keep_alive
+        self.status = None
+        self.headers = []
+        self.streaming = False
+        self.framed = False  # The handler writes the chunk framing itself
+        self._head = b''
+        self._body = []
+
+    def write(self, data: bytes) -> int:
+        written = len(data)
+        if self.status is None:
+            self._head += bytes(data)
+            if b'\r\n\r\n' not in self._head:
+                return written
+            head, data = self._head.split(b'\r\n\r\n', 1)
+            self._parse_head(head)
+            if self.streaming:
+                self._send(self._head_bytes({'Transfer-Encoding': 'chunked'}))
+            if not data:
+                return written
+
+        if self.framed:
+            self._send(bytes(data))
+        elif self.streaming:
+            self._send(b'%x\r\n%s\r\n' % (len(data), bytes(data)))
+        else:
+            self._body.append(bytes(data))
+        return written
+
+    def flush(self):
+        """Wait until streamed bytes are handed to the socket (raises if the client left)"""
+        if self.streaming:
+            asyncio.run_coroutine_threadsafe(self._drain(), self.loop).result()
+
+    def finish(self) -> bytes:
+        """Remaining bytes to send once the handler returned"""
+        if self.status is None:
+            return simple_response(500, b'{"error": "Handler sent no response"}',
+                                   {'Content-Type': 'application/json'}, self.keep_alive)
+        if self.framed:
+            return b''
+        if self.streaming:
+            return b'0\r\n\r\n'
+        body = b''.join(self._body)
+        return self._head_bytes({'Content-Length': str(len(body))}) + body
+
+    def _parse_head(self, head: bytes):
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ', 2)
+        self.status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 500
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'transfer-encoding' and 'chunked' in value.lower():
+                self.streaming = self.framed = True
+            if name.strip().lower() == 'connection' and value.strip().lower() == 'close':
+                self.keep_alive = False
+            if name.strip().lower() in ('connection', 'content-length', 'transfer-encoding', 'keep-alive'):
+                continue
+            self.headers.append((name.strip(), value.strip()))
+            if name.strip().lower() == 'content-type' and 'text/event-stream' in value:
+                self.streaming = True
+
+    def _head_bytes(self, extra: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {self.status} {STATUS_TEXT.get(self.status, ('',))[0]}"]
+        lines.extend(f"{name}: {value}" for name, value in self.headers)
+        lines.extend(f"{name}: {value}" for name, value in extra.items())
+        lines.append(f"Connection: {'keep-alive' if self.keep_alive else 'close'}")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    def _send(self, data: bytes):
+        if self.writer.is_closing():
+            raise BrokenPipeError('client disconnected')
+        self.loop.call_soon_threadsafe(self.writer.write, data)
+
+    async def _drain(self):
+        if self.writer.is_closing():
+            raise ConnectionResetError('client disconnected')
+        await self.writer.drain()
+
+
+class LocalServer:
+    """Keep-alive HTTP/1.1 server: API handlers on a thread pool, static files inline"""
+
+    def __init__(self, routes: Dict[str, type], workers: int = DEFAULT_WORKERS, public_dir: str = PUBLIC_DIR):
+        self.routes = routes
+        self.public_dir = os.path.realpath(public_dir)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self._static_cache = {}  # path -> (mtime_ns, size, etag, body)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername') or ('127.0.0.1', 0)
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+
+                connection = (headers.get('Connection') or '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                path = target.split('?', 1)[0]
+                if path in self.routes:
+                    keep_alive = await self._handle_api(
+                        self.routes[path], method, target, version, headers, body, peer, writer, keep_alive
+                    )
+                else:
+                    writer.write(self._handle_static(method, path, headers, keep_alive))
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader, writer) -> Optional[Tuple[str, str, str, object, bytes]]:
+        """Parse one request (None when the client closed or idled out)"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        except asyncio.LimitOverrunError:
+            writer.write(simple_response(431, keep_alive=False))
+            return None
+
+        request_line, _, header_block = head.partition(b'\r\n')
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            writer.write(simple_response(400, keep_alive=False))
+            return None
+        method, target, version = parts
+        headers = parse_headers(io.BytesIO(header_block))
+
+        length = int(headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            writer.write(simple_response(413, keep_alive=False))
+            return None
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    async def _handle_api(self, handler_class, method, target, version, headers, body, peer, writer, keep_alive) -> bool:
+        """Run a handler on the pool; returns whether the connection stays open"""
+        action = {'POST': 'do_POST', 'OPTIONS': 'do_OPTIONS'}.get(method)
+        if action is None or not hasattr(handler_class, action):
+            writer.write(simple_response(405, headers={'Allow': 'POST, OPTIONS'}, keep_alive=keep_alive))
+            return keep_alive
+
+        loop = asyncio.get_running_loop()
+        adapter = ResponseAdapter(loop, writer, keep_alive)
+
+        # Same attributes BaseHTTPRequestHandler sets up from a socket
+        h = handler_class.__new__(handler_class)
+        h.rfile = io.BytesIO(body)
+        h.wfile = adapter
+        h.headers = headers
+        h.command = method
+        h.path = target
+        h.request_version = version
+        h.requestline = f"{method} {target} {version}"
+        h.client_address = peer[:2]
+        h.close_connection = not keep_alive
+
+        try:
+            await loop.run_in_executor(self.executor, getattr(h, action))
+        except Exception as e:
+            print(f"ERROR in {target}: {e}")
+        writer.write(adapter.finish())
+        return adapter.keep_alive
+
+    def _handle_static(self, method: str, path: str, headers, keep_alive: bool) -> bytes:
+        if method not in ('GET', 'HEAD'):
+            return simple_response(405, headers={'Allow': 'GET, HEAD'}, keep_alive=keep_alive)
+
+        relative = path.lstrip('/') or 'index.html'
+        if relative.endswith('/'):
+            relative += 'index.html'
+        file_path = os.path.realpath(os.path.join(self.public_dir, relative))
+        if not file_path.startswith(self.public_dir + os.sep):
+            return simple_response(404, b'Not found', {'Content-Type': 'text/plain'}, keep_alive)
+        if not os.path.isfile(file_path) and os.path.isfile(file_path + '.html'):
+            file_path += '.html'  # /dashboard -> dashboard.html, like Vercel's cleanUrls
+        if not os.path.isfile(file_path):
+            return simple_response(404, b'Not found', {'Content-Type': 'text/plain'}, keep_alive)
+
+        etag, body = self._read_static(file_path)
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        response_headers = {'Content-Type': content_type, 'ETag': etag, 'Cache-Control': 'no-cache'}
+
+        if headers.get('If-None-Match') == etag:
+            return simple_response(304, headers={'ETag': etag}, keep_alive=keep_alive)
+        response = simple_response(200, body, response_headers, keep_alive)
+        if method == 'HEAD':
+            return response[:len(response) - len(body)]
+        return response
+
+    def _read_static(self, file_path: str) -> Tuple[str, bytes]:
+        """File contents and ETag, cached until the file changes"""
+        stat = os.stat(file_path)
+        cached = self._static_cache.get(file_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2], cached[3]
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        self._static_cache[file_path] = (stat.st_mtime_ns, stat.st_size, etag, body)
+        return etag, body
+
+
+async def serve(host: str, port: int, workers: int, ready: Optional[asyncio.Event] = None):
+    app = LocalServer(load_routes(), workers)
+    server = await asyncio.start_server(app.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    addresses = ', '.join(f"http://{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"✓ Serving public/ and /api/chat, /api/dashboard on {addresses} ({workers} API workers)")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the chat app locally (asyncio, keep-alive)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 3000)))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Thread pool size for API handlers")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        print("\n✓ Server stopped")
+
+
+if __name__ == "__main__":
+    main()
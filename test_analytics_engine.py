@@ -0,0 +1,100 @@
+"""
+Test the local analytics engine (exact counts and probabilities)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from analytics_engine import AnalyticsEngine, get_analytics_engine, EXPECTED_TOTAL
+from full_dataset_loader import get_full_dataset_loader
+from text_normalizer import tokenize
+from topics import word_forms
+
+
+def brute_force(comments, keyword=None, sentiment=None, stance=None, min_likes=None):
+    """Reference count with plain loops"""
+    count = 0
+    for c in comments:
+        if keyword and not set(word_forms(keyword)) & set(tokenize(c.get('text', ''))):
+            continue
+        if sentiment and c.get('sentiment', '').lower() != sentiment:
+            continue
+        if stance and c.get('post_stance', '').lower() != stance:
+            continue
+        if min_likes is not None and c.get('likes', 0) < min_likes:
+            continue
+        count += 1
+    return count
+
+
+def test_counts_match_brute_force():
+    """Bitset queries give the same counts as a plain loop"""
+    comments = get_full_dataset_loader().comments
+    engine = get_analytics_engine()
+
+    assert engine.query()['count'] == len(comments)
+    assert engine.query(sentiment='negative')['count'] == brute_force(comments, sentiment='negative')
+    assert engine.query(stance='approving', min_likes=5)['count'] == brute_force(comments, stance='approving', min_likes=5)
+    assert engine.query(keywords=['congreso'], sentiment='negative')['count'] == brute_force(comments, keyword='congreso', sentiment='negative')
+
+
+def test_probabilities_use_both_denominators():
+    """Simple divides by extracted comments, corrected by expected total"""
+    engine = get_analytics_engine()
+    result = engine.query(topic='salud', group_by='sentiment')
+    assert result['p_simple'] == round(result['count'] / engine.total, 4)
+    assert result['p_corrected'] == round(result['count'] / EXPECTED_TOTAL, 4)
+    assert sum(g['count'] for g in result['groups'].values()) == result['count']
+
+
+def test_groups_and_crosstab():
+    """Group-by and cross-tab agree"""
+    comments = [
+        {'text': 'falta medicina', 'sentiment': 'negative', 'post_stance': 'approving', 'post_url': 'https://x/video/1', 'likes': 3},
+        {'text': 'hospital nuevo', 'sentiment': 'positive', 'post_stance': 'disapproving', 'post_url': 'https://x/video/2', 'likes': 0},
+        {'text': 'ladrones', 'sentiment': 'negative', 'post_stance': 'disapproving', 'post_url': 'https://x/video/2', 'likes': 1},
+    ]
+    engine = AnalyticsEngine(comments=comments, posts=[])
+
+    by_post = engine.query(sentiment='negative', group_by='post')['groups']
+    assert by_post == {'1': {'count': 1, 'pct': 50.0}, '2': {'count': 1, 'pct': 50.0}}
+    assert engine.crosstab('topic', 'sentiment')['salud'] == {'negative': 1, 'positive': 1, 'neutral': 0}
+
+
+def test_topics_match_whole_words():
+    """Keywords match the word and its plural, not longer words that start with it"""
+    comments = [
+        {'text': 'buscan chamba', 'sentiment': 'negative'},
+        {'text': 'saludos desde Xela', 'sentiment': 'positive'},
+        {'text': 'qué abusos', 'sentiment': 'negative'},
+        {'text': 'no hay buses ni salud', 'sentiment': 'negative'},
+        {'text': 'los corruptos del congreso', 'sentiment': 'negative'},
+    ]
+    engine = AnalyticsEngine(comments=comments, posts=[])
+    assert engine.query(topic='transporte')['count'] == 1
+    assert engine.query(topic='salud')['count'] == 1
+    assert engine.query(topic='corrupcion')['count'] == 1  # 'corrup' is an explicit stem
+    assert engine.query(keywords=['saludo'])['count'] == 1
+
+
+def test_stats_context_for_topic_query():
+    """Topic questions get an exact statistics block, others get nothing"""
+    engine = get_analytics_engine()
+    context = engine.create_stats_context("¿Qué piensa la gente sobre salud?")
+    assert "TEMA: salud" in context
+    assert "P_corregida" in context
+    assert engine.create_stats_context("hola") == ""
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING LOCAL ANALYTICS ENGINE")
+    print("="*80)
+    test_counts_match_brute_force()
+    test_probabilities_use_both_denominators()
+    test_groups_and_crosstab()
+    test_topics_match_whole_words()
+    test_stats_context_for_topic_query()
+    print("\n✅ ANALYTICS ENGINE TESTS PASSED")
@@ -0,0 +1,113 @@
+"""
+Test the pooled Anthropic client against a stand-in HTTP server
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from anthropic_client import get_anthropic_client, reset_anthropic_client
+
+
+class FakeMessagesAPI(BaseHTTPRequestHandler):
+    """Answers /v1/messages and records which connection served each request"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    connections = []
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        FakeMessagesAPI.connections.append(self.client_address)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        FakeMessagesAPI.requests += 1
+
+        body = json.dumps({
+            'id': 'msg_test',
+            'type': 'message',
+            'role': 'assistant',
+            'model': 'claude-3-5-haiku-20241022',
+            'content': [{'type': 'text', 'text': 'ok'}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': 3, 'output_tokens': 1}
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_reuses_connections():
+    """Several calls through the shared client use one TCP connection"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMessagesAPI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    old_base_url = os.environ.get('ANTHROPIC_BASE_URL')
+    os.environ['ANTHROPIC_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    FakeMessagesAPI.connections = []
+    FakeMessagesAPI.requests = 0
+
+    try:
+        reset_anthropic_client()
+        first = get_anthropic_client('test-key')
+
+        for _ in range(5):
+            client = get_anthropic_client('test-key')
+            assert client is first
+            message = client.messages.create(
+                model='claude-3-5-haiku-20241022',
+                max_tokens=10,
+                messages=[{'role': 'user', 'content': 'hola'}]
+            )
+            assert message.content[0].text == 'ok'
+
+        assert FakeMessagesAPI.requests == 5
+        assert len(FakeMessagesAPI.connections) == 1, FakeMessagesAPI.connections
+
+        # A new API key rebuilds the client
+        assert get_anthropic_client('other-key') is not first
+    finally:
+        reset_anthropic_client()
+        server.shutdown()
+        server.server_close()
+        if old_base_url is None:
+            os.environ.pop('ANTHROPIC_BASE_URL', None)
+        else:
+            os.environ['ANTHROPIC_BASE_URL'] = old_base_url
+
+
+def test_client_requires_api_key():
+    """Missing API key fails with the same error as before"""
+    old_key = os.environ.pop('ANTHROPIC_API_KEY', None)
+    try:
+        reset_anthropic_client()
+        get_anthropic_client()
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert 'ANTHROPIC_API_KEY' in str(e)
+    finally:
+        if old_key is not None:
+            os.environ['ANTHROPIC_API_KEY'] = old_key
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING POOLED ANTHROPIC CLIENT")
+    print("="*80)
+    test_client_reuses_connections()
+    test_client_requires_api_key()
+    print("\n✅ CLIENT POOL TESTS PASSED")
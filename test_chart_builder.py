@@ -0,0 +1,132 @@
+"""
+Test server-side chart generation from [CHART:...] tags
+Chart numbers must match the analytics engine exactly and titles carry N.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from analytics_engine import get_analytics_engine
+from chart_builder import get_chart_builder, parse_chart_tag
+from streaming import ChartStreamSplitter
+from test_streaming import FakeClient, make_handler, parse_events
+
+
+def test_parse_tag():
+    assert parse_chart_tag('[CHART:sentiment]') == ('sentiment', {})
+    assert parse_chart_tag('[CHART:sentiment_by_topic topics=salud,educacion stance=d]') == (
+        'sentiment_by_topic', {'topics': 'salud,educacion', 'stance': 'd'}
+    )
+    assert parse_chart_tag('[CHART:sentiment topic=salud extra]') is None
+    assert parse_chart_tag('[CHART_START]') is None
+    print("✓ Tag parsing")
+
+
+def test_sentiment_chart_matches_engine():
+    """Counts and N come straight from the analytics engine"""
+    engine = get_analytics_engine()
+    builder = get_chart_builder()
+
+    chart = builder.build_from_tag('[CHART:sentiment topic=salud]')
+    expected = engine.query(topic='salud', group_by='sentiment')
+    assert chart['type'] == 'doughnut'
+    assert chart['data']['labels'] == ['Negativos', 'Positivos', 'Neutrales']
+    assert chart['data']['datasets'][0]['data'] == [expected['groups'][s]['count'] for s in ('negative', 'positive', 'neutral')]
+    assert sum(chart['data']['datasets'][0]['data']) == expected['count']
+    assert f"N={expected['count']:,} comentarios sobre salud" in chart['title']
+
+    overall = builder.build('sentiment')
+    assert f"N={engine.total:,} comentarios totales" in overall['title']
+    print(f"✓ {chart['title']}")
+
+
+def test_other_kinds():
+    engine = get_analytics_engine()
+    builder = get_chart_builder()
+
+    topics = builder.build('topics', top='5')
+    counts = topics['data']['datasets'][0]['data']
+    assert len(counts) == 5 and counts == sorted(counts, reverse=True)
+    assert counts[0] == max(engine.query(topic=t)['count'] for t in engine.topic_masks)
+
+    by_topic = builder.build('sentiment_by_topic', topics='salud,corrupción')
+    assert by_topic['data']['labels'] == ['Salud', 'Corrupción']
+    negatives = by_topic['data']['datasets'][0]['data']
+    assert negatives[0] == engine.query(topic='salud', sentiment='negative')['count']
+
+    stance = builder.build('stance', topic='corrupcion')
+    total = sum(sum(dataset['data']) for dataset in stance['data']['datasets'])
+    assert f"N={total:,}" in stance['title']
+
+    posts = builder.build('posts_by_interest', top='3')
+    indexes = posts['data']['datasets'][0]['data']
+    assert len(indexes) == 3 and indexes == sorted(indexes, reverse=True)
+    assert posts['data']['labels'][0].startswith('#1 @')
+    print("✓ topics, sentiment_by_topic, stance and posts_by_interest charts")
+
+
+def test_invalid_tags_build_nothing():
+    builder = get_chart_builder()
+    assert builder.build('pie_of_everything') is None
+    assert builder.build('sentiment', topic='astrologia') is None
+    assert builder.build('sentiment', colour='red') is None
+    assert builder.build('topics', sentiment='furious') is None
+    print("✓ Unknown kinds and parameters are rejected")
+
+
+def test_splitter_resolves_tags_across_chunks():
+    builder = get_chart_builder()
+    splitter = ChartStreamSplitter(builder.build_from_tag)
+    events = []
+    for chunk in ['La salud ', 'preocupa.\n[CHA', 'RT:sentiment to', 'pic=salud]\nFin [CHART:nope]', ' [CHART es texto']:
+        events += splitter.feed(chunk)
+    events += splitter.flush()
+
+    text = ''.join(payload['text'] for event, payload in events if event == 'delta')
+    charts = [payload['chart'] for event, payload in events if event == 'chart']
+    assert len(charts) == 1 and 'salud' in charts[0]['title']
+    assert text == 'La salud preocupa.\n\nFin  [CHART es texto'
+
+    plain = ChartStreamSplitter()
+    assert plain.feed('[CHART:sentiment]') + plain.flush() == [('delta', {'text': '[CHART:sentiment]'})]
+    print("✓ Streamed tags become chart events")
+
+
+def test_handler_expands_tags():
+    """JSON responses list the charts; SSE responses emit chart events"""
+    answer = 'Resumen.\n[CHART:sentiment topic=salud]'
+
+    h = make_handler({'message': 'gráfico de salud', 'session_id': 'chart-json'})
+    h._generate_response = lambda *args: (answer, {})
+    h.do_POST()
+    body = json.loads(h.wfile.getvalue().split(b'\r\n\r\n', 1)[1])
+    assert body['response'] == answer
+    assert len(body['charts']) == 1 and 'salud' in body['charts'][0]['title']
+
+    h = make_handler({'message': 'gráfico de salud', 'stream': True, 'session_id': 'chart-sse'})
+    h._get_client = lambda: FakeClient(['Resumen.\n[CHART:sent', 'iment topic=salud]'])
+    h.do_POST()
+    events = parse_events(h.wfile.getvalue())
+    assert [event for event, _ in events].count('chart') == 1
+    assert events[-1][1]['response'] == answer
+    print("✓ Handler expands chart tags (JSON and SSE)")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING CHART BUILDER")
+    print("="*80)
+
+    test_parse_tag()
+    test_sentiment_chart_matches_engine()
+    test_other_kinds()
+    test_invalid_tags_build_nothing()
+    test_splitter_resolves_tags_across_chunks()
+    test_handler_expands_tags()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
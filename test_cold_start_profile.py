@@ -0,0 +1,73 @@
+"""
+Test lazy imports and the cold-start profile
+The chat handler must import without the anthropic SDK, and the profile
+keeps first-occurrence timings and reports once.
+"""
+
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(__file__), 'api')
+sys.path.insert(0, API_DIR)
+
+from profiling import ColdStartProfile
+
+
+def test_chat_import_is_lazy():
+    """Importing the handler does not pull in anthropic/httpx"""
+    code = (
+        f"import sys; sys.path.insert(0, {API_DIR!r}); import chat; "
+        "print(sorted(m for m in ('anthropic', 'httpx') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+    print("✓ chat imports without anthropic/httpx")
+
+
+def test_profile_phases_and_imports():
+    """Phases keep the first timing, imports are timed, report is taken once"""
+    code = (
+        f"import os, sys, json; os.environ['CHAT_COLD_START_PROFILE'] = '1'; sys.path.insert(0, {API_DIR!r}); "
+        "import chat; "
+        "chat._profile.record('first_request', 0.5); chat._profile.record('first_request', 9.0); "
+        "import contextlib, io\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    report = chat._profile.take_report(); again = chat._profile.take_report()\n"
+        "print(json.dumps({'report': report, 'again': again}))"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    result = __import__('json').loads(output.strip().splitlines()[-1])
+
+    report = result['report']
+    assert result['again'] is None
+    assert report['phases_ms']['first_request'] == 500.0
+    assert 'import' in report['phases_ms']
+    modules = {entry['module'] for entry in report['slowest_imports']}
+    assert 'full_dataset_loader' in modules
+    print(f"✓ Phases: {report['phases_ms']}")
+    print(f"✓ Slowest imports: {[e['module'] for e in report['slowest_imports'][:5]]}")
+
+
+def test_disabled_profile_reports_nothing():
+    """Without CHAT_COLD_START_PROFILE nothing is attached to the log"""
+    profile = ColdStartProfile(enabled=False)
+    with profile.phase('data_load'):
+        pass
+    assert 'data_load' in profile.phases
+    assert profile.take_report() is None
+    print("✓ Disabled profile is silent")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING COLD-START PROFILE")
+    print("="*80)
+
+    test_chat_import_is_lazy()
+    test_profile_phases_and_imports()
+    test_disabled_profile_reports_nothing()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
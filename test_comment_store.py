@@ -0,0 +1,68 @@
+"""
+Test the column-oriented comment store
+Rows read back like the original dicts and the columns agree with them.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from comment_store import CommentStore, NEGATIVE, DISAPPROVING
+from smart_filter import format_comment
+
+COMMENTS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'comments', 'comments_all.json')
+
+
+def test_rows_match_source_dicts():
+    """Every row view equals the dict it was built from"""
+    with open(COMMENTS_PATH, 'r', encoding='utf-8') as f:
+        comments = json.load(f)
+    store = CommentStore(comments)
+
+    assert len(store) == len(comments)
+    assert all(row == comment for row, comment in zip(store, comments))
+    assert store[-1]['text'] == comments[-1]['text']
+    assert len(store.post_ids) == len({c['post_url'] for c in comments})
+    print(f"✓ {len(store)} rows round-trip ({len(store.post_ids)} posts, {len(store.authors)} authors)")
+
+
+def test_enums_and_missing_fields():
+    """Enums are decoded and absent fields behave like missing keys"""
+    store = CommentStore([
+        {'text': 'ladrones', 'sentiment': 'Negative', 'post_stance': 'disapproving',
+         'post_url': 'https://www.tiktok.com/@x/video/123?lang=es', 'likes': 4},
+        {'text': 'ok'},
+    ])
+    assert store.sentiment[0] == NEGATIVE and store.stance[0] == DISAPPROVING
+    assert store.post_id(0) == '123'
+
+    row = store[1]
+    assert row['sentiment'] == 'neutral'
+    assert row.get('post_url', 'N/A') == 'N/A'
+    assert 'post_stance' not in row
+    assert row.get('likes', 0) == 0
+    print("✓ Enums decoded, missing fields default")
+
+
+def test_compact_line_stance_letters():
+    """Disapproving posts are marked D (not A)"""
+    line = format_comment({'text': ' malo ', 'sentiment': 'negative', 'post_stance': 'disapproving',
+                           'post_url': 'https://x/video/9', 'likes': 2})
+    assert line == '[N]"malo"|9|D|2L'
+    print(f"✓ {line}")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING COMMENT STORE")
+    print("="*80)
+
+    test_rows_match_source_dicts()
+    test_enums_and_missing_fields()
+    test_compact_line_stance_letters()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
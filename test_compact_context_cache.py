@@ -0,0 +1,96 @@
+"""
+Test memoized / prebuilt compact context
+Checks that the context is rendered once per data hash, that the data is
+not reloaded mid-process, and that the prebuilt artifact is used when current
+and ignored when stale.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import full_dataset_loader
+from full_dataset_loader import FullDatasetLoader, data_fingerprint
+
+
+def test_fingerprint_is_stable():
+    """Same data, same hash (and the memoized path returns it too)"""
+    first = data_fingerprint()
+    second = data_fingerprint()
+    assert first == second
+    assert len(first) == 64
+    print(f"✓ Data hash: {first[:12]}")
+
+
+def test_context_is_memoized():
+    """Second call returns the cached string without re-rendering"""
+    loader = FullDatasetLoader()
+    renders = []
+    original = loader.render_compact_context
+
+    def counting_render():
+        renders.append(1)
+        return original()
+
+    loader.render_compact_context = counting_render
+    loader._read_compact_context_artifact = lambda: None
+
+    first = loader.create_compact_context()
+    second = loader.create_compact_context()
+    assert first is second
+    assert len(renders) == 1
+    print(f"✓ Rendered once for two calls ({len(first):,} chars)")
+
+
+def test_data_is_not_reloaded_mid_process():
+    """Changed data files don't swap the dataset under the other singletons"""
+    loader = FullDatasetLoader()
+    comments, data_hash = loader.comments, loader.data_hash
+    original_fingerprint = full_dataset_loader.data_fingerprint
+    full_dataset_loader.data_fingerprint = lambda: 'changed'
+    try:
+        loader.create_compact_context()
+    finally:
+        full_dataset_loader.data_fingerprint = original_fingerprint
+    assert loader.comments is comments and loader.data_hash == data_hash
+    print("✓ Dataset stays the one the process loaded")
+
+
+def test_artifact_roundtrip_and_staleness():
+    """Built artifact is read back verbatim; a different data hash ignores it"""
+    loader = FullDatasetLoader()
+    original_build_dir = full_dataset_loader.BUILD_DIR
+
+    with tempfile.TemporaryDirectory() as build_dir:
+        full_dataset_loader.BUILD_DIR = build_dir
+        try:
+            _, meta = loader.build_compact_context_artifact(build_dir)
+            assert meta['data_hash'] == loader.data_hash
+            assert meta['token_estimate'] == meta['chars'] // 4
+
+            context = loader._read_compact_context_artifact()
+            assert context == loader.render_compact_context()
+            print(f"✓ Artifact matches fresh render (~{meta['token_estimate']:,} tokens)")
+
+            loader.data_hash = 'stale'
+            assert loader._read_compact_context_artifact() is None
+            print("✓ Stale artifact ignored")
+        finally:
+            full_dataset_loader.BUILD_DIR = original_build_dir
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING COMPACT CONTEXT CACHE")
+    print("="*80)
+
+    test_fingerprint_is_stable()
+    test_context_is_memoized()
+    test_data_is_not_reloaded_mid_process()
+    test_artifact_roundtrip_and_staleness()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
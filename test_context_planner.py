@@ -0,0 +1,120 @@
+"""
+Test the context tier planner
+Queries get the cheapest tier that covers them, budgets push big queries
+down to a partial tier, and the handler sends (and logs) only that tier.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import chat
+from context_planner import ContextPlanner, get_context_planner
+from rate_limiter import TokenBucketScheduler
+from test_streaming import FakeClient, make_handler, parse_events
+
+EXPECTED = {
+    'hola': (set(), 'aggregates'),
+    '¿Cuál post generó más interés?': ({'posts'}, 'posts'),
+    '¿cuántos comentarios negativos hay sobre salud?': ({'stats'}, 'aggregates'),
+    'muestra una gráfica del sentimiento por tema': ({'stats'}, 'aggregates'),
+    '¿qué dicen sobre las carreteras?': ({'comments'}, 'retrieved'),
+    'carreteras': ({'stats', 'comments'}, 'retrieved'),
+    'resumen general de los comentarios': ({'comments', 'broad'}, 'full'),
+    '¿por qué la gente está enojada?': ({'comments', 'broad'}, 'full')
+}
+
+
+def test_cheapest_covering_tier():
+    planner = get_context_planner()
+    for message, (needs, tier) in EXPECTED.items():
+        plan = planner.plan(message, overhead_tokens=2000)
+        assert plan.needs == needs, (message, plan.needs)
+        assert plan.tier == tier, (message, plan.tier)
+        assert not plan.degraded and not plan.over_budget
+        assert plan.estimated_tokens <= plan.estimates['full']
+
+    salud = planner.plan('¿cuántos comentarios negativos hay sobre salud?')
+    assert 'TEMA: salud' in salud.dynamic and 'ALCANCE DEL CONTEXTO' in salud.dynamic
+    assert 'corrupcion|' in salud.static and '[N]"' not in salud.static
+    print(f"✓ {len(EXPECTED)} queries planned on the cheapest covering tier")
+
+
+def test_retrieved_tier_has_one_set_of_counts():
+    planner = get_context_planner()
+    plan = planner.plan('carreteras', tier='retrieved')
+    assert 'ESTADÍSTICAS EXACTAS' in plan.dynamic and 'EJEMPLOS REALES' in plan.dynamic
+    assert 'Total de comentarios relevantes' not in plan.dynamic
+
+    # No topic, no exact statistics: the filter's own totals stay
+    plan = planner.plan('¿qué dicen del alcalde?', tier='retrieved')
+    assert 'ESTADÍSTICAS EXACTAS' not in plan.dynamic
+    assert 'Total de comentarios relevantes' in plan.dynamic
+    print("✓ Retrieved context leaves totals to the exact statistics")
+
+
+def test_budgets():
+    planner = ContextPlanner(request_budget=60000)
+    broad = 'resumen general de los comentarios'
+
+    # The bucket cannot admit the full dump: best partial tier that fits
+    plan = planner.plan(broad, overhead_tokens=2000, minute_budget=10000)
+    assert plan.degraded and plan.tier == 'retrieved' and plan.estimated_tokens <= 10000
+
+    # A per-request budget below the full dump does the same
+    assert ContextPlanner(request_budget=10000).plan(broad, 2000).degraded
+
+    # Nothing fits: send what answers the query and let admission control queue it
+    plan = planner.plan(broad, overhead_tokens=2000, minute_budget=100)
+    assert plan.tier == 'full' and plan.over_budget and not plan.degraded
+
+    # Forced tiers (CHAT_CONTEXT_MODE); retrieval with no matches falls back to full
+    assert planner.plan('hola', tier='full').tier == 'full'
+    assert planner.plan('xyzzy qwrtp', tier='retrieved').tier == 'full'
+    print("✓ Budgets degrade or flag over-budget requests")
+
+
+def test_bucket_availability():
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = TokenBucketScheduler(os.path.join(tmp, 'bucket.sqlite'), input_tpm=6000, output_tpm=600)
+        scheduler.acquire(5000, 100)
+        now = scheduler.available()
+        assert 1000 <= now['input'] < 1100
+        assert 3000 <= scheduler.available(within=20)['input'] < 3100  # 100 tokens/s
+        assert scheduler.available(within=600)['input'] == 6000
+    print("✓ Bucket availability is read without reserving")
+
+
+def test_handler_sends_only_the_chosen_tier():
+    sent = []
+
+    class CapturingClient(FakeClient):
+        def stream(self, **params):
+            sent.append(params)
+            return super().stream(**params)
+
+    full_context = get_context_planner().loader.create_compact_context()
+    h = make_handler({'message': '¿cuántos comentarios negativos hay sobre salud?', 'stream': True},
+                     accept='text/event-stream')
+    h._get_client = lambda: CapturingClient(['Hay ', 'pocos.'])
+    h.do_POST()
+    assert parse_events(h.wfile.getvalue())[-1][0] == 'done'
+
+    system_text = ''.join(block['text'] for block in sent[0]['system'])
+    assert full_context not in system_text and 'AGREGADOS DEL DATASET' in system_text
+    assert h._context_plan['tier'] == 'aggregates'
+    assert h._context_plan['estimated_tokens'] < h._context_plan['estimates']['full']
+    assert h._prompt_size['estimated_tokens'] < 10000
+    print(f"✓ Handler sent ~{h._prompt_size['estimated_tokens']:,} tokens instead of "
+          f"~{h._context_plan['estimates']['full']:,} ({json.dumps(h._context_plan['needs'])})")
+
+
+if __name__ == '__main__':
+    test_cheapest_covering_tier()
+    test_retrieved_tier_has_one_set_of_counts()
+    test_budgets()
+    test_bucket_availability()
+    test_handler_sends_only_the_chosen_tier()
@@ -0,0 +1,157 @@
+"""
+Test dashboard log browsing and export
+get_logs pages with a (timestamp, id) cursor; export_logs streams NDJSON or
+CSV with chunked transfer encoding, optionally without the responses, both
+from http.server directly and through the local server.
+"""
+
+import csv
+import hashlib
+import http.client
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import dashboard
+from log_store import LogStore
+
+from test_local_server import start_server
+
+PASSWORD = 'test-password'
+os.environ['DASHBOARD_PASSWORD_HASH'] = hashlib.sha256(PASSWORD.encode()).hexdigest()
+
+TMP = tempfile.mkdtemp()
+STORE = LogStore(os.path.join(TMP, 'logs.sqlite'))
+dashboard.handler._store = lambda self: STORE
+
+
+def make_entries(count, start, session='s'):
+    return [
+        {
+            'timestamp': (start + timedelta(minutes=i // 2)).isoformat(),  # Pairs share a timestamp
+            'session_id': f'{session}{i % 7}',
+            'user_message': f'question {i}',
+            'assistant_response': 'answer, "quoted"\nline two ' * 50,
+            'sources': ['analytics'] if i % 2 else [],
+            'n': i
+        }
+        for i in range(count)
+    ]
+
+
+NOW = datetime.utcnow().replace(microsecond=0)
+ENTRIES = make_entries(1200, NOW - timedelta(hours=20))
+STORE.insert_many(ENTRIES)
+NEWEST_FIRST = sorted(ENTRIES, key=lambda e: (e['timestamp'], e['n']), reverse=True)
+
+
+def post(conn, payload):
+    payload = dict(payload, password=PASSWORD)
+    conn.request('POST', '/api/dashboard', json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def start_http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), dashboard.handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+HTTP_PORT = start_http_server()
+LOCAL_PORT = start_server(workers=4)
+
+
+def test_cursor_pages_cover_window_once():
+    since = (NOW - timedelta(days=1)).strftime('%Y-%m-%d')
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = STORE.page(since, cursor, limit=100)
+        seen.extend(page)
+        pages += 1
+        if pages == 3:  # New entries arriving meanwhile don't shift later pages
+            STORE.insert_many(make_entries(10, NOW, session='late'))
+        if cursor is None:
+            break
+    assert [e['n'] for e in seen] == [e['n'] for e in NEWEST_FIRST if e['timestamp'] >= since]
+    assert pages == 12
+
+    try:
+        STORE.page(since, 'not-a-cursor')
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    print(f"✓ {len(seen)} entries in {pages} pages, each exactly once")
+
+
+def test_get_logs_pages_with_projection():
+    conn = http.client.HTTPConnection('127.0.0.1', HTTP_PORT, timeout=10)
+    response, body = post(conn, {'action': 'get_logs', 'days': 1, 'page_size': 25, 'fields': ['n', 'timestamp']})
+    data = json.loads(body)
+    assert response.status == 200 and data['authenticated']
+    assert len(data['logs']) == 25 and set(data['logs'][0]) == {'n', 'timestamp'}
+    assert data['total'] >= 1200 and data['next_cursor']
+
+    conn = http.client.HTTPConnection('127.0.0.1', HTTP_PORT, timeout=10)
+    _, body = post(conn, {'action': 'get_logs', 'days': 1, 'page_size': 25, 'cursor': data['next_cursor']})
+    second = json.loads(body)['logs']
+    assert 'assistant_response' in second[0]
+    assert not {e['n'] for e in second} & {e['n'] for e in data['logs']}
+
+    conn = http.client.HTTPConnection('127.0.0.1', HTTP_PORT, timeout=10)
+    _, body = post(conn, {'action': 'get_logs', 'cursor': 'garbage'})
+    assert 'error' in json.loads(body)
+    print("✓ get_logs returns a page, its cursor and only the requested fields")
+
+
+def check_ndjson_export(port, label, fields=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    response, body = post(conn, {'action': 'export_logs', 'days': 1, 'fields': fields})
+    assert response.status == 200
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert response.getheader('Content-Type') == 'application/x-ndjson'
+    rows = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert len(rows) >= 1200
+    if fields:
+        assert all(set(row) <= set(fields) for row in rows)
+    else:
+        assert len(body) > 10 * dashboard.EXPORT_CHUNK_BYTES and rows[0]['assistant_response']
+    ns = [row['n'] for row in rows if row['session_id'].startswith('s')]
+    assert ns == [e['n'] for e in NEWEST_FIRST]
+    print(f"✓ NDJSON export ({label}): {len(rows)} rows, {len(body) // 1024} KB, chunked")
+
+
+def test_ndjson_export_streams():
+    check_ndjson_export(HTTP_PORT, 'http.server, without responses', ['n', 'session_id', 'sources'])
+    check_ndjson_export(LOCAL_PORT, 'local server, whole entries')
+
+
+def test_csv_export():
+    conn = http.client.HTTPConnection('127.0.0.1', HTTP_PORT, timeout=10)
+    response, body = post(conn, {'action': 'export_logs', 'days': 1, 'format': 'csv'})
+    assert response.getheader('Content-Type').startswith('text/csv')
+    rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+    assert rows[0] == list(dashboard.CSV_FIELDS)
+    by_message = {row[2]: row for row in rows[1:]}
+    original = ENTRIES[5]
+    assert by_message['question 5'][3] == original['assistant_response']  # Quotes and newlines survive
+    assert json.loads(by_message['question 5'][4]) == original['sources']
+
+    conn = http.client.HTTPConnection('127.0.0.1', HTTP_PORT, timeout=10)
+    _, body = post(conn, {'action': 'export_logs', 'format': 'xml'})
+    assert 'error' in json.loads(body)
+    print(f"✓ CSV export: {len(rows) - 1} rows with the default columns")
+
+
+if __name__ == '__main__':
+    test_cursor_pages_cover_window_once()
+    test_get_logs_pages_with_projection()
+    test_ndjson_export_streams()
+    test_csv_export()
@@ -0,0 +1,136 @@
+"""
+Test the binary dataset artifact
+Round-trip against the JSON path, stale/corrupt artifacts are rejected and
+the loader falls back to JSON.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import full_dataset_loader
+from dataset_artifact import ArtifactError, PREAMBLE, load_artifact, write_artifact, VERSION
+from full_dataset_loader import FullDatasetLoader
+
+
+def test_roundtrip_matches_json_load():
+    """Mapped store and posts equal what the JSON path produces"""
+    loader = FullDatasetLoader(use_artifact=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dataset.bin')
+        header = write_artifact(path, loader.comments, loader.posts, loader.data_hash)
+        store, posts = load_artifact(path, loader.data_hash)
+
+    assert header['count'] == len(store) == len(loader.comments)
+    assert all(store.row_dict(i) == loader.comments.row_dict(i) for i in range(len(store)))
+    assert posts == loader.posts
+    assert store.sentiment_counts() == loader.comments.sentiment_counts()
+    print(f"✓ {len(store)} comments and {len(posts)} posts round-trip")
+
+
+def test_stale_and_corrupt_artifacts_rejected():
+    """Wrong hash, wrong magic and wrong version all raise ArtifactError"""
+    loader = FullDatasetLoader(use_artifact=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dataset.bin')
+        write_artifact(path, loader.comments, loader.posts, loader.data_hash)
+
+        for expected_hash, patch in (('other-hash', None), (None, (0, b'XXXX')), (None, (4, bytes([VERSION + 1, 0])))):
+            if patch:
+                write_artifact(path, loader.comments, loader.posts, loader.data_hash)
+                with open(path, 'r+b') as f:
+                    f.seek(patch[0])
+                    f.write(patch[1])
+            try:
+                load_artifact(path, expected_hash)
+                assert False, "artifact should have been rejected"
+            except ArtifactError as e:
+                print(f"✓ Rejected: {e}")
+
+
+def rewrite_header(path, edit):
+    """Replace the JSON header in place (same length, so sections stay put)"""
+    with open(path, 'r+b') as f:
+        data = f.read()
+        _, _, length = PREAMBLE.unpack_from(data)
+        header = edit(data[PREAMBLE.size:PREAMBLE.size + length])
+        assert len(header) == length
+        f.seek(PREAMBLE.size)
+        f.write(header)
+
+
+def test_corrupt_header_and_sections_rejected():
+    """Garbled headers and misaligned or short sections raise ArtifactError, and the loader uses JSON"""
+    loader = FullDatasetLoader(use_artifact=False)
+
+    def garble(header):
+        return b'\xff' + header[1:]
+
+    def misalign(header):
+        meta = json.loads(header)
+        meta['sections']['likes'][0] += 1
+        meta['sections']['likes'][1] -= 1
+        return json.dumps(meta).encode('utf-8').ljust(len(header))
+
+    def bad_sections(header):
+        meta = json.loads(header)
+        meta['sections']['posts'] = 'nowhere'
+        return json.dumps(meta).encode('utf-8').ljust(len(header))
+
+    original_build_dir = full_dataset_loader.BUILD_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dataset.bin')
+        for edit in (garble, lambda header: header[:len(header) // 2].ljust(len(header)), misalign, bad_sections):
+            write_artifact(path, loader.comments, loader.posts, loader.data_hash)
+            rewrite_header(path, edit)
+            try:
+                load_artifact(path, loader.data_hash)
+                assert False, "artifact should have been rejected"
+            except ArtifactError as e:
+                print(f"✓ Rejected: {e}")
+
+        write_artifact(path, loader.comments, loader.posts, loader.data_hash)
+        rewrite_header(path, garble)
+        full_dataset_loader.BUILD_DIR = tmp
+        try:
+            fallback = FullDatasetLoader()
+        finally:
+            full_dataset_loader.BUILD_DIR = original_build_dir
+    assert fallback.source == 'json' and len(fallback.comments) == len(loader.comments)
+    print("✓ Corrupt header -> JSON fallback")
+
+
+def test_loader_falls_back_to_json():
+    """A stale artifact in the build dir is ignored"""
+    original_build_dir = full_dataset_loader.BUILD_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        json_loader = FullDatasetLoader(use_artifact=False)
+        write_artifact(os.path.join(tmp, 'dataset.bin'), json_loader.comments, json_loader.posts, 'stale')
+
+        full_dataset_loader.BUILD_DIR = tmp
+        try:
+            loader = FullDatasetLoader()
+        finally:
+            full_dataset_loader.BUILD_DIR = original_build_dir
+
+    assert loader.source == 'json'
+    assert len(loader.comments) == len(json_loader.comments)
+    print("✓ Stale artifact -> JSON fallback")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING BINARY DATASET ARTIFACT")
+    print("="*80)
+
+    test_roundtrip_matches_json_load()
+    test_stale_and_corrupt_artifacts_rejected()
+    test_corrupt_header_and_sections_rejected()
+    test_loader_falls_back_to_json()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
@@ -0,0 +1,93 @@
+"""
+Test token-aware history compaction
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from history import HistoryManager, CHART_PLACEHOLDER, message_tokens
+
+CHART_ANSWER = (
+    "La mayoría es negativa.\n"
+    "[CHART_START]\n"
+    '{"type": "pie", "title": "Sentimiento", "data": {"labels": ["Negativo", "Positivo"], "values": [94.6, 2.7]}}\n'
+    "[CHART_END]"
+)
+
+POST_LIST_ANSWER = "\n\n".join(
+    f"**[Rank #{i}] @usuario{i} - Descripción larga del post número {i} sobre el presupuesto**\n"
+    f"🔗 https://www.tiktok.com/@usuario{i}/video/75{i:017d}\n"
+    f"📊 Interest Index: {10 - i * 0.3:.2f} | 👁️ Views: {100000 - i * 1000:,} (as of October 30, 2025) | Stance: Disapproving"
+    for i in range(1, 21)
+)
+
+
+def test_charts_and_post_lists_are_stripped():
+    """Assistant turns lose chart JSON and post listings, user turns are untouched"""
+    history = [
+        {'role': 'user', 'content': 'Muestra un gráfico'},
+        {'role': 'assistant', 'content': CHART_ANSWER},
+        {'role': 'user', 'content': 'Lista de posts'},
+        {'role': 'assistant', 'content': POST_LIST_ANSWER},
+    ]
+    messages, stats = HistoryManager(token_budget=10000).compact(history)
+
+    assert messages[1]['content'] == f"La mayoría es negativa.\n{CHART_PLACEHOLDER}"
+    assert 'Rank #1 @usuario1' in messages[3]['content']
+    assert '🔗' not in messages[3]['content']
+    assert messages[2] == history[2]
+    assert stats['tokens_saved'] > 500
+    print(f"✓ Saved ~{stats['tokens_saved']} tokens ({stats['tokens_in']} -> {stats['tokens_kept']})")
+
+
+def test_chart_tags_are_stripped():
+    """Answers that asked for a chart with a tag lose the tag too"""
+    history = [
+        {'role': 'user', 'content': 'Gráfico de salud'},
+        {'role': 'assistant', 'content': 'Así se reparte:\n[CHART:sentiment topic=salud]\nY por post: [CHART:topics top=5]'},
+    ]
+    messages, _ = HistoryManager(token_budget=10000).compact(history)
+    assert messages[1]['content'] == f"Así se reparte:\n{CHART_PLACEHOLDER}\nY por post: {CHART_PLACEHOLDER}"
+    assert '[CHART' not in messages[1]['content']
+    print("✓ Chart tags replaced by the placeholder")
+
+
+def test_budget_keeps_latest_user_intent():
+    """Over budget: old assistant turns shrink, old turns drop, latest user message stays"""
+    long_answer = "palabra " * 800
+    history = []
+    for i in range(4):
+        history.append({'role': 'user', 'content': f'pregunta {i}'})
+        history.append({'role': 'assistant', 'content': long_answer})
+
+    manager = HistoryManager(token_budget=200, max_messages=6)
+    messages, stats = manager.compact(history)
+
+    assert sum(message_tokens(m) for m in messages) <= 200
+    assert {'role': 'user', 'content': 'pregunta 3'} in messages
+    assert stats['messages_dropped'] >= 2
+    assert stats['tokens_in'] == sum(message_tokens(m) for m in history)
+    print(f"✓ {len(messages)} messages kept within budget, {stats['messages_dropped']} dropped")
+
+
+def test_empty_history():
+    messages, stats = HistoryManager().compact([])
+    assert messages == [] and stats['tokens_saved'] == 0
+    print("✓ Empty history")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING HISTORY COMPACTION")
+    print("="*80)
+
+    test_charts_and_post_lists_are_stripped()
+    test_chart_tags_are_stripped()
+    test_budget_keeps_latest_user_intent()
+    test_empty_history()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
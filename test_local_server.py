@@ -0,0 +1,179 @@
+"""
+Test the local asyncio server (serve_local.py) over real sockets
+Static files with keep-alive, JSON and SSE chat responses, and API handlers
+running in parallel on the worker pool. Upstream calls are faked.
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import chat
+import serve_local
+from test_streaming import FakeClient
+
+chat.CACHE_ENABLED = False
+chat.RATE_LIMIT_ENABLED = False
+
+CONCURRENCY = 8
+UPSTREAM_SECONDS = 0.3
+
+
+def start_server(workers=CONCURRENCY):
+    """Run the server on an ephemeral port in a background thread; returns the port"""
+    ready = threading.Event()
+    port = []
+
+    async def run():
+        app = serve_local.LocalServer(serve_local.load_routes(), workers)
+        server = await asyncio.start_server(app.handle_connection, '127.0.0.1', 0)
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+    ready.wait(10)
+    return port[0]
+
+
+def post_json(conn, path, payload, accept='application/json'):
+    body = json.dumps(payload).encode()
+    conn.request('POST', path, body, {'Content-Type': 'application/json', 'Accept': accept})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+class patched:
+    """Temporarily replace chat.handler attributes (handlers are built by the server)"""
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.saved = {}
+
+    def __enter__(self):
+        for name, value in self.attrs.items():
+            self.saved[name] = chat.handler.__dict__.get(name)
+            setattr(chat.handler, name, value)
+
+    def __exit__(self, *args):
+        for name, value in self.saved.items():
+            if value is None:
+                delattr(chat.handler, name)
+            else:
+                setattr(chat.handler, name, value)
+
+
+PORT = start_server()
+
+
+def test_static_files_keep_alive():
+    """Several static files over one connection, ETag revalidation"""
+    conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=10)
+    conn.request('GET', '/')
+    first = conn.getresponse()
+    html = first.read()
+    sock = conn.sock
+
+    assert first.status == 200
+    assert first.getheader('Content-Type') == 'text/html; charset=utf-8'
+    assert b'<html' in html.lower()
+
+    conn.request('GET', '/app.js')
+    js = conn.getresponse()
+    js.read()
+    assert js.status == 200 and 'javascript' in js.getheader('Content-Type')
+    assert conn.sock is sock  # Same TCP connection
+
+    conn.request('GET', '/', headers={'If-None-Match': first.getheader('ETag')})
+    revalidated = conn.getresponse()
+    revalidated.read()
+    assert revalidated.status == 304
+
+    conn.request('GET', '/dashboard')
+    dashboard_page = conn.getresponse()
+    assert b'dashboard.js' in dashboard_page.read()
+
+    conn.request('GET', '/../requests.jsonl')
+    missing = conn.getresponse()
+    missing.read()
+    assert missing.status == 404
+    assert conn.sock is sock
+    conn.close()
+    print("✓ Static files served over one keep-alive connection")
+
+
+def test_chat_json_and_sse():
+    """JSON and streamed chat answers go through the real handler"""
+    chunks = ['Hola ', 'desde ', 'el servidor']
+    conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    with patched(_get_client=lambda self: FakeClient(chunks), _log_conversation=lambda self, **kwargs: None):
+        response, body = post_json(conn, '/api/chat', {'message': ''})
+        assert response.status == 200
+        assert json.loads(body)['error'] == 'Message is required'
+
+        response, body = post_json(conn, '/api/chat', {'message': 'hola', 'stream': True}, 'text/event-stream')
+        assert response.status == 200
+        assert response.getheader('Transfer-Encoding') == 'chunked'
+        events = [block for block in body.decode('utf-8').strip().split('\n\n')]
+        assert events[-1].startswith('event: done')
+        done = json.loads(events[-1].split('data: ', 1)[1])
+        assert done['response'] == ''.join(chunks)
+
+    conn.request('OPTIONS', '/api/chat')
+    options = conn.getresponse()
+    options.read()
+    assert options.status == 200
+    conn.close()
+    print(f"✓ JSON error, SSE stream ({len(events)} events) and OPTIONS on one connection")
+
+
+def test_api_requests_run_in_parallel():
+    """Blocking handlers run on the worker pool, not the event loop"""
+    def slow_generate(self, system_prompt, full_context, user_prompt):
+        time.sleep(UPSTREAM_SECONDS)
+        return 'ok', {}
+
+    # Warm the dataset and indexes first so timing measures the upstream wait
+    with patched(_generate_response=slow_generate, _log_conversation=lambda self, **kwargs: None):
+        post_json(http.client.HTTPConnection('127.0.0.1', PORT, timeout=30), '/api/chat', {'message': 'warm'})
+
+        statuses = []
+
+        def run(i):
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+            response, body = post_json(conn, '/api/chat', {'message': f'pregunta {i}'})
+            statuses.append((response.status, json.loads(body)['response']))
+            conn.close()
+
+        started = time.time()
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(CONCURRENCY)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        elapsed = time.time() - started
+
+    assert statuses == [(200, 'ok')] * CONCURRENCY
+    assert elapsed < CONCURRENCY * UPSTREAM_SECONDS / 2
+    print(f"✓ {CONCURRENCY} concurrent chat requests in {elapsed:.2f}s (serial would be {CONCURRENCY * UPSTREAM_SECONDS:.1f}s)")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING LOCAL ASYNC SERVER")
+    print("="*80)
+
+    test_static_files_keep_alive()
+    test_chat_json_and_sse()
+    test_api_requests_run_in_parallel()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
@@ -0,0 +1,199 @@
+"""
+Test the SQLite conversation log store
+Windowed dashboard queries (served from the daily rollups) must agree with
+a plain scan over the entries, rebuilt rollups must match the incremental
+ones, re-importing JSONL logs must not duplicate them, and window queries must
+use the timestamp index.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from log_store import KEYWORDS, LogStore
+from usage_cost import total_tokens
+
+import migrate_logs
+
+
+def make_entries(count, days=30, seed=7):
+    rng = random.Random(seed)
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    words = list(KEYWORDS) + ['hola', 'videos', 'likes']
+    entries = []
+    for i in range(count):
+        stamp = today - timedelta(days=rng.randrange(days), seconds=rng.randrange(40000))
+        usage = {} if rng.random() < 0.2 else {
+            'input_tokens': rng.randrange(100, 5000),
+            'output_tokens': rng.randrange(50, 800),
+            'cache_read_input_tokens': rng.choice([0, 3000]),
+            'cache_creation_input_tokens': rng.choice([0, 0, 1500])
+        }
+        entry = {
+            'timestamp': stamp.isoformat(),
+            'session_id': f'session-{rng.randrange(count // 4 + 1)}',
+            'user_message': ' '.join(rng.sample(words, 3)).upper(),
+            'assistant_response': 'r' * rng.randrange(10, 400),
+            'sources': rng.sample(['analytics', 'posts', 'comments'], rng.randrange(3)),
+            'usage': usage,
+            'model': 'claude-sonnet-4-20250514',
+            'latency_ms': rng.uniform(200, 9000) if usage else None,
+            'n': i
+        }
+        if i % 3:  # Older entries have no cache_hit field
+            entry['cache_hit'] = not usage
+        entries.append(entry)
+    return entries
+
+
+def test_insert_dedupe_and_windows():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, 'logs.sqlite'))
+        entries = make_entries(400)
+        assert store.insert_many(entries) == 400
+        assert store.insert_many(entries[:50]) == 0  # Same entries again
+
+        since = (datetime.utcnow() - timedelta(days=6)).strftime('%Y-%m-%d')
+        expected = sorted(
+            (e for e in entries if e['timestamp'] >= since),
+            key=lambda e: (e['timestamp'], e['n']), reverse=True
+        )
+        assert list(store.iter_entries(since)) == expected
+        page, cursor = store.page(since, limit=5)
+        assert page == expected[:5] and cursor
+
+        session = [e for e in entries if e['session_id'] == 'session-3']
+        assert store.session('session-3') == sorted(session, key=lambda e: e['timestamp'])
+    print("✓ Inserts are deduplicated, windows return full entries newest first")
+
+
+def test_aggregates_match_plain_scan():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, 'logs.sqlite'))
+        entries = make_entries(1000)
+        store.insert_many(entries)
+        since = (datetime.utcnow() - timedelta(days=13)).strftime('%Y-%m-%d')
+        window = [e for e in entries if e['timestamp'] >= since]
+
+        daily = store.daily(since)
+        for day, row in daily.items():
+            logs = [e for e in window if e['timestamp'][:10] == day]
+            metered = [e for e in logs if total_tokens(e['usage'])]
+            assert row['queries'] == len(logs)
+            assert row['response_length'] == sum(len(e['assistant_response']) for e in logs)
+            assert row['cache_logged'] == sum(1 for e in logs if 'cache_hit' in e)
+            assert row['cache_hits'] == sum(1 for e in logs if e.get('cache_hit'))
+            assert row['metered'] == len(metered)
+            assert row['total'] == sum(total_tokens(e['usage']) for e in metered)
+            for keyword in KEYWORDS:
+                assert row['keywords'][keyword] == sum(1 for e in logs if keyword in e['user_message'].lower())
+        assert sum(row['queries'] for row in daily.values()) == len(window)
+
+        assert store.unique_sessions(since) == len({e['session_id'] for e in window})
+        sources = {}
+        for e in window:
+            for source in e['sources']:
+                sources[source] = sources.get(source, 0) + 1
+        assert store.source_counts(since) == sources
+
+        tokens, latencies = store.metered(since)
+        assert sorted(tokens) == sorted(total_tokens(e['usage']) for e in window if e['usage'])
+        assert len(latencies) == len(tokens)
+    print("✓ Daily sums, keywords, sessions and sources match a scan of the entries")
+
+
+def rollup_snapshot(store):
+    daily = store.daily('2000-01-01')
+    for row in daily.values():
+        row['spend'] = round(row['spend'], 9)  # Summed in a different order
+    return daily, store.unique_sessions('2000-01-01'), store.source_counts('2000-01-01')
+
+
+def test_rebuilt_rollups_match_incremental():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'logs.sqlite')
+        store = LogStore(db)
+        entries = make_entries(600)
+        for start in range(0, 600, 70):  # Many small writes, days updated repeatedly
+            store.insert_many(entries[start:start + 70])
+        incremental = rollup_snapshot(store)
+        assert store.rebuild_rollups() == len(incremental[0])
+        assert rollup_snapshot(store) == incremental
+
+        # A store written before rollups existed is backfilled when opened
+        conn = sqlite3.connect(db)
+        conn.executescript('DELETE FROM daily_rollups; DELETE FROM daily_sessions; DELETE FROM daily_keywords;')
+        conn.close()
+        assert rollup_snapshot(LogStore(db))[:2] == incremental[:2]
+
+        migrate_logs.main(['--rebuild-rollups', '--db', db])
+        assert rollup_snapshot(LogStore(db)) == incremental
+    print(f"✓ Rebuilt rollups match the {len(incremental[0])} incrementally maintained days")
+
+
+def test_window_queries_use_timestamp_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, 'logs.sqlite'))
+        conn = sqlite3.connect(store.db_path)
+        try:
+            plan = ' '.join(
+                row[-1] for row in conn.execute(
+                    'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM conversations WHERE timestamp >= ?', ('2026-10-01',)
+                )
+            )
+        finally:
+            conn.close()
+        assert 'idx_conversations_timestamp' in plan, plan
+    print("✓ Window queries are index range scans")
+
+
+def test_migration_is_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        entries = make_entries(300, days=3)
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(entry['timestamp'][:10], []).append(json.dumps(entry))
+        for day, lines in by_day.items():
+            with open(os.path.join(tmp, f'chat_log_{day}.jsonl'), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines + ['{not json']) + '\n')
+
+        db = os.path.join(tmp, 'logs.sqlite')
+        migrate_logs.main(['--log-dir', tmp, '--db', db])
+        migrate_logs.main(['--log-dir', tmp, '--db', db])  # Running it again adds nothing
+
+        store = LogStore(db)
+        assert len(list(store.iter_entries('2000-01-01'))) == 300
+        inserted, skipped = store.import_jsonl(os.path.join(tmp, f'chat_log_{min(by_day)}.jsonl'))
+        assert inserted == 0 and skipped == len(by_day[min(by_day)]) + 1
+    print("✓ Migrating JSONL logs twice imports every entry once")
+
+
+def test_dashboard_queries_are_fast():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, 'logs.sqlite'))
+        store.insert_many(make_entries(20000, days=90))
+        since = (datetime.utcnow() - timedelta(days=6)).strftime('%Y-%m-%d')
+        started = time.perf_counter()
+        store.daily(since)
+        store.unique_sessions(since)
+        store.source_counts(since)
+        store.metered(since)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        assert elapsed_ms < 1000
+    print(f"✓ 7-day dashboard queries over 20,000 entries in {elapsed_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    test_insert_dedupe_and_windows()
+    test_aggregates_match_plain_scan()
+    test_rebuilt_rollups_match_incremental()
+    test_window_queries_use_timestamp_index()
+    test_migration_is_idempotent()
+    test_dashboard_queries_are_fast()
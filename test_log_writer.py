@@ -0,0 +1,158 @@
+"""
+Test the buffered conversation log writer
+Requests only queue entries; the background thread writes whole lines, and
+concurrent processes appending to one file never corrupt each other's lines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.join(os.path.dirname(__file__), 'api')
+sys.path.insert(0, API_DIR)
+
+from log_writer import LogWriter, log_file_name
+
+
+def read_entries(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def entry(i, day='2026-10-16', size=10):
+    return {'timestamp': f'{day}T12:00:00', 'session_id': f's{i}', 'assistant_response': 'x' * size}
+
+
+def test_write_is_buffered():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = LogWriter(tmp, batch_size=1000, flush_interval=60)
+        started = time.perf_counter()
+        for i in range(500):
+            writer.write(entry(i, size=2000))
+        per_write_ms = (time.perf_counter() - started) * 1000 / 500
+
+        path = os.path.join(tmp, log_file_name('2026-10-16'))
+        assert not os.path.exists(path) and writer.pending() == 500
+        assert writer.flush() == 500 and writer.pending() == 0
+        assert [e['session_id'] for e in read_entries(path)] == [f's{i}' for i in range(500)]
+        writer.close()
+    print(f"✓ write() queues in {per_write_ms:.3f} ms, flush writes in order")
+
+
+def test_background_flush_on_size_and_time():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = LogWriter(tmp, batch_size=10, flush_interval=60)
+        for i in range(10):
+            writer.write(entry(i))
+        deadline = time.time() + 5
+        while writer.pending() and time.time() < deadline:
+            time.sleep(0.01)
+        assert writer.pending() == 0  # Batch size reached: flushed without waiting a minute
+
+        timed = LogWriter(tmp, batch_size=1000, flush_interval=0.05)
+        timed.write(entry(99, day='2026-10-17'))
+        time.sleep(0.3)
+        assert read_entries(os.path.join(tmp, log_file_name('2026-10-17')))[0]['session_id'] == 's99'
+
+        # Entries go to the file of their own day
+        assert len(read_entries(os.path.join(tmp, log_file_name('2026-10-16')))) == 10
+        writer.close()
+        timed.close()
+    print("✓ Background thread flushes on batch size and interval")
+
+
+def test_flush_on_exit_and_sync_policy():
+    with tempfile.TemporaryDirectory() as tmp:
+        code = (
+            f"import sys; sys.path.insert(0, {API_DIR!r}); from log_writer import LogWriter; "
+            f"w = LogWriter({tmp!r}, batch_size=1000, flush_interval=60); "
+            "[w.write({'timestamp': '2026-10-16T00:00:00', 'n': i}) for i in range(25)]"
+        )
+        subprocess.run([sys.executable, '-c', code], check=True)
+        assert len(read_entries(os.path.join(tmp, log_file_name('2026-10-16')))) == 25
+
+        sync = LogWriter(tmp, durability='sync')
+        sync.write(entry(1, day='2026-10-18'))
+        assert sync.pending() == 0 and read_entries(os.path.join(tmp, log_file_name('2026-10-18')))
+
+        try:
+            LogWriter(tmp, durability='sometimes')
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    print("✓ Pending entries are flushed at exit; 'sync' writes before returning")
+
+
+def test_concurrent_processes_keep_lines_whole():
+    """Lines far larger than PIPE_BUF from 4 processes, no corruption"""
+    processes, per_process, size = 4, 150, 50000
+    with tempfile.TemporaryDirectory() as tmp:
+        code = (
+            f"import sys; sys.path.insert(0, {API_DIR!r}); from log_writer import LogWriter; "
+            f"w = LogWriter({tmp!r}, batch_size=7, flush_interval=0.01); "
+            f"[w.write({{'timestamp': '2026-10-16T00:00:00', 'p': sys.argv[1], 'n': i, 'text': sys.argv[1] * {size}}}) "
+            f"for i in range({per_process})]; w.close()"
+        )
+        workers = [subprocess.Popen([sys.executable, '-c', code, str(p)]) for p in range(processes)]
+        assert all(worker.wait() == 0 for worker in workers)
+
+        entries = read_entries(os.path.join(tmp, log_file_name('2026-10-16')))
+        assert len(entries) == processes * per_process
+        assert all(e['text'] == e['p'] * size for e in entries)
+        for p in range(processes):
+            assert [e['n'] for e in entries if e['p'] == str(p)] == list(range(per_process))
+    print(f"✓ {processes * per_process} lines of {size // 1000} KB from {processes} processes, all intact")
+
+
+def test_write_serializes_the_entry():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = LogWriter(tmp, batch_size=1000, flush_interval=60)
+        logged = entry(0)
+        writer.write(logged)
+        logged['assistant_response'] = 'changed after write()'
+        try:
+            writer.write(dict(entry(1), usage=object()))
+            assert False, "expected TypeError"
+        except TypeError:
+            pass
+        writer.write(entry(2))
+
+        assert writer.flush() == 2
+        entries = read_entries(os.path.join(tmp, log_file_name('2026-10-16')))
+        assert [e['session_id'] for e in entries] == ['s0', 's2']
+        assert entries[0]['assistant_response'] == 'x' * 10
+        writer.close()
+    print("✓ write() snapshots the entry and rejects unserializable ones")
+
+
+def test_failed_flush_keeps_entries():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = LogWriter(tmp, batch_size=1000, flush_interval=60, max_pending=5)
+        writer.log_dir = os.path.join(tmp, 'blocked')
+        open(writer.log_dir, 'w').close()  # A file where the directory should be
+        for i in range(3):
+            writer.write(entry(i))
+        assert writer.flush() == 0 and writer.pending() == 3
+
+        for i in range(3, 6):
+            writer.write(entry(i))
+        assert writer.pending() == 5 and writer.dropped == 1  # Bounded memory, oldest dropped
+
+        writer.log_dir = tmp
+        assert writer.flush() == 5
+        assert [e['session_id'] for e in read_entries(os.path.join(tmp, log_file_name('2026-10-16')))] == \
+            ['s1', 's2', 's3', 's4', 's5']
+        writer.close()
+    print("✓ Entries survive a failed flush (bounded)")
+
+
+if __name__ == '__main__':
+    test_write_is_buffered()
+    test_background_flush_on_size_and_time()
+    test_flush_on_exit_and_sync_policy()
+    test_concurrent_processes_keep_lines_whole()
+    test_write_serializes_the_entry()
+    test_failed_flush_keeps_entries()
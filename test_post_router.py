@@ -0,0 +1,118 @@
+"""
+Test the local fast path for post list / ranking questions
+Structured questions are answered from the post table in the mandated
+format without calling Claude; open-ended ones fall through.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from post_router import format_post, get_post_router
+from test_streaming import make_handler, parse_events
+
+ROUTED = [
+    'lista de posts',
+    '¿Cuál post generó más interés?',
+    'posts de @mynoralfonsodelar',
+    'muéstrame los 3 posts con más vistas',
+    'Which post generated the most interest?',
+    'posts aprobatorios',
+    'top 5 videos',
+    'posts desaprobatorios de @congreso.guate',
+    'los 3 videos menos vistos'
+]
+FALL_THROUGH = [
+    'hola',
+    '¿qué dicen los comentarios del post con más interés?',
+    '¿por qué el post más interesante tuvo tanto interés?',
+    'cuántos comentarios negativos hay sobre salud',
+    'analiza el sentimiento de los posts aprobatorios',
+    'resumen de los temas de los videos',
+    # Topical or filtered post questions: the post table can't answer them
+    'muestra los posts sobre corrupción',
+    'dame los videos sobre salud y educación',
+    '¿Cuáles videos critican el presupuesto de salud?',
+    'ver posts negativos',
+    'top 5 videos de transporte',
+    'lista de posts que mencionan al congreso'
+]
+
+
+def test_classification():
+    router = get_post_router()
+    for message in ROUTED:
+        assert router.classify(message) is not None, message
+    for message in FALL_THROUGH:
+        assert router.classify(message) is None, message
+    print(f"✓ {len(ROUTED)} routed, {len(FALL_THROUGH)} sent to the model")
+
+
+def test_answers_follow_mandated_format():
+    router = get_post_router()
+    posts = router.posts
+
+    full_list = router.route('lista de posts')
+    assert full_list.count('🔗 https://www.tiktok.com/@') == len(posts) == 20
+    assert full_list.count('(as of ') == 20 and full_list.count('Stance: ') == 20
+
+    top = router.route('¿Cuál post generó más interés?')
+    best = max(posts, key=lambda p: p['interest_index'])
+    assert top.count('[Rank #') == 1 and format_post(best) in top
+    assert '[Rank #1]' in top and f"Interest Index: {best['interest_index']:.2f}" in top
+
+    by_views = router.route('muéstrame los 3 posts con más vistas')
+    expected = sorted(posts, key=lambda p: p['views'], reverse=True)[:3]
+    assert [by_views.index(p['url']) for p in expected] == sorted(by_views.index(p['url']) for p in expected)
+    assert by_views.count('[Rank #') == 3
+
+    account = router.route('posts de @mynoralfonsodelar')
+    own = [p for p in posts if p['username'] == '@mynoralfonsodelar']
+    assert account.count('[Rank #') == len(own) and '@congreso.guate' not in account
+
+    approving = router.route('posts aprobatorios')
+    assert 'Stance: Disapproving' not in approving and 'Stance: Approving' in approving
+    assert router.route('Which post generated the most interest?').startswith('1 post, ranked by')
+    print("✓ Local answers use the link/metadata format")
+
+
+def test_routing_is_fast():
+    router = get_post_router()
+    started = time.perf_counter()
+    for _ in range(20):
+        for message in ROUTED + FALL_THROUGH:
+            router.route(message)
+    per_message_ms = (time.perf_counter() - started) * 1000 / (20 * len(ROUTED + FALL_THROUGH))
+    assert per_message_ms < 5
+    print(f"✓ {per_message_ms:.3f} ms per message")
+
+
+def test_handler_answers_without_the_model():
+    def no_model():
+        raise AssertionError("the model must not be called")
+
+    h = make_handler({'message': 'lista de posts', 'session_id': 's'})
+    h._get_client = no_model
+    h.do_POST()
+    payload = json.loads(h.wfile.getvalue().split(b'\r\n\r\n', 1)[1])
+    assert payload['cache'] == 'local' and payload['response'].count('[Rank #') == 20
+    assert h.logged[0]['assistant_response'] == payload['response']
+
+    h = make_handler({'message': 'top 5 videos', 'stream': True}, accept='text/event-stream')
+    h._get_client = no_model
+    h.do_POST()
+    events = parse_events(h.wfile.getvalue())
+    assert [name for name, _ in events] == ['delta', 'done']
+    assert events[0][1]['text'] == events[1][1]['response']
+    assert events[1][1]['response'].count('[Rank #') == 5
+    print("✓ Handler answers post questions locally (JSON and SSE)")
+
+
+if __name__ == '__main__':
+    test_classification()
+    test_answers_follow_mandated_format()
+    test_routing_is_fast()
+    test_handler_answers_without_the_model()
@@ -0,0 +1,121 @@
+"""
+Test the verbatim-quote verifier
+Real quotes pass untouched, near-misses are repaired to the original text and
+invented quotes are marked, in both JSON and streamed responses.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from quote_verifier import (
+    FABRICATED_MARK, STRIPPED_TEXT, QuoteStreamFilter, QuoteVerifier, WordAutomaton, get_quote_verifier
+)
+from test_streaming import FakeClient, make_handler, parse_events
+
+TEXTS = [
+    'descarado ladron, ni un km de carretera, más inseguridad',
+    'Y LAS CARRETERAS ??? DESTRUIDAS, PUENTES, EL PUERTO QUETZAL UNA SOLA GRUA DE 5 QUE SON. ..... Nadie cree eso',
+    'puro robo todo se lo roban',
+    'q verguenza d congreso'
+]
+INVENTED = 'Se roban todo y nadie hace nada'
+
+
+def test_automaton_finds_all_patterns():
+    automaton = WordAutomaton([(0, ['a', 'b']), (1, ['b', 'c']), (2, ['b'])])
+    assert sorted(automaton.find(['a', 'b', 'c'])) == [(0, 0, 2), (1, 1, 3), (2, 1, 2)]
+    assert automaton.find(['c', 'a']) == []
+    print("✓ Aho-Corasick matches overlapping patterns")
+
+
+def test_statuses():
+    verifier = QuoteVerifier(TEXTS)
+    assert verifier.check(TEXTS[0])['status'] == 'exact'
+    assert verifier.check('Y LAS CARRETERAS ??? DESTRUIDAS ... Nadie cree eso')['status'] == 'excerpt'
+    assert verifier.check('Descarado ladrón, ni un km de carretera, más inseguridad.')['status'] == 'repaired'
+    assert verifier.check('Que vergüenza de congreso')['status'] == 'repaired'  # Slang and accents normalized
+    assert verifier.check('todo se lo roban')['status'] == 'excerpt'
+    assert verifier.check('Todo se lo roban!')['status'] == 'repaired'
+    assert verifier.check('robo')['status'] == 'fabricated'  # Too short to prove anything
+    assert verifier.check(INVENTED)['status'] == 'fabricated'
+    print("✓ Exact, excerpt, repaired and fabricated quotes")
+
+
+def test_verify_rewrites_answer():
+    answer = (
+        'Ejemplos:\n'
+        f'[NEGATIVE] "{TEXTS[0]}"\n'
+        '[NEGATIVE] "Puro robo, todo se lo roban"\n'
+        f'[NEGATIVE] “{INVENTED}”\n'
+    )
+    fixed, report = QuoteVerifier(TEXTS).verify(answer)
+    assert [r['status'] for r in report] == ['exact', 'repaired', 'fabricated']
+    assert f'[NEGATIVE] "{TEXTS[0]}"' in fixed
+    assert '[NEGATIVE] "puro robo todo se lo roban"' in fixed
+    assert f'[NEGATIVE] “{INVENTED}”{FABRICATED_MARK}' in fixed
+
+    stripped, _ = QuoteVerifier(TEXTS, policy='strip').verify(answer)
+    assert INVENTED not in stripped and STRIPPED_TEXT in stripped
+
+    marked, _ = QuoteVerifier(TEXTS, policy='mark').verify(answer)
+    assert '"Puro robo, todo se lo roban"' + FABRICATED_MARK in marked
+
+    assert QuoteVerifier(TEXTS, policy='off').verify(answer) == (answer, [])
+    print("✓ Policies repair, mark and strip quotes")
+
+
+def test_stream_filter_matches_verify():
+    """Any chunking gives the same text as verifying the whole answer"""
+    verifier = QuoteVerifier(TEXTS)
+    answer = f'Mira [NEGATIVE] "Puro robo, todo se lo roban" y [POSITIVE] "{INVENTED}" [nota] fin'
+    expected, _ = verifier.verify(answer)
+    for size in (1, 3, 7, len(answer)):
+        quotes = QuoteStreamFilter(verifier)
+        out = ''.join(quotes.feed(answer[i:i + size]) for i in range(0, len(answer), size)) + quotes.flush()
+        assert out == expected, size
+        assert len(quotes.report) == 2
+
+    quotes = QuoteStreamFilter(verifier)
+    assert quotes.feed('Texto [NEGATIVE] "sin cerrar') == 'Texto '
+    assert quotes.flush() == '[NEGATIVE] "sin cerrar'
+    print("✓ Streamed quotes are held back until verified")
+
+
+def test_dataset_index():
+    verifier = get_quote_verifier()
+    assert len(verifier.texts) > 1000
+    first = verifier.texts[0]
+    assert verifier.check(first)['status'] == 'exact'
+    assert verifier.check(first.upper() + '!!')['status'] in ('repaired', 'exact')
+    print(f"✓ Index over {len(verifier.texts)} comments ({len(verifier.automaton)} automaton states)")
+
+
+def test_handler_repairs_streamed_quotes():
+    verifier = get_quote_verifier()
+    original = next(text for text in verifier.texts if len(text.split()) >= 4 and '"' not in text)
+    chunks = ['Ejemplo:\n[NEGATIVE] "', original.upper()[:5], original.upper()[5:] + '."\n', f'[NEGATIVE] "{INVENTED}"']
+
+    h = make_handler({'message': 'ejemplos', 'stream': True}, accept='text/event-stream')
+    h._get_client = lambda: FakeClient(chunks)
+    h.do_POST()
+
+    events = parse_events(h.wfile.getvalue())
+    streamed = ''.join(data['text'] for name, data in events if name == 'delta')
+    done = [data for name, data in events if name == 'done'][0]
+    assert f'[NEGATIVE] "{original}"' in streamed
+    assert original.upper() not in streamed or original.upper() == original
+    assert FABRICATED_MARK in streamed
+    assert done['response'] == streamed
+    assert [r['status'] for r in h._quote_report] == ['repaired', 'fabricated']
+    print("✓ Handler repairs quotes before they are streamed")
+
+
+if __name__ == '__main__':
+    test_automaton_finds_all_patterns()
+    test_statuses()
+    test_verify_rewrites_answer()
+    test_stream_filter_matches_verify()
+    test_dataset_index()
+    test_handler_repairs_streamed_quotes()
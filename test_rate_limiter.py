@@ -0,0 +1,183 @@
+"""
+Test the shared token-bucket scheduler
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from rate_limiter import TokenBucketScheduler, RateLimitExceeded
+import rate_limiter
+
+
+def make_scheduler(tmp, **kwargs):
+    params = {'input_tpm': 6000, 'output_tpm': 600, 'max_wait': 1.0}
+    params.update(kwargs)
+    return TokenBucketScheduler(db_path=os.path.join(tmp, 'bucket.sqlite'), **params)
+
+
+def test_admits_until_budget_is_used():
+    """Requests are admitted while tokens remain, then rejected with Retry-After"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = make_scheduler(tmp)
+        scheduler.acquire(5000, 100)
+
+        try:
+            scheduler.acquire(5000, 100)
+            assert False, "expected RateLimitExceeded"
+        except RateLimitExceeded as e:
+            # 4,000 missing tokens at 100 tokens/s
+            assert e.status == 429
+            assert 35 <= e.retry_after <= 41
+
+
+def test_waits_within_deadline():
+    """A request that fits soon waits instead of failing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = make_scheduler(tmp, max_wait=3.0)
+        scheduler.acquire(6000, 10)
+
+        start = time.time()
+        reservation = scheduler.acquire(100, 10)  # ~1s of refill
+        assert 0.5 < time.time() - start < 3.0
+        assert reservation.waited > 0.5
+
+
+def test_bucket_shared_between_workers():
+    """Two schedulers on one database share the same budget"""
+    with tempfile.TemporaryDirectory() as tmp:
+        worker_a = make_scheduler(tmp)
+        worker_b = make_scheduler(tmp)
+        worker_a.acquire(5500, 10)
+        assert worker_b.try_acquire(5500, 10) > 0
+
+
+def test_reconcile_returns_unused_tokens():
+    """Real usage lower than the estimate gives tokens back"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = make_scheduler(tmp)
+        reservation = scheduler.acquire(5000, 500)
+        assert scheduler.try_acquire(5000, 10) > 0
+
+        scheduler.reconcile(reservation, {'input_tokens': 500, 'output_tokens': 50})
+        assert scheduler.try_acquire(5000, 10) == 0
+
+
+def test_over_capacity_release_refunds_what_was_taken():
+    """A request above capacity takes a full bucket, and release() gives back only that"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scheduler = make_scheduler(tmp)
+        other = make_scheduler(tmp)  # Another worker sharing the bucket
+        reservation = scheduler.acquire(50000, 5000)
+        assert (reservation.input_tokens, reservation.output_tokens) == (6000, 600)
+
+        # Meanwhile the other worker's call used 2,000 input tokens more than it reserved
+        other.reconcile(rate_limiter.Reservation(0, 0, 0.0), {'input_tokens': 2000})
+        scheduler.release(reservation)
+        assert 4000 <= scheduler.available()['input'] < 4100  # Not refilled to 6,000
+    print("✓ Over-capacity reservation refunds only the tokens it debited")
+
+
+def test_handler_answers_429_with_retry_after():
+    """The chat handler rejects with 429 + Retry-After instead of a canned answer"""
+    import chat
+    from test_streaming import make_handler
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_scheduler, old_enabled, old_cache = rate_limiter._scheduler, chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED
+        rate_limiter._scheduler = make_scheduler(tmp, max_wait=0.5)
+        rate_limiter._scheduler.drain()
+        chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED = True, False
+        try:
+            h = make_handler({'message': '¿qué opinan de la salud?', 'session_id': 's'})
+            h._generate_response = lambda *args: ('no deberia llamarse', {})
+            h.do_POST()
+        finally:
+            rate_limiter._scheduler, chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED = old_scheduler, old_enabled, old_cache
+
+    head, body = h.wfile.getvalue().split(b'\r\n\r\n', 1)
+    assert b' 429 ' in head.split(b'\r\n')[0]
+    assert b'Retry-After: ' in head
+    data = json.loads(body)
+    assert data['error'] == 'rate_limited'
+    assert data['retry_after'] >= 1
+
+
+
+class FailingClient:
+    """Anthropic client stand-in whose calls raise the given error"""
+
+    def __init__(self, error):
+        self.messages = self
+        self.error = error
+
+    def create(self, **kwargs):
+        raise self.error
+
+
+def run_chat_with_failing_upstream(tmp, error, rate_limit_error):
+    """Non-stream chat request whose upstream call raises; returns (handler, scheduler)"""
+    import chat
+    from test_streaming import make_handler
+
+    saved = (rate_limiter._scheduler, chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED, chat.is_rate_limit_error)
+    scheduler = rate_limiter._scheduler = make_scheduler(tmp, input_tpm=500000, output_tpm=100000)
+    chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED = True, False
+    chat.is_rate_limit_error = lambda e: rate_limit_error
+    try:
+        h = make_handler({'message': '¿qué opinan de la salud?', 'session_id': 's'})
+        h._get_client = lambda: FailingClient(error)
+        h._retry_after = lambda e: 30
+        h.do_POST()
+    finally:
+        rate_limiter._scheduler, chat.RATE_LIMIT_ENABLED, chat.CACHE_ENABLED, chat.is_rate_limit_error = saved
+    return h, scheduler
+
+
+def test_upstream_429_answers_503_json():
+    """An upstream 429 in JSON mode is a 503 with Retry-After and a JSON body (never SSE)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        h, scheduler = run_chat_with_failing_upstream(tmp, RuntimeError('429 Too Many Requests'), True)
+        levels = scheduler.available()
+
+    head, body = h.wfile.getvalue().split(b'\r\n\r\n', 1)
+    assert b' 503 ' in head.split(b'\r\n')[0]
+    assert b'Retry-After: 30' in head
+    assert b'application/json' in head and b'event:' not in body
+    data = json.loads(body)
+    assert data['error'] == 'rate_limited' and data['retry_after'] == 30
+    assert levels['input'] < 1000  # Drained (a few ms of refill), not refunded
+    print("✓ Upstream 429 -> 503 JSON with Retry-After")
+
+
+def test_failed_call_releases_reservation():
+    """A call that failed without usage gives its reserved tokens back"""
+    with tempfile.TemporaryDirectory() as tmp:
+        h, scheduler = run_chat_with_failing_upstream(tmp, RuntimeError('connection reset'), False)
+        levels = scheduler.available()
+
+    head, body = h.wfile.getvalue().split(b'\r\n\r\n', 1)
+    assert b' 200 ' in head.split(b'\r\n')[0]
+    assert json.loads(body)['response']
+    assert levels['input'] > scheduler.capacity['input'] - 1000
+    assert levels['output'] > scheduler.capacity['output'] - 1000
+    print("✓ Failed upstream call released its reservation")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING TOKEN BUCKET SCHEDULER")
+    print("="*80)
+    test_admits_until_budget_is_used()
+    test_waits_within_deadline()
+    test_bucket_shared_between_workers()
+    test_reconcile_returns_unused_tokens()
+    test_over_capacity_release_refunds_what_was_taken()
+    test_handler_answers_429_with_retry_after()
+    test_upstream_429_answers_503_json()
+    test_failed_call_releases_reservation()
+    print("\n✅ RATE LIMITER TESTS PASSED")
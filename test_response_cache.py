@@ -0,0 +1,79 @@
+"""
+Test the response cache (LRU + TTL + disk layer)
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from response_cache import ResponseCache, make_request_key, normalize_query
+
+
+def test_normalized_query_keys():
+    """Case, accents, punctuation and spacing do not change the key"""
+    a = make_request_key("¿Qué piensa la gente sobre salud?", [], 'v1')
+    b = make_request_key("que piensa   la gente sobre SALUD", [], 'v1')
+    assert a == b
+    assert normalize_query("¿Qué  PIENSA?") == "que piensa"
+
+    # History and version are part of the key
+    assert a != make_request_key("que piensa la gente sobre salud", [{'role': 'user', 'content': 'hola'}], 'v1')
+    assert a != make_request_key("que piensa la gente sobre salud", [], 'v2')
+
+
+def test_memory_lru_and_ttl():
+    """Least recently used entries are evicted, expired entries are misses"""
+    cache = ResponseCache(cache_dir=None, max_entries=2, ttl_seconds=0.2)
+    cache.set('a', {'response': 'A'})
+    cache.set('b', {'response': 'B'})
+    assert cache.get('a')['response'] == 'A'  # 'a' becomes most recent
+    cache.set('c', {'response': 'C'})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+    time.sleep(0.25)
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 2
+
+
+def test_disk_layer_survives_restart_and_evicts_by_size():
+    """A new cache instance reads entries written by a previous one"""
+    with tempfile.TemporaryDirectory() as tmp:
+        first = ResponseCache(cache_dir=tmp)
+        first.set('k1', {'response': 'respuesta guardada'})
+
+        second = ResponseCache(cache_dir=tmp)
+        assert second.get('k1')['response'] == 'respuesta guardada'
+
+        small = ResponseCache(cache_dir=tmp, max_disk_bytes=400)
+        for i in range(10):
+            small.set(f"key{i}", {'response': 'x' * 100})
+        total = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        assert total <= 400
+        assert os.path.exists(os.path.join(tmp, 'key9.json'))
+
+
+def test_disk_promotion_keeps_original_expiry():
+    """An entry read back from disk expires when it was written + TTL, not later"""
+    with tempfile.TemporaryDirectory() as tmp:
+        ResponseCache(cache_dir=tmp, ttl_seconds=0.3).set('k', {'response': 'vieja'})
+        time.sleep(0.2)
+
+        restarted = ResponseCache(cache_dir=tmp, ttl_seconds=0.3)
+        assert restarted.get('k')['response'] == 'vieja'  # Promoted to memory
+        time.sleep(0.15)
+        assert restarted.get('k') is None  # 0.35 s after it was written
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING RESPONSE CACHE")
+    print("="*80)
+    test_normalized_query_keys()
+    test_memory_lru_and_ttl()
+    test_disk_layer_survives_restart_and_evicts_by_size()
+    test_disk_promotion_keeps_original_expiry()
+    print("\n✅ RESPONSE CACHE TESTS PASSED")
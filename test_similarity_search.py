@@ -0,0 +1,104 @@
+"""
+Test TF-IDF / LSA similarity search
+Vectorized scores match a straightforward cosine computation, the saved
+index round-trips, and the smart filter falls back to it.
+"""
+
+import math
+import os
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from similarity_search import TfidfIndex, get_similarity_index
+from smart_filter import SmartFilter
+from text_normalizer import tokenize
+
+TEXTS = [
+    'las carreteras estan destruidas',
+    'arreglen los puentes y las carreteras',
+    'los hospitales no tienen medicinas',
+    'falta medicina en el hospital de salud',
+    'puro robo de los diputados',
+    'diputados corruptos se suben el sueldo'
+]
+
+
+def reference_scores(texts, query):
+    """Plain-Python sublinear TF-IDF cosine"""
+    documents = [Counter(tokenize(text)) for text in texts]
+    df = Counter(term for counts in documents for term in counts)
+    n = len(documents)
+
+    def vector(counts):
+        values = {t: (1 + math.log(c)) * (math.log((1 + n) / (1 + df[t])) + 1) for t, c in counts.items() if t in df}
+        norm = math.sqrt(sum(v * v for v in values.values())) or 1.0
+        return {t: v / norm for t, v in values.items()}
+
+    q = vector(Counter(tokenize(query)))
+    return [sum(q.get(t, 0.0) * v for t, v in vector(counts).items()) for counts in documents]
+
+
+def test_sparse_scores_match_reference():
+    index = TfidfIndex.build(TEXTS)
+    for query in ('carreteras puentes', 'medicinas hospital', 'diputados sueldo robo'):
+        expected = reference_scores(TEXTS, query)
+        actual = index.scores([query], mode='sparse')[0]
+        assert all(abs(a - e) < 1e-5 for a, e in zip(actual, expected)), query
+    assert index.search('carreteras puentes', k=2, mode='sparse')[0][0] == 1
+    assert index.search('xyzzy') == []
+    print("✓ Sparse cosine scores match the reference")
+
+
+def test_batch_equals_single():
+    index = TfidfIndex.build(TEXTS, lsa_components=3)
+    queries = ['carreteras', 'hospital medicinas', 'diputados']
+    for mode in ('sparse', 'lsa'):
+        batch = index.search_batch(queries, k=3, mode=mode)
+        assert batch == [index.search(q, k=3, mode=mode) for q in queries]
+    similar = index.similar_to(TEXTS[2], k=2, mode='sparse', comment_id=2)
+    assert 2 not in [i for i, _ in similar] and similar[0][0] == 3
+    print("✓ Batched queries equal single queries")
+
+
+def test_lsa_groups_related_comments():
+    index = TfidfIndex.build(TEXTS, lsa_components=3)
+    assert index.has_lsa and index.embeddings.shape == (len(TEXTS), 3)
+    top = [i for i, _ in index.search('hospital', k=2, mode='lsa')]
+    assert set(top) == {2, 3}  # "hospitales" has no exact token overlap with comment 2
+    print("✓ LSA finds related comments")
+
+
+def test_save_and_load():
+    index = TfidfIndex.build(TEXTS, lsa_components=3, data_hash='hash')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tfidf_index.npz')
+        index.save(path)
+        loaded = TfidfIndex.load(path, 'hash')
+        assert TfidfIndex.load(path, 'other-hash') is None
+        assert TfidfIndex.load(os.path.join(tmp, 'missing.npz')) is None
+    for mode in ('sparse', 'lsa'):
+        assert loaded.search('carreteras', mode=mode) == index.search('carreteras', mode=mode)
+    print("✓ Index round-trips through .npz")
+
+
+def test_dataset_index_and_fallback():
+    index = get_similarity_index()
+    assert index.n_docs > 1000
+    assert index.search('carreteras destruidas puentes', k=5)
+
+    smart_filter = SmartFilter([{'text': t, 'sentiment': 'negative'} for t in TEXTS], topics={},
+                               similarity_index=TfidfIndex.build(TEXTS, lsa_components=3))
+    assert smart_filter.filter('carreteras')['method'] == 'bm25'
+    assert smart_filter.filter('xyzzy')['method'] == 'similarity'
+    print(f"✓ Dataset index over {index.n_docs:,} comments ({'LSA' if index.has_lsa else 'sparse'})")
+
+
+if __name__ == '__main__':
+    test_sparse_scores_match_reference()
+    test_batch_equals_single()
+    test_lsa_groups_related_comments()
+    test_save_and_load()
+    test_dataset_index_and_fallback()
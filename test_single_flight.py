@@ -0,0 +1,158 @@
+"""
+Test single-flight coalescing of identical concurrent chat requests
+Uses a fake upstream that counts calls; requests run on real threads.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import chat
+from single_flight import SingleFlight
+from test_streaming import FakeClient, make_handler, parse_events
+
+CONCURRENCY = 8
+UPSTREAM_SECONDS = 0.5
+
+
+def run_concurrently(handlers):
+    barrier = threading.Barrier(len(handlers))
+
+    def run(h):
+        barrier.wait()
+        h.do_POST()
+
+    threads = [threading.Thread(target=run, args=(h,)) for h in handlers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+
+
+def warm_up():
+    """Load dataset and indexes once so every thread reaches the upstream call quickly"""
+    h = make_handler({'message': 'warm up', 'session_id': 'warm'})
+    h._generate_response = lambda *args: ('ok', {})
+    h.do_POST()
+
+
+def test_single_flight_runs_once():
+    """N concurrent callers, one execution, everyone gets the result"""
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'answer': 42}
+
+    results = []
+    barrier = threading.Barrier(CONCURRENCY)
+
+    def run():
+        barrier.wait()
+        results.append(flight.do('same-key', work))
+
+    threads = [threading.Thread(target=run) for _ in range(CONCURRENCY)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(result == {'answer': 42} for result, _ in results)
+    assert sum(shared for _, shared in results) == CONCURRENCY - 1
+    assert flight.stats()['in_flight'] == 0
+    print(f"✓ {CONCURRENCY} callers, 1 execution")
+
+
+def test_followers_retry_when_leader_fails():
+    """A failed leader doesn't hand its error to followers"""
+    flight = SingleFlight()
+    call, leader = flight.join('k')
+    assert leader
+    follower, is_leader = flight.join('k')
+    assert not is_leader and follower is call
+
+    flight.finish(call, error=RuntimeError('boom'))
+    assert follower.wait(1) is None
+    assert flight.join('k')[1]  # Next request leads again
+    print("✓ Leader failure releases followers")
+
+
+def test_handler_coalesces_identical_requests():
+    """Identical concurrent JSON requests share one upstream call but log separately"""
+    warm_up()
+    upstream_calls = []
+
+    def fake_generate(system_prompt, full_context, user_prompt):
+        upstream_calls.append(user_prompt)
+        time.sleep(UPSTREAM_SECONDS)
+        return 'La mayoría es negativa.', {'input_tokens': 100, 'output_tokens': 50,
+                                           'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 40000}
+
+    handlers = []
+    for i in range(CONCURRENCY):
+        h = make_handler({'message': '¿Qué piensa la gente del presupuesto?', 'session_id': f'class-{i}'})
+        h._generate_response = fake_generate
+        handlers.append(h)
+
+    run_concurrently(handlers)
+
+    bodies = [json.loads(h.wfile.getvalue().split(b'\r\n\r\n', 1)[1]) for h in handlers]
+    assert len(upstream_calls) == 1
+    assert all(b['response'] == 'La mayoría es negativa.' for b in bodies)
+    assert sorted(b['cache'] for b in bodies) == ['coalesced'] * (CONCURRENCY - 1) + ['miss']
+
+    logged = [entry for h in handlers for entry in h.logged]
+    assert len(logged) == CONCURRENCY
+    assert sum(1 for entry in logged if entry['coalesced']) == CONCURRENCY - 1
+    assert sum(1 for entry in logged if entry['usage']) == 1  # Tokens counted once
+    print(f"✓ {CONCURRENCY} requests, {len(upstream_calls)} upstream call, {len(logged)} log entries")
+
+
+def test_streaming_followers_replay_answer():
+    """Streaming followers receive the leader's full answer as SSE events"""
+    warm_up()
+    chunks = ['Respuesta ', 'compartida']
+
+    class SlowClient(FakeClient):
+        opened = []
+
+        def stream(self, **params):
+            SlowClient.opened.append(1)
+            time.sleep(UPSTREAM_SECONDS)
+            return super().stream(**params)
+
+    handlers = []
+    for i in range(4):
+        h = make_handler({'message': 'resumen general', 'stream': True, 'session_id': f'sse-{i}'})
+        h._get_client = lambda: SlowClient(chunks)
+        handlers.append(h)
+
+    run_concurrently(handlers)
+
+    assert len(SlowClient.opened) == 1
+    for h in handlers:
+        done = parse_events(h.wfile.getvalue())[-1]
+        assert done[0] == 'done' and done[1]['response'] == ''.join(chunks)
+    print("✓ Streaming followers replayed the shared answer")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING SINGLE-FLIGHT COALESCING")
+    print("="*80)
+
+    test_single_flight_runs_once()
+    test_followers_retry_when_leader_fails()
+    test_handler_coalesces_identical_requests()
+    test_streaming_followers_replay_answer()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)
@@ -0,0 +1,122 @@
+"""
+Test the BM25 smart filter against the topic counts in sentiment_by_topic.json
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+from analytics_engine import AnalyticsEngine, get_analytics_engine
+from smart_filter import get_smart_filter, SmartFilter
+from text_normalizer import normalize_text, tokenize
+
+
+def test_normalization_handles_slang_and_accents():
+    """Slang, accents and plurals are normalized the same way"""
+    assert normalize_text("Q corrupción x favor") == "que corrupcion por favor"
+    assert tokenize("Las CARRETERAS") == tokenize("carretera")
+    assert tokenize("govierno corruto") == ["gobierno", "corrupto"]
+
+
+def test_salud_counts_match_topic_analysis():
+    """Topic queries count the offline topic analysis' comments minus its 'saludo' substring hits"""
+    path = os.path.join(os.path.dirname(__file__), 'data', 'sentiment', 'sentiment_by_topic.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        expected = json.load(f)['salud']
+
+    sf = get_smart_filter()
+    result = sf.filter("Dame ejemplos de comentarios sobre salud")
+    assert result['topics'] == ['salud']
+    assert 0 < result['total'] <= expected['total']
+    assert result['counts']['negative'] <= expected['negative']
+    salud_terms = {term for kw in sf.topics['salud'] for term in sf._expand(kw)}
+    assert 'saludo' not in salud_terms
+    assert all(set(tokenize(comment['text'])) & salud_terms for comment, _ in result['examples'])
+
+
+def test_topic_counts_match_analytics_engine():
+    """BM25 and the analytics engine count the same comments per topic"""
+    sf = get_smart_filter()
+    engine = get_analytics_engine()
+    # Topics where substring matching used to disagree with BM25 (e.g. 'renta' in 'parentesis')
+    queries = {
+        'empleo': 'empleo', 'corrupcion': 'corrupción', 'vivienda': 'vivienda',
+        'pobreza': 'pobreza', 'canasta_basica': 'el precio de la comida', 'salud': 'salud'
+    }
+    for topic, words in queries.items():
+        result = sf.filter(f"¿Qué dicen sobre {words}?")
+        assert result['topics'] == [topic], (topic, result['topics'])
+        assert result['total'] == engine.query(topic=topic)['count'], topic
+
+    comments = [
+        {'text': 'abuso de autoridad', 'sentiment': 'negative'},
+        {'text': 'entre parentesis', 'sentiment': 'neutral'},
+        {'text': 'los buses no pasan', 'sentiment': 'negative'},
+        {'text': 'renta muy cara', 'sentiment': 'negative'},
+    ]
+    topics = {'transporte': ['bus'], 'vivienda': ['renta']}
+    sf = SmartFilter(comments=comments, topics=topics)
+    engine = AnalyticsEngine(comments=comments, posts=[])
+    for topic in topics:
+        assert sf.filter(topic)['total'] == engine.query(topic=topic)['count'] == 1, topic
+
+
+def test_topic_queries_skip_words_that_only_start_like_keywords():
+    """A transporte query doesn't retrieve 'busco', a vivienda query doesn't retrieve 'casaquero'"""
+    comments = [
+        {'text': 'busco trabajo y no hay', 'sentiment': 'negative'},
+        {'text': 'ese casaquero otra vez', 'sentiment': 'negative'},
+        {'text': 'los buses no pasan', 'sentiment': 'negative'},
+        {'text': 'el transporte es un desastre', 'sentiment': 'negative'},
+        {'text': 'la casa y la renta subieron', 'sentiment': 'negative'},
+    ]
+    topics = {'transporte': ['bus', 'transporte'], 'vivienda': ['casa', 'renta', 'vivienda']}
+    sf = SmartFilter(comments=comments, topics=topics)
+
+    result = sf.filter("¿Qué dicen del transporte?")
+    assert {c['text'] for c, _ in result['examples']} == {comments[2]['text'], comments[3]['text']}
+    assert sf.filter("vivienda")['total'] == 1
+
+    # Same on the real data, where every old transporte match was a "busco/buscan"
+    real = get_smart_filter()
+    texts = [real.comments[doc_id]['text'] for doc_id, _ in real.search("¿Qué dicen del transporte?")]
+    assert not any({'busco', 'buscan', 'buscar'} & set(tokenize(text)) for text in texts)
+
+
+def test_context_format_and_size():
+    """Context has the stats lines the batch test parses and stays small"""
+    context = get_smart_filter().create_context_for_llm("Qué piensa la gente sobre carreteras y transporte?")
+    assert "Total de comentarios relevantes: " in context
+    assert "Negativos: " in context and "Positivos: " in context
+    assert len(context) // 4 < 5000
+
+
+def test_bm25_ranks_direct_matches_first():
+    """Comments with the query word rank above expansion-only matches"""
+    comments = [
+        {'text': 'el robo del siglo', 'sentiment': 'negative'},
+        {'text': 'los hospitales no tienen medicina', 'sentiment': 'negative'},
+        {'text': 'falta medicina en el hospital', 'sentiment': 'negative'},
+        {'text': 'q buena noticia', 'sentiment': 'positive'},
+    ]
+    topics = {'salud': ['hospital', 'medicina']}
+    sf = SmartFilter(comments=comments, topics=topics)
+
+    result = sf.filter("medicina")
+    assert result['total'] == 2
+    assert {c['text'] for c, _ in result['examples']} == {comments[1]['text'], comments[2]['text']}
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING BM25 SMART FILTER")
+    print("="*80)
+    test_normalization_handles_slang_and_accents()
+    test_salud_counts_match_topic_analysis()
+    test_topic_counts_match_analytics_engine()
+    test_topic_queries_skip_words_that_only_start_like_keywords()
+    test_context_format_and_size()
+    test_bm25_ranks_direct_matches_first()
+    print("\n✅ SMART FILTER TESTS PASSED")
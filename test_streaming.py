@@ -0,0 +1,157 @@
+"""
+Test streaming (SSE) responses from the chat handler
+"""
+
+import io
+import json
+import os
+import sys
+from email.message import Message
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import chat
+from streaming import ChartStreamSplitter
+
+chat.CACHE_ENABLED = False  # Always exercise the upstream path
+chat.RATE_LIMIT_ENABLED = False
+
+
+CHART_JSON = '{"type": "bar", "title": "Test (N=3 comentarios)", "data": {"labels": ["A"], "datasets": [{"label": "x", "data": [3]}]}}'
+
+
+class FakeStream:
+    """Stand-in for client.messages.stream(...)"""
+
+    def __init__(self, chunks):
+        self.text_stream = iter(chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def get_final_message(self):
+        class Usage:
+            input_tokens = 10
+            output_tokens = 20
+            cache_creation_input_tokens = 0
+            cache_read_input_tokens = 4000
+
+        class Final:
+            usage = Usage()
+
+        return Final()
+
+
+class FakeClient:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.messages = self
+
+    def stream(self, **params):
+        return FakeStream(self.chunks)
+
+
+def make_handler(payload, accept='application/json'):
+    """Build a handler instance without a socket"""
+    body = json.dumps(payload).encode()
+    h = chat.handler.__new__(chat.handler)
+    h.rfile = io.BytesIO(body)
+    h.wfile = io.BytesIO()
+    h.headers = Message()
+    h.headers['Content-Length'] = str(len(body))
+    h.headers['Accept'] = accept
+    h.request_version = 'HTTP/1.1'
+    h.requestline = 'POST /api/chat HTTP/1.1'
+    h.command = 'POST'
+    h.client_address = ('127.0.0.1', 0)
+    h._log_conversation = lambda **kwargs: h.__dict__.setdefault('logged', []).append(kwargs)
+    return h
+
+
+def parse_events(raw: bytes):
+    """Parse the SSE body into (event, data) tuples"""
+    body = raw.split(b'\r\n\r\n', 1)[1].decode('utf-8')
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_splitter_text_and_chart():
+    """Chart blocks split across deltas arrive as one chart event"""
+    splitter = ChartStreamSplitter()
+    chunks = ['Hola ', 'mundo [CHA', 'RT_START]\n', CHART_JSON[:30], CHART_JSON[30:], '\n[CHART', '_END] fin']
+
+    events = []
+    for chunk in chunks:
+        events.extend(splitter.feed(chunk))
+    events.extend(splitter.flush())
+
+    text = ''.join(e[1]['text'] for e in events if e[0] == 'delta')
+    charts = [e[1]['chart'] for e in events if e[0] == 'chart']
+
+    assert text == 'Hola mundo  fin'
+    assert len(charts) == 1
+    assert charts[0]['title'] == 'Test (N=3 comentarios)'
+
+
+def test_splitter_invalid_chart_passthrough():
+    """Invalid chart JSON and unterminated charts stay as text"""
+    splitter = ChartStreamSplitter()
+    events = splitter.feed('a[CHART_START]{bad[/CHART_END]b[CHART_START]{"x"')
+    events.extend(splitter.flush())
+
+    text = ''.join(e[1]['text'] for e in events if e[0] == 'delta')
+    assert text == 'a[CHART_START]{bad[/CHART_END]b[CHART_START]{"x"'
+
+
+def test_handler_streams_sse():
+    """stream=true returns text/event-stream with delta, chart and done events"""
+    chunks = ['Resultado: ', '[CHART_START]', CHART_JSON, '[CHART_END]', ' listo']
+    h = make_handler({'message': 'grafica', 'stream': True, 'session_id': 's1'})
+    h._get_client = lambda: FakeClient(chunks)
+    h.do_POST()
+
+    raw = h.wfile.getvalue()
+    assert b'Content-type: text/event-stream' in raw
+
+    events = parse_events(raw)
+    names = [e[0] for e in events]
+    assert names[-1] == 'done'
+    assert 'chart' in names
+
+    done = events[-1][1]
+    assert done['response'] == ''.join(chunks)
+    assert done['usage']['cache_read_input_tokens'] == 4000
+
+    # Logged once, after the stream ended
+    assert len(h.logged) == 1
+    assert h.logged[0]['assistant_response'] == ''.join(chunks)
+
+
+def test_handler_json_contract_unchanged():
+    """Old clients without stream flag still get one JSON object"""
+    h = make_handler({'message': 'hola', 'session_id': 's2'})
+    h._generate_response = lambda *args: ('respuesta', {})
+    h.do_POST()
+
+    raw = h.wfile.getvalue()
+    assert b'Content-type: application/json' in raw
+    data = json.loads(raw.split(b'\r\n\r\n', 1)[1])
+    assert data['response'] == 'respuesta'
+    assert data['session_id'] == 's2'
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING SSE STREAMING")
+    print("="*80)
+    test_splitter_text_and_chart()
+    test_splitter_invalid_chart_passthrough()
+    test_handler_streams_sse()
+    test_handler_json_contract_unchanged()
+    print("\n✅ STREAMING TESTS PASSED")
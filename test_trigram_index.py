@@ -0,0 +1,111 @@
+"""
+Test the typo-tolerant trigram index
+Misspellings, slang and repeated letters find the right words; the build
+artifact round-trips and stale artifacts are rebuilt.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import full_dataset_loader
+from dataset_artifact import ArtifactError
+from full_dataset_loader import FullDatasetLoader
+from smart_filter import SmartFilter
+from text_normalizer import collapse_repeats, fuzzy_key
+from trigram_index import TrigramIndex
+
+TEXTS = [
+    'Puro corrupto este gobierno',
+    'los diputados son unos corruptos',
+    'no ay carreteras',
+    'q verguenza siiii'
+]
+
+
+def test_fuzzy_key():
+    assert collapse_repeats('corrupto') == 'corupto'
+    assert fuzzy_key('corruto') == fuzzy_key('corrrupto') == 'corupto'
+    assert fuzzy_key('govierno') == fuzzy_key('gobierno')
+    assert fuzzy_key('siiii') == 'si'
+    print("✓ Fuzzy keys collapse repeats and expand slang")
+
+
+def test_similar_words():
+    index = TrigramIndex.build(TEXTS)
+    for typo in ('corruto', 'corupto', 'CORRUPTO', 'corrrupto'):
+        assert index.similar(typo)[0] == ('corrupto', 1.0), typo
+    assert index.similar('karreteras')[0][0] == 'carreteras'
+    assert index.similar('xyzzy') == []
+    assert index.similar('dos palabras') == []
+    assert index.search('corruptos') == [0, 1]
+    assert index.comments_with('que') == [3]  # "q" was expanded at index time
+    print("✓ Misspellings find indexed words")
+
+
+def test_artifact_roundtrip():
+    index = TrigramIndex.build(TEXTS)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trigram_index.bin')
+        header = index.write(path, 'hash')
+        mapped = TrigramIndex.load(path, 'hash')
+        assert header['words'] == len(mapped) == len(index)
+        for term in ('corruto', 'diputado', 'carretera', 'verguensa'):
+            assert mapped.similar(term) == index.similar(term)
+            assert mapped.search(term) == index.search(term)
+        try:
+            TrigramIndex.load(path, 'other-hash')
+            assert False, "stale index should have been rejected"
+        except ArtifactError as e:
+            print(f"✓ Rejected: {e}")
+        del mapped
+    print("✓ Trigram index round-trips through the artifact")
+
+
+def test_loader_maps_or_builds():
+    original_build_dir = full_dataset_loader.BUILD_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            full_dataset_loader.BUILD_DIR = tmp
+            loader = FullDatasetLoader(use_artifact=False)
+            built = loader.get_trigram_index()  # No artifact: built in memory
+            assert loader.get_trigram_index() is built
+
+            path, _ = loader.build_trigram_index_artifact(tmp)
+            fresh = FullDatasetLoader(use_artifact=False)
+            mapped = fresh.get_trigram_index()
+            assert mapped._buffer is not None
+            assert mapped.similar('corruto') == built.similar('corruto')
+        finally:
+            full_dataset_loader.BUILD_DIR = original_build_dir
+    print(f"✓ Loader maps the trigram index ({len(mapped):,} words)")
+
+
+def test_lookup_is_fast():
+    index = FullDatasetLoader().get_trigram_index()
+    terms = ['corruto', 'presidnte', 'karreteras', 'diputadoss', 'edukacion'] * 20
+    started = time.perf_counter()
+    for term in terms:
+        index.similar(term)
+    per_lookup_ms = (time.perf_counter() - started) * 1000 / len(terms)
+    assert per_lookup_ms < 5
+    print(f"✓ {per_lookup_ms:.3f} ms per lookup over {len(index):,} words")
+
+
+def test_smart_filter_uses_fuzzy_terms():
+    smart_filter = SmartFilter([{'text': t, 'sentiment': 'negative'} for t in TEXTS], topics={})
+    assert 'corrupto' in smart_filter.query_terms('corutos')
+    assert smart_filter.filter('diputadoz')['total'] == 1
+    print("✓ Smart filter expands misspelled query words")
+
+
+if __name__ == '__main__':
+    test_fuzzy_key()
+    test_similar_words()
+    test_artifact_roundtrip()
+    test_loader_maps_or_builds()
+    test_lookup_is_fast()
+    test_smart_filter_uses_fuzzy_terms()
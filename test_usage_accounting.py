@@ -0,0 +1,88 @@
+"""
+Test per-request token/cost accounting in the chat log and dashboard
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'api'))
+
+import dashboard
+from log_store import LogStore, get_log_store
+from log_writer import get_log_writer
+from test_streaming import FakeClient, make_handler
+from usage_cost import estimate_cost
+
+USAGE = {'input_tokens': 1000, 'output_tokens': 500, 'cache_creation_input_tokens': 40000, 'cache_read_input_tokens': 0}
+
+
+def test_estimate_cost_haiku_prices():
+    """$0.80 in, $4 out, $1 cache write, $0.08 cache read per million tokens"""
+    assert estimate_cost(USAGE, 'claude-3-5-haiku-20241022') == round((1000 * 0.8 + 500 * 4 + 40000 * 1.0) / 1e6, 6)
+    assert estimate_cost({'cache_read_input_tokens': 1_000_000}) == 0.08
+    assert estimate_cost({}) == 0.0
+    print(f"✓ Cost of a cache-writing request: ${estimate_cost(USAGE):.4f}")
+
+
+def test_log_entry_has_usage_and_latency():
+    """Streamed requests log tokens, cost, model, stop reason, latency and prompt size"""
+    h = make_handler({'message': 'hola', 'stream': True, 'session_id': 'usage-test'})
+    del h._log_conversation  # Use the real logger
+    h._get_client = lambda: FakeClient(['respuesta ', 'corta'])
+    h.do_POST()
+
+    get_log_writer().flush()  # Entries are written in the background
+    entry = get_log_store().session('usage-test')[-1]
+
+    assert entry['message_length'] == 4
+    assert entry['response_length'] == len('respuesta corta')
+    assert entry['input_tokens'] == 10 and entry['output_tokens'] == 20
+    assert entry['cache_read_tokens'] == 4000
+    assert entry['total_tokens'] == 4030
+    assert entry['cost_usd'] == estimate_cost(entry['usage'], entry['model'])
+    assert entry['latency_ms'] is not None
+    assert entry['prompt_size']['estimated_tokens'] > 0
+    print(f"✓ Logged {entry['total_tokens']} tokens, ${entry['cost_usd']}, {entry['latency_ms']} ms")
+
+
+def test_dashboard_token_analytics():
+    """Tokens per day, per-query percentiles and spend"""
+    yesterday = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    logs = [
+        {'timestamp': f'{yesterday}T10:00:00', 'usage': USAGE, 'model': 'claude-3-5-haiku-20241022', 'latency_ms': 900},
+        {'timestamp': f'{yesterday}T11:00:00', 'usage': {'input_tokens': 100, 'output_tokens': 100, 'cache_read_input_tokens': 40000}, 'latency_ms': 500},
+        {'timestamp': f'{today}T00:00:01', 'usage': {}, 'cache_hit': True},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LogStore(os.path.join(tmp, 'logs.sqlite'))
+        store.insert_many(logs)
+        h = dashboard.handler.__new__(dashboard.handler)
+        h._store = lambda: store
+        result = h._get_analytics(7)
+
+    assert result['tokens_per_day'] == {yesterday: {
+        'input': 1100, 'output': 600, 'cache_read': 40000, 'cache_write': 40000, 'total': 81700
+    }}
+    assert result['tokens_per_query']['p50'] == 40200
+    assert result['tokens_per_query']['max'] == 41500
+    assert result['latency_ms']['p95'] == 900
+    expected = estimate_cost(USAGE) + estimate_cost(logs[1]['usage'])
+    assert result['estimated_spend']['total_usd'] == round(expected, 4)
+    print(f"✓ Spend ${result['estimated_spend']['total_usd']} over {result['total_tokens']:,} tokens")
+
+
+if __name__ == "__main__":
+    print("\n" + "="*80)
+    print("TESTING TOKEN AND COST ACCOUNTING")
+    print("="*80)
+
+    test_estimate_cost_haiku_prices()
+    test_log_entry_has_usage_and_latency()
+    test_dashboard_token_analytics()
+
+    print("\n" + "="*80)
+    print("ALL TESTS PASSED")
+    print("="*80)